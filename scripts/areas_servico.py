@@ -0,0 +1,325 @@
+"""
+Áreas de Serviço das UBS pela Rede Viária (Isócronas)
+Em vez da distância em linha reta, usa as ruas de um extrato local do
+OpenStreetMap (sem serviço de rotas externo): o grafo viário a pé e de
+carro (grafo_viario.py, arrays CSR) e, por modo, um Dijkstra de múltiplas
+fontes a partir de todas as UBS do registro (registro_ubs.py). Cada ponto
+da rede fica com o tempo até a UBS mais próxima e qual é ela.
+
+- Isócronas: para cada UBS, modo e limite de tempo, o contorno côncavo
+  (geometria.aneis_concavos) dos pontos da rede que ela alcança antes das
+  outras UBS dentro do limite (mais os pontos interpolados onde o limite
+  corta as ruas), reduzidos a um por célula de RESOLUCAO_ISOCRONA_M
+- Endereços: tempo e distância pela rede até a UBS mais próxima e até a
+  UBS atribuída (esta só é recalculada, com um Dijkstra adicional por UBS
+  que para ao alcançar os endereços, para as UBS que não são a mais
+  próxima de algum dos seus endereços; endereços que a UBS atribuída não
+  alcança pela rede ficam vazios)
+
+O extrato pode ser .osm.pbf ou OSM XML; só a caixa do município (mais
+MARGEM_KM) entra no grafo. Um recorte do município lê em menos de um
+segundo; o extrato regional inteiro da Geofabrik funciona, mas é lento.
+
+Saídas:
+- dados/isocronas_ubs.geojson: uma feature por (modo, UBS, minutos)
+- dados/rede_enderecos.csv: o CSV consolidado com, por modo, a UBS mais
+  próxima pela rede, tempos/distâncias e status
+- dados/relatorios/areas_servico.json/.html: resumo e ocorrências
+
+Uso:
+    python areas_servico.py [--osm dados/socorro.osm.pbf] [--modos a_pe carro]
+                            [--minutos-a-pe 5 10 15 20] [--minutos-carro 2 5 10]
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from geometria import BBOX_NSS, KM_POR_GRAU_LAT, aneis_concavos, km_por_grau_lon
+from grafo_viario import MODOS, VELOCIDADE_A_PE_KMH, GrafoViario
+from metricas_poligonos import metricas
+from osm import ler_osm
+from registro_ubs import carregar_registro, posicoes_ubs
+from relatorio import Cronometro, agora_iso, registros, salvar_relatorio
+from saida_geojson import salvar_geojson
+
+# Diretórios
+BASE_DIR = Path(__file__).parent.parent
+DADOS_DIR = BASE_DIR / "dados"
+
+OSM_PADRAO = DADOS_DIR / "socorro.osm.pbf"
+ISOCRONAS_PATH = DADOS_DIR / "isocronas_ubs.geojson"
+SAIDA_CSV = DADOS_DIR / "rede_enderecos.csv"
+
+# Limites das isócronas (minutos) por modo
+MINUTOS_PADRAO = {"a_pe": [5, 10, 15, 20], "carro": [2, 5, 10]}
+
+# Folga em torno da bbox do município para o grafo (ruas que saem e voltam)
+MARGEM_KM = 2.0
+
+# Pontos das isócronas: um por célula; arestas do contorno côncavo até esse comprimento
+RESOLUCAO_ISOCRONA_M = 50
+COMPRIMENTO_MAX_ISOCRONA_KM = 0.3
+
+# Pontos a mais que isso do vértice mais próximo da rede ficam "fora da rede"
+ACESSO_MAX_M = 500
+
+COLUNAS_OCORRENCIA = ['ubs_referencia', 'micro_area', 'endereco_completo', 'latitude', 'longitude']
+
+
+def caixa_municipio(margem_km=MARGEM_KM):
+    """BBOX_NSS ampliada de `margem_km` para todos os lados."""
+    lat_centro = (BBOX_NSS["lat_min"] + BBOX_NSS["lat_max"]) / 2
+    dlat = margem_km / KM_POR_GRAU_LAT
+    dlon = margem_km / km_por_grau_lon(lat_centro)
+    return {"lon_min": BBOX_NSS["lon_min"] - dlon, "lon_max": BBOX_NSS["lon_max"] + dlon,
+            "lat_min": BBOX_NSS["lat_min"] - dlat, "lat_max": BBOX_NSS["lat_max"] + dlat}
+
+
+def ubs_na_rede(grafo, registro):
+    """
+    UBS do registro com coordenada, ligadas ao vértice mais próximo: DataFrame
+    com ubs_referencia, longitude, latitude, vertice, acesso_m.
+    """
+    ubs = registro[registro['latitude'].notna() & registro['longitude'].notna()].reset_index(drop=True)
+    vertice, acesso = grafo.vertices_proximos(ubs['longitude'], ubs['latitude'])
+    return ubs[['ubs_referencia', 'longitude', 'latitude']].assign(vertice=vertice, acesso_m=acesso)
+
+
+def _acesso_s(acesso_m):
+    return np.asarray(acesso_m, dtype=float) / (VELOCIDADE_A_PE_KMH / 3.6)
+
+
+def rede_ubs(grafo, ubs):
+    """Dijkstra de múltiplas fontes a partir das UBS: (tempo_s, comprimento_m, fonte) por vértice."""
+    return grafo.dijkstra(ubs['vertice'].to_numpy(), _acesso_s(ubs['acesso_m']), ubs['acesso_m'].to_numpy())
+
+
+def rotulos_ubs(grafo, ubs, k):
+    """Como rede_ubs, mas com as k UBS mais próximas de cada vértice: arrays (vértices, k)."""
+    return grafo.dijkstra_k(ubs['vertice'].to_numpy(), k, _acesso_s(ubs['acesso_m']),
+                            ubs['acesso_m'].to_numpy())
+
+
+def distancias_enderecos(grafo, ubs, rede, lon, lat, atribuida):
+    """
+    Tempo (min) e distância (km) pela rede de cada ponto até a UBS mais
+    próxima e até a UBS atribuída (`atribuida`: posição em `ubs` ou -1).
+    `rede` é o resultado de rede_ubs. Pontos sem caminho pela rede ficam
+    com NaN. Retorna um dict de arrays.
+    """
+    tempo, comprimento, fonte = rede
+    vertice, acesso = grafo.vertices_proximos(lon, lat)
+    na_rede = (vertice >= 0) & (acesso <= ACESSO_MAX_M)
+    v = np.maximum(vertice, 0)
+    mais_proxima = np.where(na_rede, fonte[v], -1)
+    alcancado = mais_proxima >= 0
+    tempo_proxima = np.where(alcancado, tempo[v] + _acesso_s(acesso), np.nan)
+    distancia_proxima = np.where(alcancado, comprimento[v] + acesso, np.nan)
+
+    # UBS atribuída: igual à mais próxima na maioria dos casos; as outras com
+    # um Dijkstra só da UBS, que para ao alcançar os seus endereços
+    atribuida = np.asarray(atribuida)
+    tempo_atribuida = np.where(alcancado & (atribuida == mais_proxima), tempo_proxima, np.nan)
+    distancia_atribuida = np.where(alcancado & (atribuida == mais_proxima), distancia_proxima, np.nan)
+    recalcular = alcancado & (atribuida >= 0) & (atribuida != mais_proxima)
+    for u in np.unique(atribuida[recalcular]):
+        alvos = recalcular & (atribuida == u)
+        t, c, _ = grafo.dijkstra([ubs['vertice'].iat[u]], _acesso_s([ubs['acesso_m'].iat[u]]),
+                                 [ubs['acesso_m'].iat[u]], alvos=vertice[alvos])
+        t, c = t[vertice[alvos]], c[vertice[alvos]]
+        # Componente da rede sem ligação com a UBS atribuída: inf → NaN
+        tempo_atribuida[alvos] = np.where(np.isfinite(t), t + _acesso_s(acesso[alvos]), np.nan)
+        distancia_atribuida[alvos] = np.where(np.isfinite(c), c + acesso[alvos], np.nan)
+
+    return {
+        "vertice": vertice, "acesso_m": acesso, "na_rede": na_rede,
+        "mais_proxima": mais_proxima,
+        "tempo_mais_proxima_min": tempo_proxima / 60, "distancia_mais_proxima_km": distancia_proxima / 1000,
+        "tempo_atribuida_min": tempo_atribuida / 60, "distancia_atribuida_km": distancia_atribuida / 1000,
+    }
+
+
+def isocronas(grafo, ubs, rede, modo, minutos):
+    """Features GeoJSON das isócronas de cada UBS (uma por limite de `minutos`)."""
+    tempo, _, fonte = rede
+    lon, lat, u, j = grafo.pontos_isocronas(tempo, fonte, [m * 60 for m in minutos])
+    if len(lon) == 0:
+        return []
+
+    # Um ponto por célula da grade em cada grupo (UBS, limite)
+    lat0 = float(np.mean(lat))
+    celula_x = np.floor(lon * km_por_grau_lon(lat0) * 1000 / RESOLUCAO_ISOCRONA_M).astype(np.int64)
+    celula_y = np.floor(lat * KM_POR_GRAU_LAT * 1000 / RESOLUCAO_ISOCRONA_M).astype(np.int64)
+    grupo = u * len(minutos) + j
+    _, unicos = np.unique(np.column_stack([grupo, celula_x, celula_y]), axis=0, return_index=True)
+    lon, lat, grupo = lon[unicos], lat[unicos], grupo[unicos]
+
+    chaves, codigos = np.unique(grupo, return_inverse=True)
+    coords, inicio = aneis_concavos(lon, lat, codigos, len(chaves), COMPRIMENTO_MAX_ISOCRONA_KM)
+    alcancados = np.bincount(fonte[fonte >= 0], minlength=len(ubs))
+    features = []
+    for k, chave in enumerate(chaves.tolist()):
+        ubs_k, j_k = divmod(chave, len(minutos))
+        features.append({
+            "type": "Feature",
+            "properties": {
+                "ubs_referencia": ubs['ubs_referencia'].iat[ubs_k],
+                "modo": modo,
+                "minutos": minutos[j_k],
+                "vertices_rede": int(np.count_nonzero((fonte == ubs_k) & (tempo <= minutos[j_k] * 60))),
+                "vertices_area": int(alcancados[ubs_k]),
+            },
+            "geometry": {"type": "Polygon", "coordinates": [coords[inicio[k]:inicio[k + 1]].tolist()]},
+        })
+    areas = metricas([f["geometry"] for f in features])['area_km2']
+    for f, area in zip(features, areas):
+        f["properties"]["area_km2"] = None if pd.isna(area) else round(float(area), 4)
+    # Maiores primeiro, para que as menores fiquem por cima no mapa
+    features.sort(key=lambda f: (f["properties"]["ubs_referencia"], -f["properties"]["minutos"]))
+    return features
+
+
+def _status(validos, atribuida, resultado):
+    status = np.where(resultado["mais_proxima"] == atribuida, "ok", "outra_mais_proxima")
+    status = np.where(resultado["mais_proxima"] >= 0, status, "fora_da_rede")
+    status = np.where(atribuida >= 0, status, "ubs_sem_coordenada")
+    return np.where(validos, status, "sem_coordenada")
+
+
+def areas_servico(df, registro, extrato, modos, minutos):
+    """Retorna (df com as colunas por modo, features das isócronas, relatório)."""
+    cron = Cronometro()
+    caixa = caixa_municipio()
+    resultado = df.copy()
+    lon, lat = df['longitude'].to_numpy(dtype=float), df['latitude'].to_numpy(dtype=float)
+    validos = ~(np.isnan(lon) | np.isnan(lat))
+    features, contagens, por_ubs, ocorrencias, ubs_rede = [], {}, {}, {}, {}
+
+    for modo in modos:
+        with cron.etapa(f"{modo}_grafo"):
+            grafo = GrafoViario.de_extrato(extrato, modo, caixa)
+        if len(grafo) == 0:
+            print(f"   ⚠️  Nenhuma via transitável ({modo}) no extrato dentro do município")
+            continue
+        with cron.etapa(f"{modo}_dijkstra"):
+            ubs = ubs_na_rede(grafo, registro)
+            rede = rede_ubs(grafo, ubs)
+        longe = ubs[ubs['acesso_m'] > ACESSO_MAX_M]
+        for nome, acesso in zip(longe['ubs_referencia'], longe['acesso_m']):
+            print(f"   ⚠️  {nome}: a {acesso:.0f} m da rede ({modo}); o extrato cobre a UBS?")
+        with cron.etapa(f"{modo}_isocronas"):
+            features.extend(isocronas(grafo, ubs, rede, modo, minutos[modo]))
+        with cron.etapa(f"{modo}_enderecos"):
+            atribuida = posicoes_ubs(ubs, df['ubs_referencia'])
+            r = distancias_enderecos(grafo, ubs, rede, lon, lat, atribuida)
+            nomes = np.append(ubs['ubs_referencia'].to_numpy(dtype=object), None)
+            resultado[f'{modo}_acesso_m'] = r["acesso_m"].round(1)
+            resultado[f'{modo}_ubs_mais_proxima'] = nomes[r["mais_proxima"]]
+            for coluna in ("tempo_mais_proxima_min", "distancia_mais_proxima_km",
+                           "tempo_atribuida_min", "distancia_atribuida_km"):
+                resultado[f'{modo}_{coluna}'] = r[coluna].round(3)
+            resultado[f'{modo}_status'] = _status(validos, atribuida, r)
+
+        contagem = resultado[f'{modo}_status'].value_counts()
+        contagens[modo] = {
+            "vertices": len(grafo), "arestas": grafo.n_arestas,
+            "alcancados": int(np.count_nonzero(rede[2] >= 0)),
+            **{s: int(contagem.get(s, 0)) for s in
+               ("ok", "outra_mais_proxima", "fora_da_rede", "ubs_sem_coordenada", "sem_coordenada")},
+        }
+        ubs_rede[modo] = registros(ubs.round({'acesso_m': 1}))
+        por_ubs[modo] = registros(
+            resultado[validos].groupby('ubs_referencia', sort=False)
+            .agg(enderecos=(f'{modo}_status', 'size'),
+                 mais_proxima=(f'{modo}_status', lambda s: int((s == "ok").sum())),
+                 tempo_medio_min=(f'{modo}_tempo_atribuida_min', 'mean'),
+                 tempo_max_min=(f'{modo}_tempo_atribuida_min', 'max'),
+                 distancia_media_km=(f'{modo}_distancia_atribuida_km', 'mean'))
+            .round(3).reset_index()
+        )
+        outra = resultado[resultado[f'{modo}_status'] == "outra_mais_proxima"]
+        ocorrencias[f"{modo}_outra_mais_proxima"] = registros(outra, COLUNAS_OCORRENCIA + [
+            f'{modo}_ubs_mais_proxima', f'{modo}_tempo_mais_proxima_min', f'{modo}_tempo_atribuida_min'])
+        ocorrencias[f"{modo}_fora_da_rede"] = registros(
+            resultado[resultado[f'{modo}_status'] == "fora_da_rede"], COLUNAS_OCORRENCIA + [f'{modo}_acesso_m'])
+
+    relatorio = {
+        "relatorio": "areas_servico",
+        "titulo": "Áreas de Serviço das UBS pela Rede Viária",
+        "gerado_em": agora_iso(),
+        "entrada": "extrato OSM, dados/UBS_Ruas_Coordenadas_Consolidado.csv, dados/UBS_Ruas - *.csv",
+        "parametros": {"modos": list(modos), "minutos": {m: minutos[m] for m in modos},
+                       "resolucao_isocrona_m": RESOLUCAO_ISOCRONA_M, "acesso_max_m": ACESSO_MAX_M},
+        "problemas": int(sum(c["outra_mais_proxima"] + c["fora_da_rede"] for c in contagens.values())),
+        "contagens": {"enderecos": int(len(df)), "isocronas": len(features), **contagens},
+        "ubs": ubs_rede,
+        "por_ubs": por_ubs,
+        "isocronas": [f["properties"] for f in features],
+        "tempos_s": cron.tempos,
+        "ocorrencias": ocorrencias,
+    }
+    return resultado, features, relatorio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Áreas de serviço (isócronas) das UBS pela rede viária do OSM")
+    parser.add_argument("--osm", type=Path, default=OSM_PADRAO,
+                        help=f"Extrato do OpenStreetMap (.osm.pbf ou .osm) (padrão: {OSM_PADRAO})")
+    parser.add_argument("--modos", nargs="+", choices=MODOS, default=list(MODOS),
+                        help="Modos de deslocamento (padrão: a_pe carro)")
+    parser.add_argument("--minutos-a-pe", type=int, nargs="+", default=MINUTOS_PADRAO["a_pe"],
+                        help="Limites das isócronas a pé, em minutos (padrão: 5 10 15 20)")
+    parser.add_argument("--minutos-carro", type=int, nargs="+", default=MINUTOS_PADRAO["carro"],
+                        help="Limites das isócronas de carro, em minutos (padrão: 2 5 10)")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("ÁREAS DE SERVIÇO DAS UBS PELA REDE VIÁRIA")
+    print("=" * 70)
+    if not args.osm.exists():
+        print(f"\n❌ Extrato do OpenStreetMap não encontrado: {args.osm}")
+        print("   Exporte a área do município em https://www.openstreetmap.org/export ou recorte o extrato")
+        print("   do Nordeste da Geofabrik (osmium extract -b -37.27,-11.07,-36.98,-10.73) e use --osm")
+        return
+
+    inicio = time.perf_counter()
+    print(f"\n📥 Lendo {args.osm.name}...")
+    extrato = ler_osm(args.osm)
+    print(f"   {len(extrato.ids)} nós, {len(extrato)} vias ({time.perf_counter() - inicio:.1f}s)")
+
+    df = pd.read_csv(DADOS_DIR / "UBS_Ruas_Coordenadas_Consolidado.csv")
+    registro = carregar_registro()
+    minutos = {"a_pe": sorted(args.minutos_a_pe), "carro": sorted(args.minutos_carro)}
+    resultado, features, relatorio = areas_servico(df, registro, extrato, args.modos, minutos)
+
+    salvar_geojson(ISOCRONAS_PATH, "isocronas_ubs", features)
+    resultado.to_csv(SAIDA_CSV, index=False, encoding='utf-8-sig')
+    caminho_json, caminho_html = salvar_relatorio(relatorio, 'areas_servico')
+
+    c = relatorio['contagens']
+    for modo in args.modos:
+        if modo not in c:
+            continue
+        m = c[modo]
+        rotulo = "A pé" if modo == "a_pe" else "De carro"
+        print(f"\n🧭 {rotulo}: {m['vertices']} vértices, {m['arestas']} arestas "
+              f"({m['alcancados']} alcançados a partir das UBS)")
+        print(f"   ✅ Atribuídos à UBS mais próxima pela rede: {m['ok']}")
+        print(f"   ⚠️  Outra UBS mais próxima pela rede: {m['outra_mais_proxima']}")
+        if m['fora_da_rede'] or m['ubs_sem_coordenada'] or m['sem_coordenada']:
+            print(f"   - Fora da rede: {m['fora_da_rede']} | UBS sem coordenada: {m['ubs_sem_coordenada']}"
+                  f" | Sem coordenada: {m['sem_coordenada']}")
+    print(f"\n⏱️  Tempo total: {time.perf_counter() - inicio:.1f}s")
+
+    print(f"\n📁 Isócronas ({c['isocronas']}): {ISOCRONAS_PATH}")
+    print(f"📁 Resultado por endereço: {SAIDA_CSV}")
+    print(f"📁 Relatório JSON: {caminho_json}")
+    print(f"📁 Relatório HTML: {caminho_html}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Cache dos Polígonos (regeneração incremental)
+Usado por gerar_poligonos.py para recalcular só os grupos que mudaram.
+
+Cada grupo (microárea ou UBS) tem uma impressão digital: um hash do
+conjunto de linhas dos seus pontos, independente da ordem. As features já
+montadas (polígono, contorno e pontos descartados) ficam guardadas em
+dados/cache_poligonos.json junto com a impressão; na próxima execução, um
+grupo com a mesma impressão é reaproveitado sem recalcular nada.
+
+O cache inteiro é descartado quando os parâmetros (modo, filtro de
+outliers, UBS_INFO...) mudam. Use `gerar_poligonos.py --completo` para
+ignorá-lo depois de alterar o código dos polígonos.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+# Incrementar quando o formato das entradas mudar
+VERSAO_CACHE = 2
+
+
+def chave_texto(chave):
+    """Chave de grupo (valor ou tupla) como texto, para usar no JSON."""
+    if not isinstance(chave, tuple):
+        chave = (chave,)
+    return "|".join(str(v) for v in chave)
+
+
+def impressoes(pontos, chaves, colunas):
+    """
+    Impressão digital (hash hexadecimal) do conjunto de linhas `colunas` de
+    cada grupo de `pontos`. Retorna uma Series indexada pelos grupos, na
+    ordem de primeira aparição.
+    """
+    agrupado = pontos.groupby(chaves, sort=False, dropna=False)
+    codigos = agrupado.ngroup().to_numpy()
+    linhas = pd.util.hash_pandas_object(pontos[colunas], index=False).to_numpy()
+    ordem = np.lexsort((linhas, codigos))
+    linhas, codigos = linhas[ordem], codigos[ordem]
+    limites = np.searchsorted(codigos, np.arange(agrupado.ngroups + 1))
+    valores = [hashlib.sha1(linhas[limites[k]:limites[k + 1]].tobytes()).hexdigest()
+               for k in range(agrupado.ngroups)]
+    return pd.Series(valores, index=agrupado.size().index, dtype=object)
+
+
+class CachePoligonos:
+    """Entradas por nível ("microarea", "ubs") e chave de grupo, em um arquivo JSON."""
+
+    def __init__(self, caminho, parametros, ignorar=False):
+        self.caminho = caminho
+        self.parametros = json.loads(json.dumps({"versao": VERSAO_CACHE, **parametros}))
+        self.niveis = {}
+        self.saida = None  # formato dos arquivos gravados na última execução
+        if ignorar or not caminho.exists():
+            return
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if dados.get("parametros") == self.parametros:
+            self.niveis = dados.get("niveis", {})
+            self.saida = dados.get("saida")
+
+    def obter(self, nivel, chave, impressao):
+        """Entrada guardada para o grupo, se a impressão ainda for a mesma."""
+        entrada = self.niveis.get(nivel, {}).get(chave_texto(chave))
+        if entrada is not None and entrada["impressao"] == impressao:
+            return entrada
+        return None
+
+    def guardar(self, nivel, chave, impressao, **dados):
+        self.niveis.setdefault(nivel, {})[chave_texto(chave)] = {"impressao": impressao, **dados}
+
+    def podar(self, nivel, chaves_vivas):
+        """Remove os grupos que não existem mais; retorna quantos foram removidos."""
+        vivas = {chave_texto(c) for c in chaves_vivas}
+        entradas = self.niveis.get(nivel, {})
+        mortas = [c for c in entradas if c not in vivas]
+        for c in mortas:
+            del entradas[c]
+        return len(mortas)
+
+    def salvar(self):
+        with open(self.caminho, "w", encoding="utf-8") as f:
+            json.dump({"parametros": self.parametros, "saida": self.saida, "niveis": self.niveis},
+                      f, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,95 @@
+"""
+Registro de Coordenadas Genéricas
+Centróides de bairros/cidades (e pontos de ruas que o geocodificador colapsa
+sobre eles) usados por verificar_qualidade.py, marcar_revisao.py e
+gerar_csv_consolidado.py para detectar geocodificações imprecisas.
+
+O registro fica em um índice de grade (indice_espacial.IndiceGrade), de modo
+que a verificação de uma coluna inteira de coordenadas custa O(linhas) em vez
+de O(linhas × centróides). Entradas adicionais podem ser mantidas em
+dados/coordenadas_genericas.csv (colunas: lat, lon, nome).
+"""
+
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from indice_espacial import IndiceGrade
+
+# Diretórios
+BASE_DIR = Path(__file__).parent.parent
+DADOS_DIR = BASE_DIR / "dados"
+
+REGISTRO_CSV = DADOS_DIR / "coordenadas_genericas.csv"
+
+TOLERANCIA_PADRAO = 0.001  # ~100m
+
+# Prefixo das entradas do centróide do município (a coordenada que o
+# geocodificador devolve quando não acha a rua)
+CENTROIDE_MUNICIPIO = "Centróide N.Sra.Socorro"
+
+# Coordenadas conhecidas como genéricas (centroides de bairros/cidades)
+COORDENADAS_GENERICAS = [
+    # Centróide de Nossa Senhora do Socorro
+    {"lat": -10.8531544, "lon": -37.1270097, "nome": "Centróide N.Sra.Socorro"},
+    {"lat": -10.8531643, "lon": -37.1269791, "nome": "Centróide N.Sra.Socorro (var)"},
+    # Guajará
+    {"lat": -10.89845, "lon": -37.15609, "nome": "Centróide Guajará"},
+    {"lat": -10.8989307, "lon": -37.1556814, "nome": "Centróide Guajará (var)"},
+    {"lat": -10.8987421, "lon": -37.1568506, "nome": "Guajará - Avenida Principal"},
+    {"lat": -10.898298, "lon": -37.1568661, "nome": "Guajará - Padre Cícero"},
+    {"lat": -10.8979698, "lon": -37.156876, "nome": "Guajará - Travessa Padre Cícero"},
+    {"lat": -10.8983495, "lon": -37.1564517, "nome": "Guajará - São Luiz"},
+    {"lat": -10.8989331, "lon": -37.155646, "nome": "Guajará - Rua 11"},
+    # São Braz
+    {"lat": -10.84992, "lon": -37.05153, "nome": "Centróide São Braz"},
+    {"lat": -10.8494823, "lon": -37.0521895, "nome": "Centróide São Braz (Caeté, Rua 09)"},
+    {"lat": -10.850387, "lon": -37.050555, "nome": "São Braz - Espírito Santo"},
+    {"lat": -10.8505205, "lon": -37.0513121, "nome": "São Braz - Florianópolis"},
+    {"lat": -10.8504033, "lon": -37.0523887, "nome": "São Braz - Travessa Mato Grosso"},
+    {"lat": -10.8502863, "lon": -37.0513742, "nome": "São Braz - Curitiba"},
+    {"lat": -10.8500167, "lon": -37.0518566, "nome": "São Braz - Travessa Curitiba"},
+    {"lat": -10.8505377, "lon": -37.0521436, "nome": "São Braz - Eng. Galvão"},
+    {"lat": -10.8505602, "lon": -37.0506611, "nome": "São Braz - Mato Grosso do Sul"},
+]
+
+
+def carregar_registro(caminho=REGISTRO_CSV):
+    """Retorna o registro completo: lista embutida + entradas do CSV (se existir)."""
+    registro = list(COORDENADAS_GENERICAS)
+    if Path(caminho).exists():
+        extra = pd.read_csv(caminho)
+        registro.extend(extra[["lat", "lon", "nome"]].to_dict("records"))
+    return registro
+
+
+@lru_cache(maxsize=None)
+def _indice(tolerancia, prefixo=""):
+    registro = [g for g in carregar_registro() if str(g["nome"]).startswith(prefixo)]
+    lats = [g["lat"] for g in registro]
+    lons = [g["lon"] for g in registro]
+    nomes = np.array([g["nome"] for g in registro] + [None], dtype=object)
+    return IndiceGrade(lons, lats, tolerancia), nomes
+
+
+def identificar_genericas(lats, lons, tolerancia=TOLERANCIA_PADRAO, prefixo=""):
+    """
+    Para cada coordenada, retorna o índice da entrada do registro a menos de
+    `tolerancia` graus (em lat e lon), ou -1. Coordenadas NaN retornam -1.
+    Com `prefixo`, só as entradas cujo nome começa por ele são consideradas.
+    """
+    indice, _ = _indice(tolerancia, prefixo)
+    return indice.primeiro_dentro(lons, lats, tolerancia)
+
+
+def nomes_genericas(lats, lons, tolerancia=TOLERANCIA_PADRAO, prefixo=""):
+    """Como identificar_genericas, mas retorna o nome da entrada (ou None)."""
+    _, nomes = _indice(tolerancia, prefixo)
+    return nomes[identificar_genericas(lats, lons, tolerancia, prefixo)]
+
+
+def is_coord_generica(lat, lon, tolerancia=TOLERANCIA_PADRAO, prefixo=""):
+    """Verifica uma única coordenada; retorna o nome da entrada ou None."""
+    return nomes_genericas([lat], [lon], tolerancia, prefixo)[0]
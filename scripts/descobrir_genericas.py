@@ -0,0 +1,170 @@
+"""
+Descoberta Automática de Coordenadas Genéricas
+Procura pontos onde o geocodificador empilhou muitas ruas diferentes
+(centróides de bairro/cidade) e gera candidatos para o registro de
+coordenadas genéricas (coordenadas_genericas.py).
+
+Método (hash-grid, estilo DBSCAN, tempo linear):
+1. Quantiza todas as coordenadas em uma grade fina (~11 m)
+2. Conta ruas distintas por célula (groupby por hash)
+3. Células "núcleo" = vizinhança 3x3 com MIN_RUAS_DISTINTAS ou mais ruas
+4. Agrupa núcleos vizinhos em clusters (componentes conexas 8-vizinhas)
+5. Cada cluster vira um candidato na coordenada exata mais repetida
+
+Uso:
+    python descobrir_genericas.py [--celula 0.0001] [--min-ruas 3]
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from coordenadas_genericas import identificar_genericas, TOLERANCIA_PADRAO
+
+# Diretórios
+BASE_DIR = Path(__file__).parent.parent
+DADOS_DIR = BASE_DIR / "dados"
+
+CANDIDATAS_CSV = DADOS_DIR / "coordenadas_genericas_candidatas.csv"
+
+TAMANHO_CELULA = 0.0001  # ~11m
+MIN_RUAS_DISTINTAS = 3
+
+
+def _nome_rua(enderecos):
+    """Extrai o nome da rua (primeiro trecho antes da vírgula), normalizado."""
+    return enderecos.astype(str).str.split(",").str[0].str.strip().str.lower()
+
+
+def _chave(cx, cy):
+    return cx * 4294967296 + cy
+
+
+def descobrir_candidatas(df, tamanho_celula=TAMANHO_CELULA, min_ruas=MIN_RUAS_DISTINTAS):
+    """
+    Retorna um DataFrame de candidatos a coordenada genérica, ordenado pelo
+    número de ruas distintas. Colunas: lat, lon, nome, num_ruas,
+    num_enderecos, ubs, exemplos, ja_no_registro.
+    """
+    colunas = ["lat", "lon", "nome", "num_ruas", "num_enderecos", "ubs", "exemplos", "ja_no_registro"]
+    pontos = df[df["latitude"].notna() & df["longitude"].notna()]
+    pontos = pd.DataFrame({
+        "lat": pontos["latitude"].to_numpy(),
+        "lon": pontos["longitude"].to_numpy(),
+        "rua": _nome_rua(pontos["endereco_completo"]).to_numpy(),
+        "ubs": pontos["ubs_referencia"].astype(str).to_numpy(),
+    })
+    if pontos.empty:
+        return pd.DataFrame(columns=colunas)
+
+    # 1. Quantizar em células
+    cx = np.floor(pontos["lon"].to_numpy() / tamanho_celula).astype(np.int64)
+    cy = np.floor(pontos["lat"].to_numpy() / tamanho_celula).astype(np.int64)
+    pontos["celula"] = _chave(cx, cy)
+
+    # 2. Ruas distintas por célula
+    por_celula = (
+        pontos.drop_duplicates(["celula", "rua"])
+        .groupby("celula", sort=False).size()
+    )
+    celulas = por_celula.index.to_numpy()
+    ruas_celula = por_celula.to_numpy()
+    ccx = celulas // 4294967296
+    ccy = celulas - ccx * 4294967296
+    indice_celulas = pd.Index(celulas)
+
+    # Vizinhos 8-conectados de cada célula ocupada (lookup por hash)
+    vizinhos = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            if dx == 0 and dy == 0:
+                continue
+            vizinhos.append(indice_celulas.get_indexer(_chave(ccx + dx, ccy + dy)))
+    vizinhos = np.stack(vizinhos, axis=1)  # (células, 8), -1 se vazia
+
+    # 3. Células núcleo: densidade da vizinhança 3x3
+    densidade = ruas_celula + np.where(vizinhos >= 0, ruas_celula[vizinhos], 0).sum(axis=1)
+    nucleo = densidade >= min_ruas
+    if not nucleo.any():
+        return pd.DataFrame(columns=colunas)
+
+    # 4. Componentes conexas entre núcleos (propagação do menor rótulo)
+    n = len(celulas)
+    rotulo = np.where(nucleo, np.arange(n), n)
+    ligacao = (vizinhos >= 0) & nucleo[:, None] & nucleo[np.maximum(vizinhos, 0)]
+    while True:
+        rotulo_viz = np.where(ligacao, rotulo[np.maximum(vizinhos, 0)], n).min(axis=1)
+        novo = np.minimum(rotulo, rotulo_viz)
+        novo = np.where(nucleo, novo[novo.clip(max=n - 1)], n)
+        if np.array_equal(novo, rotulo):
+            break
+        rotulo = novo
+
+    # Células de borda (não núcleo) se juntam ao cluster de um núcleo vizinho
+    borda = ~nucleo & (np.where(vizinhos >= 0, nucleo[np.maximum(vizinhos, 0)], False)).any(axis=1)
+    rotulo_borda = np.where(
+        (vizinhos >= 0) & nucleo[np.maximum(vizinhos, 0)],
+        rotulo[np.maximum(vizinhos, 0)], n,
+    ).min(axis=1)
+    rotulo = np.where(borda, rotulo_borda, rotulo)
+
+    pontos["cluster"] = rotulo[indice_celulas.get_indexer(pontos["celula"])]
+    pontos = pontos[pontos["cluster"] < n]
+
+    # 5. Resumo por cluster
+    resumo = pontos.groupby("cluster", sort=False).agg(
+        num_ruas=("rua", "nunique"),
+        num_enderecos=("rua", "size"),
+        ubs=("ubs", lambda s: "; ".join(sorted(s.unique()))),
+        exemplos=("rua", lambda s: "; ".join(sorted(s.unique())[:5])),
+    )
+    resumo = resumo[resumo["num_ruas"] >= min_ruas]
+
+    # Coordenada representativa: o ponto exato mais repetido no cluster
+    moda = (
+        pontos.groupby(["cluster", "lat", "lon"], sort=False).size()
+        .rename("n").reset_index()
+        .sort_values(["cluster", "n"], ascending=[True, False], kind="stable")
+        .drop_duplicates("cluster")
+        .set_index("cluster")
+    )
+    resumo = resumo.join(moda[["lat", "lon"]])
+
+    resumo["ja_no_registro"] = identificar_genericas(
+        resumo["lat"].to_numpy(), resumo["lon"].to_numpy(), TOLERANCIA_PADRAO
+    ) >= 0
+    resumo["nome"] = [
+        f"Candidato ({n_ruas} ruas) - {ubs}"
+        for n_ruas, ubs in zip(resumo["num_ruas"], resumo["ubs"])
+    ]
+    resumo = resumo.sort_values(["num_ruas", "num_enderecos"], ascending=False, kind="stable")
+    return resumo[colunas].reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Descobre candidatos a coordenadas genéricas")
+    parser.add_argument("--celula", type=float, default=TAMANHO_CELULA,
+                        help="lado da célula da grade em graus (padrão: %(default)s)")
+    parser.add_argument("--min-ruas", type=int, default=MIN_RUAS_DISTINTAS,
+                        help="mínimo de ruas distintas por cluster (padrão: %(default)s)")
+    args = parser.parse_args()
+
+    df = pd.read_csv(DADOS_DIR / "UBS_Ruas_Coordenadas_Consolidado.csv")
+    candidatas = descobrir_candidatas(df, args.celula, args.min_ruas)
+
+    novas = candidatas[~candidatas["ja_no_registro"]]
+    print(f"Candidatos encontrados: {len(candidatas)} ({len(novas)} fora do registro)")
+    for _, c in candidatas.iterrows():
+        status = "✅ já no registro" if c["ja_no_registro"] else "🆕 novo"
+        print(f"   ({c['lat']}, {c['lon']}) - {c['num_ruas']} ruas, {c['num_enderecos']} endereços [{status}]")
+        print(f"     {c['exemplos']}")
+
+    candidatas.to_csv(CANDIDATAS_CSV, index=False, encoding="utf-8-sig")
+    print(f"\n📁 Candidatos salvos em: {CANDIDATAS_CSV}")
+    print("   Após revisão, copie as linhas desejadas (lat, lon, nome) para dados/coordenadas_genericas.csv")
+
+
+if __name__ == "__main__":
+    main()
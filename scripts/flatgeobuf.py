@@ -0,0 +1,343 @@
+"""
+Escrita de FlatGeobuf (.fgb) com índice espacial
+Usado por gerar_poligonos.py --fgb.
+
+FlatGeobuf é um formato binário de features (FlatBuffers) com uma R-tree
+de Hilbert empacotada logo após o cabeçalho. Um leitor (QGIS, GDAL,
+flatgeobuf.js) lê o cabeçalho e o índice e busca, por requisições de
+intervalo (HTTP Range), só as features da área visível.
+
+Estrutura do arquivo:
+    "fgb\\x03fgb\\x00" | cabeçalho | índice (nós de 40 bytes) | features
+
+Cada feature é um FlatBuffer com prefixo de tamanho (uint32). O índice
+(PackedRTree) tem os níveis da raiz para as folhas; as folhas, em ordem de
+Hilbert dos centros das caixas, guardam o deslocamento em bytes da feature
+na seção de features, e as features são gravadas nessa mesma ordem.
+
+Escrita em uma única passada sobre as features: cada uma é serializada
+assim que chega num arquivo temporário (guardando só caixa, posição e
+tamanho); no fim, o cabeçalho e o índice são gravados e as features
+copiadas do temporário na ordem de Hilbert.
+
+Os FlatBuffers são montados à mão (_Construtor), sem o pacote flatbuffers.
+"""
+
+import json
+import math
+import struct
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from indice_espacial import indice_hilbert
+
+MAGICA = b"fgb\x03fgb\x00"
+
+# Filhos por nó da R-tree (padrão do formato)
+TAMANHO_NO_PADRAO = 16
+
+# Enums de header.fbs
+TIPO_PONTO = 1
+TIPO_POLIGONO = 3
+TIPO_MULTIPOLIGONO = 6
+
+COLUNA_BOOL = 2
+COLUNA_LONG = 7
+COLUNA_DOUBLE = 10
+COLUNA_STRING = 11
+COLUNA_JSON = 12
+
+_ITEM_NO = np.dtype([("min_x", "<f8"), ("min_y", "<f8"), ("max_x", "<f8"), ("max_y", "<f8"),
+                     ("deslocamento", "<u8")])
+
+
+class _Construtor:
+    """
+    Serializador FlatBuffers mínimo. Monta o buffer em ordem direta: cada
+    tabela é precedida da sua vtable e seguida dos seus filhos (strings,
+    vetores, subtabelas), de modo que os offsets sempre apontam para frente.
+    Campos: (índice no schema, tipo, valor), com tipo = formato struct de
+    um escalar, "str", "tabela", "tabelas" (vetor de tabelas) ou
+    ("vetor", dtype) para vetores de escalares. Valores None são omitidos.
+    """
+
+    def __init__(self):
+        # O prefixo de tamanho conta para o alinhamento, como no FinishSizePrefixed
+        self.dados = bytearray(8)
+
+    def _alinhar(self, n, adiante=0):
+        self.dados += bytes(-(len(self.dados) + adiante) % n)
+
+    def _remendar(self, posicao, alvo):
+        struct.pack_into("<I", self.dados, posicao, alvo - posicao)
+
+    def finalizar(self, campos):
+        """Buffer com prefixo de tamanho cuja raiz é a tabela `campos`."""
+        raiz = self.tabela(campos)
+        self._remendar(4, raiz)
+        struct.pack_into("<I", self.dados, 0, len(self.dados) - 4)
+        return bytes(self.dados)
+
+    def tabela(self, campos):
+        campos = [c for c in campos if c[2] is not None]
+        tamanhos = {c[0]: struct.calcsize("<" + c[1]) if isinstance(c[1], str) and len(c[1]) == 1 else 4
+                    for c in campos}
+        # Início da tabela ≡ 4 (mod 8): campos de 8 bytes logo após o soffset ficam alinhados
+        posicoes, fim = {}, 4
+        for indice, *_ in sorted(campos, key=lambda c: -tamanhos[c[0]]):
+            fim += -(4 + fim) % tamanhos[indice]
+            posicoes[indice] = fim
+            fim += tamanhos[indice]
+        n_campos = max(posicoes, default=-1) + 1
+        vtable = struct.pack(f"<HH{n_campos}H", 4 + 2 * n_campos, fim,
+                             *(posicoes.get(i, 0) for i in range(n_campos)))
+
+        self._alinhar(8, len(vtable) + 4)
+        self.dados += vtable
+        inicio = len(self.dados)
+        self.dados += struct.pack("<i", len(vtable)) + bytes(fim - 4)
+        filhos = []
+        for indice, tipo, valor in campos:
+            if isinstance(tipo, str) and len(tipo) == 1:
+                struct.pack_into("<" + tipo, self.dados, inicio + posicoes[indice], valor)
+            else:
+                filhos.append((inicio + posicoes[indice], tipo, valor))
+        for posicao, tipo, valor in filhos:
+            self._remendar(posicao, self._filho(tipo, valor))
+        return inicio
+
+    def _filho(self, tipo, valor):
+        if tipo == "str":
+            self._alinhar(4)
+            inicio = len(self.dados)
+            texto = valor.encode("utf-8")
+            self.dados += struct.pack("<I", len(texto)) + texto + b"\0"
+            return inicio
+        if tipo == "tabela":
+            return self.tabela(valor)
+        if tipo == "tabelas":
+            self._alinhar(4)
+            inicio = len(self.dados)
+            self.dados += struct.pack("<I", len(valor)) + bytes(4 * len(valor))
+            for k, campos in enumerate(valor):
+                self._remendar(inicio + 4 + 4 * k, self.tabela(campos))
+            return inicio
+        # ("vetor", dtype): vetor de escalares
+        elementos = np.ascontiguousarray(valor, dtype=tipo[1])
+        self._alinhar(4)
+        if elementos.itemsize == 8:
+            self._alinhar(8, 4)
+        inicio = len(self.dados)
+        self.dados += struct.pack("<I", len(elementos)) + elementos.tobytes()
+        return inicio
+
+
+# ============================================================================
+# COLUNAS (ATRIBUTOS)
+# ============================================================================
+
+def _tipo_coluna(valores):
+    valores = [v for v in valores if v is not None and not (isinstance(v, float) and math.isnan(v))]
+    if valores and all(isinstance(v, bool) for v in valores):
+        return COLUNA_BOOL
+    if valores and all(isinstance(v, int) and not isinstance(v, bool) for v in valores):
+        return COLUNA_LONG
+    if valores and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in valores):
+        return COLUNA_DOUBLE
+    if valores and all(isinstance(v, (list, dict)) for v in valores):
+        return COLUNA_JSON
+    return COLUNA_STRING
+
+
+def colunas_features(features):
+    """Colunas [(nome, tipo)] a partir das properties de uma lista de features GeoJSON."""
+    nomes = {}
+    for f in features:
+        for c in f["properties"]:
+            nomes.setdefault(c, None)
+    return [(c, _tipo_coluna([f["properties"].get(c) for f in features])) for c in nomes]
+
+
+def colunas_dataframe(df):
+    """Colunas [(nome, tipo)] a partir dos dtypes de um DataFrame."""
+    colunas = []
+    for c in df.columns:
+        tipo = df[c].dtype
+        colunas.append((c, COLUNA_BOOL if pd.api.types.is_bool_dtype(tipo) else
+                        COLUNA_LONG if pd.api.types.is_integer_dtype(tipo) else
+                        COLUNA_DOUBLE if pd.api.types.is_float_dtype(tipo) else COLUNA_STRING))
+    return colunas
+
+
+def _propriedades(colunas, propriedades):
+    """Bloco de propriedades de uma feature: (uint16 coluna, valor) de cada valor não nulo."""
+    partes = []
+    for i, (nome, tipo) in enumerate(colunas):
+        valor = propriedades.get(nome)
+        if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+            continue
+        if tipo == COLUNA_BOOL:
+            partes.append(struct.pack("<HB", i, bool(valor)))
+        elif tipo == COLUNA_LONG:
+            partes.append(struct.pack("<Hq", i, int(valor)))
+        elif tipo == COLUNA_DOUBLE:
+            partes.append(struct.pack("<Hd", i, float(valor)))
+        else:
+            if tipo == COLUNA_JSON or isinstance(valor, (list, dict)):
+                valor = json.dumps(valor, ensure_ascii=False)
+            texto = str(valor).encode("utf-8")
+            partes.append(struct.pack("<HI", i, len(texto)) + texto)
+    return b"".join(partes)
+
+
+# ============================================================================
+# GEOMETRIAS
+# ============================================================================
+
+def _geometria(geometria, tipo):
+    """Campos da tabela Geometry e caixa (min_x, min_y, max_x, max_y) de uma geometria GeoJSON."""
+    if tipo == TIPO_PONTO:
+        x, y = geometria["coordinates"][:2]
+        return [(1, ("vetor", "<f8"), [x, y])], (x, y, x, y)
+
+    poligonos = ([geometria["coordinates"]] if geometria["type"] == "Polygon"
+                 else geometria["coordinates"])
+    partes, minimo, maximo = [], np.full(2, np.inf), np.full(2, -np.inf)
+    for poligono in poligonos:
+        aneis = [np.asarray(anel, dtype=float).reshape(-1, 2) for anel in poligono]
+        xy = np.concatenate(aneis)
+        minimo, maximo = np.minimum(minimo, xy.min(axis=0)), np.maximum(maximo, xy.max(axis=0))
+        # ends (fim de cada anel, em vértices) só é necessário com buracos
+        fins = np.cumsum([len(a) for a in aneis]) if len(aneis) > 1 else None
+        partes.append([(0, ("vetor", "<u4"), fins), (1, ("vetor", "<f8"), xy.ravel()),
+                       (6, "B", TIPO_POLIGONO)])
+    return [(7, "tabelas", partes)], (minimo[0], minimo[1], maximo[0], maximo[1])
+
+
+def _feature(feature, tipo, colunas):
+    """Feature serializada (com prefixo de tamanho) e sua caixa."""
+    geometria, caixa = _geometria(feature["geometry"], tipo)
+    dados = _Construtor().finalizar([
+        (0, "tabela", geometria),
+        (1, ("vetor", "<u1"), np.frombuffer(_propriedades(colunas, feature["properties"]), dtype=np.uint8)),
+    ])
+    return dados, caixa
+
+
+# ============================================================================
+# ÍNDICE (PACKED HILBERT R-TREE)
+# ============================================================================
+
+def _limites_niveis(n, tamanho_no):
+    """(início, fim) de cada nível no vetor de nós, das folhas para a raiz."""
+    contagens = [n]
+    while True:
+        n = -(-n // tamanho_no)
+        contagens.append(n)
+        if n == 1:
+            break
+    total = sum(contagens)
+    limites = []
+    for contagem in contagens:
+        total -= contagem
+        limites.append((total, total + contagem))
+    return limites
+
+
+def arvore_hilbert(caixas, tamanhos, tamanho_no=TAMANHO_NO_PADRAO):
+    """
+    Índice PackedRTree de features já em ordem de Hilbert: `caixas` (n, 4)
+    e `tamanhos` (bytes de cada feature, com prefixo). Retorna os nós
+    (array estruturado, raiz primeiro) prontos para gravar.
+    """
+    limites = _limites_niveis(len(caixas), tamanho_no)
+    nos = np.zeros(limites[0][1], dtype=_ITEM_NO)
+    folhas = nos[limites[0][0]:]
+    for k, campo in enumerate(("min_x", "min_y", "max_x", "max_y")):
+        folhas[campo] = caixas[:, k]
+    folhas["deslocamento"] = np.r_[0, np.cumsum(tamanhos)[:-1]]
+
+    # Cada nó interno cobre `tamanho_no` nós consecutivos do nível de baixo;
+    # o deslocamento dele é a posição do primeiro filho no vetor de nós
+    for (inicio, fim), (inicio_pai, _) in zip(limites[:-1], limites[1:]):
+        filhos = nos[inicio:fim]
+        cortes = np.arange(0, fim - inicio, tamanho_no)
+        pais = nos[inicio_pai:inicio_pai + len(cortes)]
+        pais["min_x"] = np.minimum.reduceat(filhos["min_x"], cortes)
+        pais["min_y"] = np.minimum.reduceat(filhos["min_y"], cortes)
+        pais["max_x"] = np.maximum.reduceat(filhos["max_x"], cortes)
+        pais["max_y"] = np.maximum.reduceat(filhos["max_y"], cortes)
+        pais["deslocamento"] = inicio + cortes
+    return nos
+
+
+# ============================================================================
+# ARQUIVO
+# ============================================================================
+
+def _cabecalho(nome, tipo, colunas, n_features, caixa, tamanho_no):
+    campos = [
+        (0, "str", nome),
+        (1, ("vetor", "<f8"), caixa),
+        (2, "B", tipo),
+        (7, "tabelas", [[(0, "str", c), (1, "B", t)] for c, t in colunas]),
+        (8, "Q", n_features),
+        (9, "H", tamanho_no),
+        (10, "tabela", [(0, "str", "EPSG"), (1, "i", 4326)]),
+    ]
+    return _Construtor().finalizar(campos)
+
+
+def salvar_flatgeobuf(caminho, nome, features, tipo, colunas, tamanho_no=TAMANHO_NO_PADRAO):
+    """
+    Grava as `features` GeoJSON (qualquer iterável, lido uma única vez) em
+    `caminho`. `tipo` é TIPO_PONTO ou TIPO_MULTIPOLIGONO (Polygon e
+    MultiPolygon viram MultiPolygon); `colunas` vem de colunas_features ou
+    colunas_dataframe. Features sem geometria são ignoradas. Retorna o
+    número de features gravadas.
+    """
+    caminho = Path(caminho)
+    caixas, posicoes, tamanhos = [], [], []
+    with tempfile.TemporaryFile(dir=caminho.parent) as temporario:
+        for feature in features:
+            if not feature.get("geometry"):
+                continue
+            dados, caixa = _feature(feature, tipo, colunas)
+            posicoes.append(temporario.tell())
+            tamanhos.append(len(dados))
+            caixas.append(caixa)
+            temporario.write(dados)
+
+        caixas = np.array(caixas, dtype=float).reshape(-1, 4)
+        tamanhos = np.array(tamanhos, dtype=np.int64)
+        ordem = indice_hilbert((caixas[:, 0] + caixas[:, 2]) / 2, (caixas[:, 1] + caixas[:, 3]) / 2)
+        ordem = np.argsort(ordem, kind="stable")
+        caixa_total = ([caixas[:, 0].min(), caixas[:, 1].min(), caixas[:, 2].max(), caixas[:, 3].max()]
+                       if len(caixas) else None)
+
+        parcial = caminho.with_name(caminho.name + ".tmp")
+        with open(parcial, "wb") as f:
+            f.write(MAGICA)
+            f.write(_cabecalho(nome, tipo, colunas, len(caixas), caixa_total,
+                               tamanho_no if len(caixas) else 0))
+            if len(caixas):
+                f.write(arvore_hilbert(caixas[ordem], tamanhos[ordem], tamanho_no).tobytes())
+            for k in ordem:
+                temporario.seek(posicoes[k])
+                f.write(temporario.read(tamanhos[k]))
+        parcial.replace(caminho)
+    return len(caixas)
+
+
+def salvar_flatgeobuf_pontos(caminho, nome, df, lon="longitude", lat="latitude"):
+    """Grava as linhas de um DataFrame com coordenadas como pontos (demais colunas = atributos)."""
+    df = df[df[lon].notna() & df[lat].notna()]
+    atributos = df.drop(columns=[lon, lat])
+    colunas = colunas_dataframe(atributos)
+    linhas = atributos.astype(object).where(atributos.notna(), None).to_dict("records")
+    features = ({"geometry": {"type": "Point", "coordinates": [x, y]}, "properties": p}
+                for x, y, p in zip(df[lon].to_numpy(dtype=float), df[lat].to_numpy(dtype=float), linhas))
+    return salvar_flatgeobuf(caminho, nome, features, TIPO_PONTO, colunas)
@@ -0,0 +1,359 @@
+"""
+Geometria Vetorizada por Grupos
+Operações em NumPy sobre pontos agrupados (ex.: por UBS/microárea), que
+processam todos os grupos de uma vez sobre arrays contíguos em vez de
+laços Python por grupo.
+
+Convenção: `codigos` é um array de inteiros 0..n_grupos-1 (um por ponto),
+como o retornado por pandas.factorize.
+"""
+
+import numpy as np
+
+from triangulacao import contorno_concavo
+
+KM_POR_GRAU_LAT = 111.0
+
+# Pontos a até essa distância (graus, ~0,1 mm) do contorno estão "sobre a borda"
+TOLERANCIA_BORDA = 1e-9
+
+# Bounding box de Nossa Senhora do Socorro
+BBOX_NSS = {
+    "lat_min": -11.05, "lat_max": -10.75,
+    "lon_min": -37.25, "lon_max": -37.00
+}
+
+# Parâmetros padrão do filtro de outliers
+LIMIAR_MAD = 3.5               # desvios robustos acima da mediana das distâncias
+DISTANCIA_MINIMA_OUTLIER_KM = 0.5  # nunca descarta pontos mais próximos que isso
+MAX_DISTANCIA_OUTLIER_KM = 5.0     # sempre descarta pontos mais distantes que isso
+MIN_PONTOS_FILTRO = 3              # grupos menores não são filtrados
+
+# Fator que torna o MAD um estimador consistente do desvio padrão
+FATOR_MAD = 1.4826
+
+
+def km_por_grau_lon(lat):
+    return KM_POR_GRAU_LAT * np.cos(np.radians(lat))
+
+
+def contagem_por_grupo(codigos, n_grupos):
+    return np.bincount(codigos, minlength=n_grupos)
+
+
+def mediana_por_grupo(valores, codigos, n_grupos):
+    """Mediana de `valores` em cada grupo (NaN para grupos vazios)."""
+    valores = np.asarray(valores, dtype=float)
+    ordem = np.lexsort((valores, codigos))
+    ordenados = valores[ordem]
+    contagem = contagem_por_grupo(codigos, n_grupos)
+    inicio = np.cumsum(contagem) - contagem
+
+    mediana = np.full(n_grupos, np.nan)
+    cheios = contagem > 0
+    baixo = inicio[cheios] + (contagem[cheios] - 1) // 2
+    alto = inicio[cheios] + contagem[cheios] // 2
+    mediana[cheios] = (ordenados[baixo] + ordenados[alto]) / 2
+    return mediana
+
+
+def filtrar_outliers(lon, lat, codigos, n_grupos,
+                     limiar_mad=LIMIAR_MAD,
+                     distancia_min_km=DISTANCIA_MINIMA_OUTLIER_KM,
+                     distancia_max_km=MAX_DISTANCIA_OUTLIER_KM,
+                     min_pontos=MIN_PONTOS_FILTRO):
+    """
+    Filtro robusto de outliers para todos os grupos em uma passada.
+
+    Para cada grupo, o centro é a mediana coordenada a coordenada (um único
+    geocódigo ruim não o desloca) e cada ponto é descartado se:
+      - "distancia_maxima": está a mais de `distancia_max_km` do centro; ou
+      - "mad": sua distância supera mediana + limiar_mad × 1.4826 × MAD das
+        distâncias do grupo e também `distancia_min_km`.
+    Grupos com menos de `min_pontos` pontos são mantidos integralmente.
+
+    Retorna um dict com arrays por ponto: mantido (bool), motivo (str ou None),
+    distancia_km, limite_km; e por grupo: centro_lon, centro_lat.
+    """
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    codigos = np.asarray(codigos)
+
+    centro_lon = mediana_por_grupo(lon, codigos, n_grupos)
+    centro_lat = mediana_por_grupo(lat, codigos, n_grupos)
+
+    dx = (lon - centro_lon[codigos]) * km_por_grau_lon(centro_lat[codigos])
+    dy = (lat - centro_lat[codigos]) * KM_POR_GRAU_LAT
+    distancia = np.hypot(dx, dy)
+
+    mediana_d = mediana_por_grupo(distancia, codigos, n_grupos)
+    mad = mediana_por_grupo(np.abs(distancia - mediana_d[codigos]), codigos, n_grupos)
+    limite = np.maximum(mediana_d + limiar_mad * FATOR_MAD * mad, distancia_min_km)
+    limite = np.minimum(limite, distancia_max_km)[codigos]
+
+    filtravel = (contagem_por_grupo(codigos, n_grupos) >= min_pontos)[codigos]
+    excede_max = filtravel & (distancia > distancia_max_km)
+    excede_mad = filtravel & ~excede_max & (distancia > limite)
+
+    motivo = np.full(len(lon), None, dtype=object)
+    motivo[excede_max] = "distancia_maxima"
+    motivo[excede_mad] = "mad"
+
+    return {
+        "mantido": ~(excede_max | excede_mad),
+        "motivo": motivo,
+        "distancia_km": distancia,
+        "limite_km": limite,
+        "centro_lon": centro_lon,
+        "centro_lat": centro_lat,
+    }
+
+
+def pontos_na_borda(px, py, anel_x, anel_y, tolerancia=TOLERANCIA_BORDA):
+    """True para cada ponto a até `tolerancia` (graus) de alguma aresta do anel."""
+    px = np.asarray(px, dtype=float)
+    py = np.asarray(py, dtype=float)
+    anel_x = np.asarray(anel_x, dtype=float)
+    anel_y = np.asarray(anel_y, dtype=float)
+    na_borda = np.zeros(len(px), dtype=bool)
+    for x1, y1, x2, y2 in zip(anel_x, anel_y, np.roll(anel_x, -1), np.roll(anel_y, -1)):
+        dx, dy = x2 - x1, y2 - y1
+        comprimento2 = dx * dx + dy * dy
+        t = np.clip(((px - x1) * dx + (py - y1) * dy) / comprimento2, 0, 1) if comprimento2 else 0.0
+        na_borda |= (px - x1 - t * dx) ** 2 + (py - y1 - t * dy) ** 2 <= tolerancia ** 2
+    return na_borda
+
+
+def pontos_em_anel(px, py, anel_x, anel_y, borda=False):
+    """
+    Ray casting vetorizado: True para cada ponto (px, py) dentro do anel
+    (anel_x, anel_y), fechado ou não. Um laço por aresta, vetorizado sobre
+    todos os pontos. Com `borda`, pontos sobre o contorno contam como dentro.
+    """
+    px = np.asarray(px, dtype=float)
+    py = np.asarray(py, dtype=float)
+    anel_x = np.asarray(anel_x, dtype=float)
+    anel_y = np.asarray(anel_y, dtype=float)
+    dentro = np.zeros(len(px), dtype=bool)
+    for x1, y1, x2, y2 in zip(anel_x, anel_y, np.roll(anel_x, -1), np.roll(anel_y, -1)):
+        if y1 == y2:
+            continue
+        cruza = (y1 > py) != (y2 > py)
+        dentro ^= cruza & (px < x1 + (py - y1) * (x2 - x1) / (y2 - y1))
+    if borda:
+        dentro |= pontos_na_borda(px, py, anel_x, anel_y)
+    return dentro
+
+
+def aneis_geometria(geometria):
+    """Todos os anéis (externos e buracos) de um Polygon ou MultiPolygon GeoJSON."""
+    if geometria["type"] == "Polygon":
+        return geometria["coordinates"]
+    return [anel for poligono in geometria["coordinates"] for anel in poligono]
+
+
+def pontos_em_geometria(px, py, geometria, borda=False):
+    """
+    True para cada ponto dentro de um Polygon/MultiPolygon GeoJSON (regra
+    par-ímpar sobre todos os anéis, o que já desconta os buracos). Com
+    `borda`, pontos sobre qualquer contorno contam como dentro.
+    """
+    dentro = np.zeros(len(px), dtype=bool)
+    na_borda = np.zeros(len(px), dtype=bool)
+    for anel in aneis_geometria(geometria):
+        anel = np.asarray(anel, dtype=float)
+        dentro ^= pontos_em_anel(px, py, anel[:, 0], anel[:, 1])
+        if borda:
+            na_borda |= pontos_na_borda(px, py, anel[:, 0], anel[:, 1])
+    return dentro | na_borda
+
+
+# ----------------------------------------------------------------------------
+# CONVEX HULL EM LOTE
+# ----------------------------------------------------------------------------
+
+# Meia-largura (graus) dos retângulos criados para grupos com menos de 3 pontos
+BUFFER_1_PONTO = 0.002
+BUFFER_2_PONTOS = 0.001
+
+
+def _distintos_ordenados(x, y, codigos):
+    """Pontos distintos de cada grupo, ordenados por (grupo, x, y)."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    codigos = np.asarray(codigos)
+
+    ordem = np.lexsort((y, x, codigos))
+    g, px, py = codigos[ordem], x[ordem], y[ordem]
+    distinto = np.ones(len(g), dtype=bool)
+    distinto[1:] = (g[1:] != g[:-1]) | (px[1:] != px[:-1]) | (py[1:] != py[:-1])
+    return g[distinto], px[distinto], py[distinto]
+
+
+def _cadeia_convexa(g, x, y):
+    """
+    Cadeia convexa inferior de cada grupo, para pontos já ordenados por
+    (grupo, x, y): monotone chain com pilha, grupo a grupo, O(n) depois da
+    ordenação. Um ponto sai da pilha quando não faz uma curva à esquerda
+    com os dois anteriores (produto vetorial <= 0).
+    Retorna os índices dos pontos que formam as cadeias.
+    """
+    if len(g) == 0:
+        return np.empty(0, dtype=np.int64)
+    limites = np.flatnonzero(np.r_[True, g[1:] != g[:-1], True]).tolist()
+    xs, ys = x.tolist(), y.tolist()
+    cadeias = []
+    for a, b in zip(limites[:-1], limites[1:]):
+        pilha = []
+        for i in range(a, b):
+            while len(pilha) >= 2:
+                o, p = pilha[-2], pilha[-1]
+                if (xs[p] - xs[o]) * (ys[i] - ys[o]) - (ys[p] - ys[o]) * (xs[i] - xs[o]) > 0:
+                    break
+                pilha.pop()
+            pilha.append(i)
+        cadeias.extend(pilha)
+    return np.array(cadeias, dtype=np.int64)
+
+
+def _sem_ultimo_de_cada_grupo(g):
+    """Máscara que exclui o último elemento de cada sequência de grupo."""
+    manter = np.ones(len(g), dtype=bool)
+    if len(g):
+        manter[:-1] = g[:-1] == g[1:]
+        manter[-1] = False
+    return manter
+
+
+def convex_hull_grupos(x, y, codigos, n_grupos):
+    """
+    Convex hull (monotone chain) de todos os grupos em lote.
+
+    Ordena os pontos por (grupo, x, y) uma única vez, remove duplicatas e
+    calcula as cadeias inferior e superior de cada grupo com uma pilha.
+    Grupos com menos de 3 pontos distintos retornam seus próprios pontos.
+
+    Retorna (hx, hy, inicio): os vértices do grupo k, em ordem anti-horária,
+    são hx[inicio[k]:inicio[k + 1]] (sem repetir o primeiro vértice).
+    """
+    g, px, py = _distintos_ordenados(x, y, codigos)
+
+    n_distintos = contagem_por_grupo(g, n_grupos)
+    pequeno = (n_distintos < 3)[g]
+
+    # Cadeia inferior (ordem crescente) e superior (mesma rotina na ordem inversa)
+    inf = _cadeia_convexa(g, px, py)
+    inf = inf[_sem_ultimo_de_cada_grupo(g[inf])]
+    inv = np.arange(len(g))[::-1]
+    sup = inv[_cadeia_convexa(g[inv], px[inv], py[inv])]
+    sup = sup[_sem_ultimo_de_cada_grupo(g[sup])]
+
+    # Monta cada hull como inferior + superior; grupos pequenos usam todos os pontos
+    idx = np.concatenate([inf[~pequeno[inf]], sup[~pequeno[sup]], np.flatnonzero(pequeno)])
+    parte = np.concatenate([
+        np.zeros((~pequeno[inf]).sum(), dtype=np.int8),
+        np.ones((~pequeno[sup]).sum(), dtype=np.int8),
+        np.zeros(pequeno.sum(), dtype=np.int8),
+    ])
+    posicao = np.arange(len(idx))
+    ordem_hull = np.lexsort((posicao, parte, g[idx]))
+    idx = idx[ordem_hull]
+
+    tamanhos = contagem_por_grupo(g[idx], n_grupos)
+    inicio = np.concatenate([[0], np.cumsum(tamanhos)])
+    return px[idx], py[idx], inicio
+
+
+def aneis_convexos(x, y, codigos, n_grupos,
+                   buffer_1=BUFFER_1_PONTO, buffer_2=BUFFER_2_PONTOS):
+    """
+    Anéis fechados (prontos para GeoJSON) de todos os grupos: o convex hull
+    quando há 3+ vértices; um quadrado de meia-largura `buffer_1` em torno de
+    um ponto isolado; ou um retângulo com folga `buffer_2` ligando dois pontos.
+
+    Retorna (coords, inicio): o anel do grupo k é coords[inicio[k]:inicio[k + 1]],
+    um array (m, 2) de [lon, lat] com o primeiro vértice repetido no final.
+    """
+    hx, hy, h_inicio = convex_hull_grupos(x, y, codigos, n_grupos)
+    tamanhos = np.diff(h_inicio)
+    primeiro = h_inicio[:-1]
+
+    # Hull com 3+ vértices: fecha o anel repetindo o primeiro vértice
+    g_hull = np.repeat(np.arange(n_grupos), tamanhos)
+    fechamento = np.flatnonzero(tamanhos >= 3)
+    em_hull = (tamanhos >= 3)[g_hull]
+    partes_g = [g_hull[em_hull], fechamento]
+    partes_x = [hx[em_hull], hx[primeiro[fechamento]]]
+    partes_y = [hy[em_hull], hy[primeiro[fechamento]]]
+
+    # Um ponto: quadrado; dois pontos: retângulo entre p1 (esquerda) e p2.
+    # Cantos 0, 3 e 4 partem de p1; cantos 1 e 2 partem de p2.
+    cantos = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1], [-1, -1]], dtype=float)
+    de_p2 = np.array([False, True, True, False, False])
+    um = np.flatnonzero(tamanhos == 1)
+    dois = np.flatnonzero(tamanhos == 2)
+    for grupos, p_dir, buffer in ((um, primeiro[um], buffer_1),
+                                  (dois, primeiro[dois] + 1, buffer_2)):
+        fonte = np.where(de_p2[None, :], p_dir[:, None], primeiro[grupos][:, None])
+        partes_g.append(np.repeat(grupos, 5))
+        partes_x.append((hx[fonte] + buffer * cantos[None, :, 0]).ravel())
+        partes_y.append((hy[fonte] + buffer * cantos[None, :, 1]).ravel())
+
+    g_todos = np.concatenate(partes_g)
+    x_todos = np.concatenate(partes_x)
+    y_todos = np.concatenate(partes_y)
+    ordem = np.argsort(g_todos, kind="stable")
+    tamanhos = contagem_por_grupo(g_todos, n_grupos)
+    inicio = np.concatenate([[0], np.cumsum(tamanhos)])
+    return np.column_stack([x_todos[ordem], y_todos[ordem]]), inicio
+
+
+# ----------------------------------------------------------------------------
+# CONTORNO CÔNCAVO
+# ----------------------------------------------------------------------------
+
+# Arestas do contorno côncavo mais longas que isso são "escavadas"
+COMPRIMENTO_MAX_ARESTA_KM = 0.3
+
+
+def aneis_concavos(x, y, codigos, n_grupos,
+                   comprimento_max_km=COMPRIMENTO_MAX_ARESTA_KM,
+                   buffer_1=BUFFER_1_PONTO, buffer_2=BUFFER_2_PONTOS):
+    """
+    Como aneis_convexos, mas com o contorno côncavo (χ-shape sobre a
+    triangulação de Delaunay) de cada grupo: arestas do contorno mais longas
+    que `comprimento_max_km` são removidas enquanto o anel continuar simples e
+    contendo todos os pontos. Grupos com menos de 3 pontos distintos ou
+    colineares recebem o anel de aneis_convexos (buffer).
+
+    Retorna (coords, inicio), no mesmo formato de aneis_convexos.
+    """
+    convexos, c_inicio = aneis_convexos(x, y, codigos, n_grupos, buffer_1, buffer_2)
+    g, px, py = _distintos_ordenados(x, y, codigos)
+    contagem = contagem_por_grupo(g, n_grupos)
+    g_inicio = np.cumsum(contagem) - contagem
+
+    partes = []
+    for k in range(n_grupos):
+        anel = None
+        if contagem[k] >= 3:
+            gx = px[g_inicio[k]:g_inicio[k] + contagem[k]]
+            gy = py[g_inicio[k]:g_inicio[k] + contagem[k]]
+            # Projeção local em km para que o limite de comprimento seja isotrópico
+            lat0 = gy.mean()
+            vertices = contorno_concavo(
+                (gx - gx.mean()) * km_por_grau_lon(lat0),
+                (gy - lat0) * KM_POR_GRAU_LAT,
+                comprimento_max_km,
+            )
+            if vertices is not None:
+                vertices = np.append(vertices, vertices[0])
+                anel = np.column_stack([gx[vertices], gy[vertices]])
+        if anel is None:
+            anel = convexos[c_inicio[k]:c_inicio[k + 1]]
+        partes.append(anel)
+
+    tamanhos = [len(anel) for anel in partes]
+    inicio = np.concatenate([[0], np.cumsum(tamanhos)]).astype(np.int64)
+    coords = np.concatenate(partes) if partes else np.empty((0, 2))
+    return coords, inicio
@@ -0,0 +1,306 @@
+"""
+Escrita de GeoPackage (OGC) com a biblioteca padrão (sqlite3)
+Usado por gerar_poligonos.py --gpkg para gravar todas as camadas do
+projeto em um único arquivo que o QGIS abre sem reprocessar o GeoJSON.
+
+Cada camada é uma tabela de features (fid, geom, atributos) com:
+- geometria no formato GeoPackageBinary (cabeçalho GP + WKB), EPSG:4326
+- índice espacial R-tree (extensão gpkg_rtree_index, com os triggers
+  padrão que o QGIS/GDAL usam para mantê-lo ao editar)
+- índices de atributo nas colunas pedidas (ex.: ubs_referencia, micro_area)
+
+Os pontos (endereços) são codificados em lote com NumPy; o arquivo é
+gravado em um temporário e renomeado no fim, para que o QGIS nunca abra
+um GeoPackage pela metade.
+"""
+
+import json
+import math
+import sqlite3
+import struct
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SRS_ID = 4326
+
+WKT_4326 = (
+    'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563,'
+    'AUTHORITY["EPSG","7030"]],AUTHORITY["EPSG","6326"]],PRIMEM["Greenwich",0,'
+    'AUTHORITY["EPSG","8901"]],UNIT["degree",0.0174532925199433,AUTHORITY["EPSG","9122"]],'
+    'AUTHORITY["EPSG","4326"]]'
+)
+
+ESQUEMA = """
+CREATE TABLE gpkg_spatial_ref_sys (
+    srs_name                 TEXT NOT NULL,
+    srs_id                   INTEGER PRIMARY KEY,
+    organization             TEXT NOT NULL,
+    organization_coordsys_id INTEGER NOT NULL,
+    definition               TEXT NOT NULL,
+    description              TEXT
+);
+
+CREATE TABLE gpkg_contents (
+    table_name  TEXT NOT NULL PRIMARY KEY,
+    data_type   TEXT NOT NULL,
+    identifier  TEXT UNIQUE,
+    description TEXT DEFAULT '',
+    last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+    min_x       DOUBLE,
+    min_y       DOUBLE,
+    max_x       DOUBLE,
+    max_y       DOUBLE,
+    srs_id      INTEGER,
+    CONSTRAINT fk_gc_r_srs_id FOREIGN KEY (srs_id) REFERENCES gpkg_spatial_ref_sys (srs_id)
+);
+
+CREATE TABLE gpkg_geometry_columns (
+    table_name         TEXT NOT NULL,
+    column_name        TEXT NOT NULL,
+    geometry_type_name TEXT NOT NULL,
+    srs_id             INTEGER NOT NULL,
+    z                  TINYINT NOT NULL,
+    m                  TINYINT NOT NULL,
+    CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name),
+    CONSTRAINT fk_gc_tn FOREIGN KEY (table_name) REFERENCES gpkg_contents (table_name),
+    CONSTRAINT fk_gc_srs FOREIGN KEY (srs_id) REFERENCES gpkg_spatial_ref_sys (srs_id)
+);
+
+CREATE TABLE gpkg_extensions (
+    table_name     TEXT,
+    column_name    TEXT,
+    extension_name TEXT NOT NULL,
+    definition     TEXT NOT NULL,
+    scope          TEXT NOT NULL,
+    CONSTRAINT ge_tce UNIQUE (table_name, column_name, extension_name)
+);
+
+CREATE TABLE gpkg_tile_matrix_set (
+    table_name TEXT NOT NULL PRIMARY KEY,
+    srs_id     INTEGER NOT NULL,
+    min_x      DOUBLE NOT NULL,
+    min_y      DOUBLE NOT NULL,
+    max_x      DOUBLE NOT NULL,
+    max_y      DOUBLE NOT NULL
+);
+
+CREATE TABLE gpkg_tile_matrix (
+    table_name    TEXT NOT NULL,
+    zoom_level    INTEGER NOT NULL,
+    matrix_width  INTEGER NOT NULL,
+    matrix_height INTEGER NOT NULL,
+    tile_width    INTEGER NOT NULL,
+    tile_height   INTEGER NOT NULL,
+    pixel_x_size  DOUBLE NOT NULL,
+    pixel_y_size  DOUBLE NOT NULL,
+    CONSTRAINT pk_ttm PRIMARY KEY (table_name, zoom_level)
+);
+"""
+
+# Triggers padrão da extensão gpkg_rtree_index (GeoPackage 1.2)
+TRIGGERS_RTREE = """
+CREATE TRIGGER "rtree_{t}_geom_insert" AFTER INSERT ON "{t}"
+  WHEN (NEW.geom NOT NULL AND NOT ST_IsEmpty(NEW.geom))
+BEGIN
+  INSERT OR REPLACE INTO "rtree_{t}_geom" VALUES (
+    NEW.fid, ST_MinX(NEW.geom), ST_MaxX(NEW.geom), ST_MinY(NEW.geom), ST_MaxY(NEW.geom));
+END;
+CREATE TRIGGER "rtree_{t}_geom_update1" AFTER UPDATE OF geom ON "{t}"
+  WHEN OLD.fid = NEW.fid AND (NEW.geom NOTNULL AND NOT ST_IsEmpty(NEW.geom))
+BEGIN
+  INSERT OR REPLACE INTO "rtree_{t}_geom" VALUES (
+    NEW.fid, ST_MinX(NEW.geom), ST_MaxX(NEW.geom), ST_MinY(NEW.geom), ST_MaxY(NEW.geom));
+END;
+CREATE TRIGGER "rtree_{t}_geom_update2" AFTER UPDATE OF geom ON "{t}"
+  WHEN OLD.fid = NEW.fid AND (NEW.geom ISNULL OR ST_IsEmpty(NEW.geom))
+BEGIN
+  DELETE FROM "rtree_{t}_geom" WHERE id = OLD.fid;
+END;
+CREATE TRIGGER "rtree_{t}_geom_update3" AFTER UPDATE ON "{t}"
+  WHEN OLD.fid != NEW.fid AND (NEW.geom NOTNULL AND NOT ST_IsEmpty(NEW.geom))
+BEGIN
+  DELETE FROM "rtree_{t}_geom" WHERE id = OLD.fid;
+  INSERT OR REPLACE INTO "rtree_{t}_geom" VALUES (
+    NEW.fid, ST_MinX(NEW.geom), ST_MaxX(NEW.geom), ST_MinY(NEW.geom), ST_MaxY(NEW.geom));
+END;
+CREATE TRIGGER "rtree_{t}_geom_update4" AFTER UPDATE ON "{t}"
+  WHEN OLD.fid != NEW.fid AND (NEW.geom ISNULL OR ST_IsEmpty(NEW.geom))
+BEGIN
+  DELETE FROM "rtree_{t}_geom" WHERE id IN (OLD.fid, NEW.fid);
+END;
+CREATE TRIGGER "rtree_{t}_geom_delete" AFTER DELETE ON "{t}"
+  WHEN OLD.geom NOT NULL
+BEGIN
+  DELETE FROM "rtree_{t}_geom" WHERE id = OLD.fid;
+END;
+"""
+
+# Cabeçalho GeoPackageBinary: "GP", versão 0, flags (bit 0 = little endian,
+# bits 1-3 = tipo de envelope), srs_id
+_FLAGS_SEM_ENVELOPE = 0b0000_0001
+_FLAGS_ENVELOPE_XY = 0b0000_0011
+
+_PONTO = np.dtype([("magica", "S2"), ("versao", "u1"), ("flags", "u1"), ("srs", "<i4"),
+                   ("ordem", "u1"), ("tipo", "<u4"), ("x", "<f8"), ("y", "<f8")])
+
+
+def pontos_gpkg(lon, lat):
+    """Blobs GeoPackageBinary de pontos (arrays lon/lat), codificados em lote."""
+    registros = np.zeros(len(lon), dtype=_PONTO)
+    registros["magica"] = b"GP"
+    registros["flags"] = _FLAGS_SEM_ENVELOPE
+    registros["srs"] = SRS_ID
+    registros["ordem"] = 1
+    registros["tipo"] = 1  # WKB Point
+    registros["x"] = lon
+    registros["y"] = lat
+    tamanho = _PONTO.itemsize
+    dados = registros.tobytes()
+    return [dados[i:i + tamanho] for i in range(0, len(dados), tamanho)]
+
+
+def multipoligono_gpkg(geometria):
+    """
+    Blob GeoPackageBinary (MultiPolygon, com envelope) de um
+    Polygon/MultiPolygon GeoJSON. Retorna (blob, (minx, maxx, miny, maxy)).
+    """
+    poligonos = ([geometria["coordinates"]] if geometria["type"] == "Polygon"
+                 else geometria["coordinates"])
+    partes = [struct.pack("<BII", 1, 6, len(poligonos))]
+    minimo, maximo = np.full(2, np.inf), np.full(2, -np.inf)
+    for poligono in poligonos:
+        partes.append(struct.pack("<BII", 1, 3, len(poligono)))
+        for anel in poligono:
+            coords = np.asarray(anel, dtype="<f8").reshape(-1, 2)
+            minimo = np.minimum(minimo, coords.min(axis=0))
+            maximo = np.maximum(maximo, coords.max(axis=0))
+            partes.append(struct.pack("<I", len(coords)))
+            partes.append(coords.tobytes())
+    envelope = (minimo[0], maximo[0], minimo[1], maximo[1])
+    cabecalho = struct.pack("<2sBBi4d", b"GP", 0, _FLAGS_ENVELOPE_XY, SRS_ID, *envelope)
+    return cabecalho + b"".join(partes), envelope
+
+
+def _tipo_sql(valores):
+    """Tipo SQLite de uma coluna a partir dos valores (None ignorado)."""
+    valores = [v for v in valores if v is not None]
+    if valores and all(isinstance(v, bool) for v in valores):
+        return "BOOLEAN"
+    if valores and all(isinstance(v, int) and not isinstance(v, bool) for v in valores):
+        return "INTEGER"
+    if valores and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in valores):
+        return "REAL"
+    return "TEXT"
+
+
+def _valor_sql(valor):
+    if isinstance(valor, (list, dict)):
+        return json.dumps(valor, ensure_ascii=False)
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    return valor
+
+
+class GeoPackage:
+    """GeoPackage novo (sobrescreve o arquivo). Usar como context manager."""
+
+    def __init__(self, caminho):
+        self.caminho = Path(caminho)
+        self._temporario = self.caminho.with_name(self.caminho.name + ".tmp")
+        self._temporario.unlink(missing_ok=True)
+        self.conexao = sqlite3.connect(self._temporario)
+        self.conexao.execute("PRAGMA application_id = 1196444487")  # "GPKG"
+        self.conexao.execute("PRAGMA user_version = 10200")
+        self.conexao.executescript(ESQUEMA)
+        self.conexao.executemany(
+            "INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)",
+            [("Undefined cartesian SRS", -1, "NONE", -1, "undefined", "undefined cartesian coordinate reference system"),
+             ("Undefined geographic SRS", 0, "NONE", 0, "undefined", "undefined geographic coordinate reference system"),
+             ("WGS 84 geodetic", SRS_ID, "EPSG", SRS_ID, WKT_4326, "longitude/latitude coordinates in decimal degrees on the WGS 84 spheroid")],
+        )
+
+    def _camada(self, nome, tipo_geometria, colunas, linhas, envelopes, indices, descricao):
+        """
+        Cria a tabela `nome` com as `colunas` (dict nome → tipo SQL) e insere
+        as `linhas` ((geom, valores...)); `envelopes` é um array (n, 4) com
+        minx, maxx, miny, maxy de cada feature para a R-tree.
+        """
+        definicoes = ", ".join(f'"{c}" {t}' for c, t in colunas.items())
+        self.conexao.execute(
+            f'CREATE TABLE "{nome}" (fid INTEGER PRIMARY KEY AUTOINCREMENT, geom {tipo_geometria}'
+            + (f", {definicoes}" if definicoes else "") + ")"
+        )
+        marcadores = ", ".join("?" * (len(colunas) + 1))
+        nomes = ", ".join(["geom"] + [f'"{c}"' for c in colunas])
+        self.conexao.executemany(f'INSERT INTO "{nome}" ({nomes}) VALUES ({marcadores})', linhas)
+
+        # Índice espacial (fid = 1..n, na ordem de inserção)
+        self.conexao.execute(f'CREATE VIRTUAL TABLE "rtree_{nome}_geom" USING rtree(id, minx, maxx, miny, maxy)')
+        self.conexao.executemany(
+            f'INSERT INTO "rtree_{nome}_geom" VALUES (?, ?, ?, ?, ?)',
+            ((k + 1, *map(float, e)) for k, e in enumerate(envelopes)),
+        )
+        self.conexao.executescript(TRIGGERS_RTREE.format(t=nome))
+        for indice in indices:
+            self.conexao.execute(
+                f'CREATE INDEX "idx_{nome}_{"_".join(indice)}" ON "{nome}" ({", ".join(indice)})'
+            )
+
+        envelopes = np.asarray(envelopes, dtype=float).reshape(-1, 4)
+        caixa = ((envelopes[:, 0].min(), envelopes[:, 2].min(), envelopes[:, 1].max(), envelopes[:, 3].max())
+                 if len(envelopes) else (None, None, None, None))
+        self.conexao.execute(
+            "INSERT INTO gpkg_contents (table_name, data_type, identifier, description, "
+            "min_x, min_y, max_x, max_y, srs_id) VALUES (?, 'features', ?, ?, ?, ?, ?, ?, ?)",
+            (nome, nome, descricao, *caixa, SRS_ID),
+        )
+        self.conexao.execute("INSERT INTO gpkg_geometry_columns VALUES (?, 'geom', ?, ?, 0, 0)",
+                             (nome, tipo_geometria, SRS_ID))
+        self.conexao.execute(
+            "INSERT INTO gpkg_extensions VALUES (?, 'geom', 'gpkg_rtree_index', "
+            "'http://www.geopackage.org/spec120/#extension_rtree', 'write-only')", (nome,)
+        )
+
+    def camada_poligonos(self, nome, features, indices=(), descricao=""):
+        """Camada MULTIPOLYGON a partir de features GeoJSON (Polygon/MultiPolygon)."""
+        features = [f for f in features if f.get("geometry")]
+        colunas = {}
+        for f in features:
+            for c in f["properties"]:
+                colunas.setdefault(c, None)
+        colunas = {c: _tipo_sql([f["properties"].get(c) for f in features]) for c in colunas}
+        linhas, envelopes = [], []
+        for f in features:
+            blob, envelope = multipoligono_gpkg(f["geometry"])
+            linhas.append((blob, *(_valor_sql(f["properties"].get(c)) for c in colunas)))
+            envelopes.append(envelope)
+        self._camada(nome, "MULTIPOLYGON", colunas, linhas, envelopes, indices, descricao)
+
+    def camada_pontos(self, nome, df, lon="longitude", lat="latitude", indices=(), descricao=""):
+        """Camada POINT a partir de um DataFrame (linhas sem coordenada são ignoradas)."""
+        df = df[df[lon].notna() & df[lat].notna()]
+        x, y = df[lon].to_numpy(dtype=float), df[lat].to_numpy(dtype=float)
+        atributos = df.drop(columns=[lon, lat])
+        colunas = {}
+        for c in atributos.columns:
+            tipo = atributos[c].dtype
+            colunas[c] = ("INTEGER" if pd.api.types.is_integer_dtype(tipo) else
+                          "BOOLEAN" if pd.api.types.is_bool_dtype(tipo) else
+                          "REAL" if pd.api.types.is_float_dtype(tipo) else "TEXT")
+        valores = atributos.astype(object).where(atributos.notna(), None).itertuples(index=False, name=None)
+        linhas = ((blob, *v) for blob, v in zip(pontos_gpkg(x, y), valores))
+        self._camada(nome, "POINT", colunas, linhas, np.column_stack([x, x, y, y]), indices, descricao)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_erro, *_):
+        if tipo_erro is None:
+            self.conexao.commit()
+        self.conexao.close()
+        if tipo_erro is None:
+            self._temporario.replace(self.caminho)
+        else:
+            self._temporario.unlink(missing_ok=True)
@@ -5,20 +5,22 @@ Gera CSV consolidado com todas as coordenadas e método de obtenção
 import pandas as pd
 from pathlib import Path
 
+from coordenadas_genericas import CENTROIDE_MUNICIPIO, is_coord_generica as nome_coord_generica
+
 # Diretórios
 BASE_DIR = Path(__file__).parent.parent
 DADOS_DIR = BASE_DIR / "dados"
 
-# Coordenada genérica que indica falha na geocodificação
-COORD_GENERICA = (-10.8531544, -37.1270097)
+# Tolerância para considerar uma coordenada igual ao centróide da cidade
 TOLERANCIA = 0.001
 
 def is_coord_generica(lat, lon):
     """Verifica se a coordenada é o centróide genérico da cidade"""
     if pd.isna(lat) or pd.isna(lon):
         return True
-    return (abs(lat - COORD_GENERICA[0]) < TOLERANCIA and 
-            abs(lon - COORD_GENERICA[1]) < TOLERANCIA)
+    # Só o centróide do município: os pontos de bairro/rua do registro são
+    # tratados depois por marcar_revisao.py
+    return nome_coord_generica(lat, lon, TOLERANCIA, CENTROIDE_MUNICIPIO) is not None
 
 def main():
     # 1. Carregar arquivo original
@@ -1,20 +1,72 @@
 """
 Geração de Polígonos Convex Hull para Microáreas de UBS
 Versão 3: Usa o CSV consolidado como fonte de dados
+
+Uso:
+    python gerar_poligonos.py [--modo convexo|concavo|voronoi] [--alfa-m 300] [--completo] [--processos 8]
+                              [--compacto [--precisao 6]] [--gzip] [--topojson] [--gpkg] [--fgb]
+
+No modo voronoi, o município (bbox) é dividido entre as microáreas pelo
+ponto geocodificado mais próximo: cobertura sem lacunas nem sobreposições.
+
+Regeneração incremental: os polígonos de cada microárea ficam em
+dados/cache_poligonos.json com uma impressão digital dos seus pontos. Só as
+microáreas cujos pontos mudaram (e a área da UBS a que pertencem) são
+recalculadas; as demais vêm do cache. --completo ignora o cache.
+
+Com --processos N, as UBS a recalcular são repartidas entre N processos
+(os pontos ficam em memória compartilhada, ver paralelo.py). A saída é a
+mesma da execução serial.
+
+--compacto grava os GeoJSON sem indentação e com as coordenadas
+arredondadas (--precisao casas, padrão 6 ≈ 10 cm); --gzip comprime os
+arquivos (.geojson.gz). O padrão continua legível (indent=2).
+
+--topojson grava também dados/microareas_ubs.topojson: microáreas e áreas
+das UBS em uma topologia de arcos compartilhados, quantizada e codificada
+em deltas (ver topologia.py). Dispensa o arquivo de linhas nos mapas web.
+
+--gpkg grava também dados/mapeamento.gpkg: um único GeoPackage com os
+pontos das UBS, as microáreas, as áreas das UBS e os endereços
+geocodificados, cada camada com índice espacial R-tree e índices em
+ubs_referencia/micro_area (ver geopackage.py). É o que o QGIS abre mais rápido.
+
+--fgb grava também dados/microareas_ubs.fgb, dados/ubs_areas.fgb e
+dados/enderecos.fgb (FlatGeobuf, ver flatgeobuf.py): com o índice R-tree no
+início do arquivo, o QGIS e os mapas web leem só as features da área visível
+(inclusive de um servidor HTTP, por requisições de intervalo).
 """
 
+import argparse
+import os
 import pandas as pd
-import json
-import math
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+from geometria import (
+    aneis_concavos,
+    aneis_convexos,
+    aneis_geometria,
+    filtrar_outliers,
+    LIMIAR_MAD,
+    DISTANCIA_MINIMA_OUTLIER_KM,
+    MAX_DISTANCIA_OUTLIER_KM,
+    COMPRIMENTO_MAX_ARESTA_KM,
+)
+from cache_poligonos import CachePoligonos, impressoes
+from flatgeobuf import TIPO_MULTIPOLIGONO, colunas_features, salvar_flatgeobuf, salvar_flatgeobuf_pontos
+from geopackage import GeoPackage
+from metricas_poligonos import metricas, propriedades_metricas
+from paralelo import TabelaCompartilhada, ler_fatia
+from relatorio import registros
+from saida_geojson import caminho_saida, salvar_geojson, salvar_topojson
+from topologia import QUANTIZACAO_PADRAO, Topologia
+from voronoi import particao_voronoi
+
 # ============================================================================
 # CONFIGURAÇÃO
 # ============================================================================
 
-# Distância máxima em km para considerar um ponto como outlier
-MAX_DISTANCIA_OUTLIER_KM = 5.0
-
 # Dados das UBS: Localização e cores para visualização
 UBS_INFO = {
     "Muciano Guajara": {
@@ -34,74 +86,175 @@ UBS_INFO = {
 }
 
 
-def distancia_km(p1, p2):
-    """Calcula distância aproximada em km entre dois pontos (lon, lat)."""
-    lat_media = (p1[1] + p2[1]) / 2
-    km_por_grau_lat = 111.0
-    km_por_grau_lon = 111.0 * math.cos(math.radians(lat_media))
-    
-    dlat = (p2[1] - p1[1]) * km_por_grau_lat
-    dlon = (p2[0] - p1[0]) * km_por_grau_lon
-    return math.sqrt(dlat**2 + dlon**2)
+# Colunas que definem uma microárea e colunas do CSV de pontos descartados
+CHAVES = ['ubs_referencia', 'micro_area']
+COLUNAS_DESCARTADOS = CHAVES + ['longitude', 'latitude', 'distancia_km', 'limite_km', 'motivo']
 
 
-def calcular_centroide(points):
-    """Calcula o centróide de um conjunto de pontos."""
-    if not points:
-        return None
-    n = len(points)
-    sum_lon = sum(p[0] for p in points)
-    sum_lat = sum(p[1] for p in points)
-    return (sum_lon / n, sum_lat / n)
+def parametros_cache(args):
+    """Parâmetros que, se mudarem, invalidam todo o cache de polígonos."""
+    return {
+        "modo": args.modo,
+        "alfa_m": args.alfa_m,
+        "limiar_mad": args.limiar_mad,
+        "distancia_min_km": args.distancia_min_km,
+        "distancia_max_km": args.distancia_max_km,
+        "ubs_info": UBS_INFO,
+    }
 
 
-def filtrar_outliers(points, max_dist_km=MAX_DISTANCIA_OUTLIER_KM):
-    """Remove pontos que estão muito distantes do centróide."""
-    if len(points) < 3:
-        return points
-    
-    centroide = calcular_centroide(points)
-    
-    pontos_filtrados = []
-    for p in points:
-        dist = distancia_km(p, centroide)
-        if dist <= max_dist_km:
-            pontos_filtrados.append(p)
-    
-    return pontos_filtrados
+def coordenadas_ubs(nomes):
+    """Arrays (lon, lat) do ponto de cada UBS em `nomes` (NaN se não estiver em UBS_INFO)."""
+    pontos = [UBS_INFO.get(nome, {}) for nome in nomes]
+    return ([p.get("longitude", float("nan")) for p in pontos],
+            [p.get("latitude", float("nan")) for p in pontos])
 
 
-def convex_hull(points):
+def construir_geometrias(pontos, chaves, args):
     """
-    Calcula o Convex Hull de um conjunto de pontos usando o algoritmo de Graham Scan.
-    Retorna os pontos do polígono em ordem anti-horária.
+    Constrói as geometrias GeoJSON de todos os grupos de `pontos` em lote,
+    conforme args.modo: convex hull ou contorno côncavo (buffer para menos de
+    3 pontos), ou a partição de Voronoi entre os grupos.
+    Retorna (rótulos dos grupos, nº de pontos por grupo, geometrias).
     """
-    def cross(o, a, b):
-        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
-    
-    points = list(set(points))
-    
-    if len(points) < 3:
-        return points
-    
-    points = sorted(points)
-    
-    lower = []
-    for p in points:
-        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
-            lower.pop()
-        lower.append(p)
-    
-    upper = []
-    for p in reversed(points):
-        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
-            upper.pop()
-        upper.append(p)
-    
-    return lower[:-1] + upper[:-1]
+    agrupado = pontos.groupby(chaves, sort=False)
+    tamanhos = agrupado.size()
+    lon = pontos['longitude'].to_numpy()
+    lat = pontos['latitude'].to_numpy()
+    codigos = agrupado.ngroup().to_numpy()
+    if args.modo == "voronoi":
+        por_codigo = particao_voronoi(lon, lat, codigos, pontos['num_enderecos'].to_numpy())
+        geometrias = [por_codigo.get(k) for k in range(len(tamanhos))]
+    else:
+        if args.modo == "concavo":
+            coords, inicio = aneis_concavos(lon, lat, codigos, len(tamanhos),
+                                            comprimento_max_km=args.alfa_m / 1000)
+        else:
+            coords, inicio = aneis_convexos(lon, lat, codigos, len(tamanhos))
+        geometrias = [{"type": "Polygon", "coordinates": [coords[inicio[k]:inicio[k + 1]].tolist()]}
+                      for k in range(len(tamanhos))]
+    return tamanhos.index.tolist(), tamanhos.to_numpy(), geometrias
+
+
+def calcular_grupos(pontos, pontos_ubs, args):
+    """
+    Filtro de outliers e geometrias das microáreas (`pontos`) e das áreas das
+    UBS (`pontos_ubs`). Retorna um dict com "microareas" e "ubs" (grupo →
+    (nº de pontos após o filtro, geometria)) e "descartados" e
+    "descartados_ubs" (grupo → registros dos pontos descartados).
+    """
+    resultado = {"microareas": {}, "descartados": {}, "ubs": {}, "descartados_ubs": {}}
+    pontos_filtrados = pontos.iloc[:0]
+    if len(pontos):
+        pontos_filtrados, descartados = filtrar_pontos(pontos, CHAVES, args)
+        grupos, num_filtrados, geometrias = construir_geometrias(pontos_filtrados, CHAVES, args)
+        resultado["microareas"] = {g: (int(n), geo) for g, n, geo in zip(grupos, num_filtrados, geometrias)}
+        resultado["descartados"] = {g: registros(d, COLUNAS_DESCARTADOS)
+                                    for g, d in descartados.groupby(CHAVES, sort=False)}
+    if len(pontos_ubs):
+        pontos_ubs_filtrados, descartados_ubs = filtrar_pontos(pontos_ubs, ['ubs_referencia'], args)
+        # No modo voronoi, a área da UBS é a união das células das suas microáreas
+        ubs_grupos, ubs_num_filtrados, ubs_geometrias = construir_geometrias(
+            pontos_filtrados if args.modo == "voronoi" else pontos_ubs_filtrados,
+            ['ubs_referencia'], args
+        )
+        resultado["ubs"] = {u: (int(n), geo) for u, n, geo in zip(ubs_grupos, ubs_num_filtrados, ubs_geometrias)}
+        resultado["descartados_ubs"] = {u: registros(d.assign(micro_area=None), COLUNAS_DESCARTADOS)
+                                        for u, d in descartados_ubs.groupby('ubs_referencia', sort=False)}
+    return resultado
+
+
+def _calcular_ubs(tarefa):
+    """Tarefa de um processo: os grupos sujos de uma UBS, lidos da memória compartilhada."""
+    descritor_pontos, descritor_ubs, args = tarefa
+    return calcular_grupos(ler_fatia(descritor_pontos), ler_fatia(descritor_ubs), args)
+
+
+def calcular_em_paralelo(pontos, pontos_ubs, args, processos):
+    """
+    calcular_grupos repartido por UBS em um ProcessPoolExecutor. Os pontos
+    ficam em memória compartilhada (paralelo.TabelaCompartilhada) e cada
+    processo lê só a fatia da sua UBS. As UBS maiores são despachadas
+    primeiro; o resultado não depende da ordem em que as tarefas terminam.
+    """
+    tamanhos = pd.concat([pontos['ubs_referencia'], pontos_ubs['ubs_referencia']]).value_counts(sort=False)
+    ordem = tamanhos.sort_values(ascending=False, kind="stable").index
+    resultado = {"microareas": {}, "descartados": {}, "ubs": {}, "descartados_ubs": {}}
+    with TabelaCompartilhada(pontos, 'ubs_referencia') as tabela_pontos, \
+            TabelaCompartilhada(pontos_ubs, 'ubs_referencia') as tabela_ubs:
+        tarefas = [(tabela_pontos.descritor(ubs), tabela_ubs.descritor(ubs), args) for ubs in ordem]
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            for parcial in executor.map(_calcular_ubs, tarefas):
+                for nome, valores in parcial.items():
+                    resultado[nome].update(valores)
+    return resultado
+
+
+def contorno(geometria):
+    """Geometria de linha com o contorno (anéis) de um polígono."""
+    linhas = aneis_geometria(geometria)
+    if len(linhas) == 1:
+        return {"type": "LineString", "coordinates": linhas[0]}
+    return {"type": "MultiLineString", "coordinates": linhas}
+
+
+def filtrar_pontos(pontos, chaves, args):
+    """
+    Aplica o filtro robusto de outliers a todos os grupos de `pontos`
+    (definidos pelas colunas `chaves`) de uma vez.
+    Retorna (pontos mantidos, pontos descartados com distância, limite e motivo).
+    """
+    codigos = pontos.groupby(chaves, sort=False).ngroup().to_numpy()
+    filtro = filtrar_outliers(
+        pontos['longitude'].to_numpy(), pontos['latitude'].to_numpy(),
+        codigos, int(codigos.max()) + 1 if len(codigos) else 0,
+        limiar_mad=args.limiar_mad,
+        distancia_min_km=args.distancia_min_km,
+        distancia_max_km=args.distancia_max_km,
+    )
+    descartados = pontos.assign(
+        distancia_km=filtro["distancia_km"].round(3),
+        limite_km=filtro["limite_km"].round(3),
+        motivo=filtro["motivo"],
+    )[~filtro["mantido"]]
+    return pontos[filtro["mantido"]], descartados
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Gera os polígonos das microáreas e das UBS")
+    parser.add_argument("--limiar-mad", type=float, default=LIMIAR_MAD,
+                        help="outlier se distância > mediana + LIMIAR × MAD (padrão: %(default)s)")
+    parser.add_argument("--distancia-min-km", type=float, default=DISTANCIA_MINIMA_OUTLIER_KM,
+                        help="pontos mais próximos que isso nunca são descartados (padrão: %(default)s)")
+    parser.add_argument("--distancia-max-km", type=float, default=MAX_DISTANCIA_OUTLIER_KM,
+                        help="pontos mais distantes que isso sempre são descartados (padrão: %(default)s)")
+    parser.add_argument("--modo", choices=["convexo", "concavo", "voronoi"], default="convexo",
+                        help="convex hull, contorno côncavo ou partição de Voronoi (padrão: %(default)s)")
+    parser.add_argument("--processos", type=int, default=1,
+                        help="processos para calcular as UBS em paralelo; 0 = todos os núcleos "
+                             "(padrão: %(default)s)")
+    parser.add_argument("--compacto", action="store_true",
+                        help="GeoJSON sem indentação e com coordenadas arredondadas (ver --precisao)")
+    parser.add_argument("--precisao", type=int, default=None,
+                        help="casas decimais das coordenadas (padrão: 6 com --compacto, "
+                             "senão precisão completa)")
+    parser.add_argument("--gzip", action="store_true",
+                        help="grava os GeoJSON comprimidos (.geojson.gz)")
+    parser.add_argument("--topojson", action="store_true",
+                        help="também grava dados/microareas_ubs.topojson (arcos compartilhados)")
+    parser.add_argument("--quantizacao", type=int, default=QUANTIZACAO_PADRAO,
+                        help="TopoJSON: pontos da grade por eixo (padrão: %(default)s)")
+    parser.add_argument("--gpkg", action="store_true",
+                        help="também grava dados/mapeamento.gpkg (todas as camadas, com índices espaciais)")
+    parser.add_argument("--fgb", action="store_true",
+                        help="também grava microáreas, áreas das UBS e endereços em FlatGeobuf (.fgb)")
+    parser.add_argument("--completo", action="store_true",
+                        help="ignora o cache e recalcula todos os polígonos")
+    parser.add_argument("--alfa-m", type=float, default=COMPRIMENTO_MAX_ARESTA_KM * 1000,
+                        help="modo côncavo: arestas do contorno mais longas que isso (m) "
+                             "são escavadas; menor = mais côncavo (padrão: %(default)s)")
+    args = parser.parse_args()
+    
     base_dir = Path(__file__).parent.parent
     dados_dir = base_dir / "dados"
     
@@ -119,56 +272,65 @@ def main():
     for metodo, count in df_valido['metodo'].value_counts().items():
         print(f"  {metodo}: {count}")
     
-    # 3. Agrupar pontos por UBS e microárea
-    all_points = {}
+    # 3. Pontos únicos por UBS/microárea e impressão digital de cada grupo
+    chaves = CHAVES
+    colunas = chaves + ['longitude', 'latitude']
+    num_ruas = df_valido.groupby(chaves, sort=False).size()
     
-    for _, row in df_valido.iterrows():
-        key = (row['ubs_referencia'], row['micro_area'])
-        if key not in all_points:
-            all_points[key] = []
-        all_points[key].append((row['longitude'], row['latitude']))
+    pontos_unicos = (
+        df_valido.groupby(colunas, sort=False, dropna=False).size()
+        .rename('num_enderecos').reset_index()
+    )
+    num_unicos = pontos_unicos.groupby(chaves, sort=False).size()
     
-    # 4. Gerar polígonos
-    features = []
-    linha_features = []
+    # A impressão da UBS cobre todos os seus pontos: muda junto com qualquer microárea
+    cache = CachePoligonos(dados_dir / "cache_poligonos.json", parametros_cache(args),
+                           ignorar=args.completo)
+    impressoes_micro = impressoes(pontos_unicos, chaves, colunas + ['num_enderecos'])
+    impressoes_ubs = impressoes(pontos_unicos, ['ubs_referencia'], colunas + ['num_enderecos'])
+    removidos = cache.podar("microarea", impressoes_micro.index) + cache.podar("ubs", impressoes_ubs.index)
+    sujas = [g for g, imp in impressoes_micro.items() if cache.obter("microarea", g, imp) is None]
+    sujas_ubs = [u for u, imp in impressoes_ubs.items() if cache.obter("ubs", u, imp) is None]
+    if args.modo == "voronoi" and (sujas or sujas_ubs or removidos):
+        # Na partição de Voronoi cada célula depende das vizinhas: recalcula tudo
+        sujas, sujas_ubs = impressoes_micro.index.tolist(), impressoes_ubs.index.tolist()
+    print(f"\n♻️  Microáreas reaproveitadas do cache: {len(impressoes_micro) - len(sujas)} "
+          f"| a recalcular: {len(sujas)}")
     
-    for (ubs, micro_area), points in all_points.items():
-        print(f"\n📍 {ubs} - Microárea {int(micro_area)}")
-        print(f"   Pontos originais: {len(points)}")
-        
-        unique_points = list(set(points))
-        print(f"   Pontos únicos: {len(unique_points)}")
-        
-        filtered_points = filtrar_outliers(unique_points)
-        print(f"   Pontos após filtro: {len(filtered_points)}")
+    # 4. Recalcular os grupos sujos: filtro de outliers e polígonos em lote (conforme --modo),
+    #    repartidos por UBS entre os processos
+    pontos_sujos = pontos_unicos[pontos_unicos.set_index(chaves).index.isin(sujas)]
+    pontos_ubs = df_valido.loc[df_valido['ubs_referencia'].isin(sujas_ubs),
+                               ['ubs_referencia', 'longitude', 'latitude']].drop_duplicates()
+    processos = args.processos or os.cpu_count()
+    if processos > 1 and args.modo != "voronoi" and len(sujas_ubs) > 1:
+        print(f"⚙️  Calculando {len(sujas_ubs)} UBS em {processos} processos")
+        calculados = calcular_em_paralelo(pontos_sujos, pontos_ubs, args, processos)
+    else:
+        calculados = calcular_grupos(pontos_sujos, pontos_ubs, args)
+    
+    # Métricas (área, centróide, compacidade, distância à UBS...) de todos os
+    # polígonos recalculados em uma passada, gravadas nas properties
+    tabela_micro = metricas([calculados["microareas"].get(g, (0, None))[1] for g in sujas],
+                            *coordenadas_ubs([ubs for ubs, _ in sujas]))
+    tabela_ubs = metricas([calculados["ubs"].get(ubs, (0, None))[1] for ubs in sujas_ubs],
+                          *coordenadas_ubs(sujas_ubs))
+    
+    for k, (ubs, micro_area) in enumerate(sujas):
+        n_filtrados, geometria = calculados["microareas"].get((ubs, micro_area), (0, None))
+        descartados_grupo = calculados["descartados"].get((ubs, micro_area), [])
         
-        if len(filtered_points) < 3:
+        print(f"\n📍 {ubs} - Microárea {int(micro_area)}")
+        print(f"   Pontos originais: {num_ruas[(ubs, micro_area)]}")
+        print(f"   Pontos únicos: {num_unicos[(ubs, micro_area)]}")
+        print(f"   Pontos após filtro: {n_filtrados}")
+        if n_filtrados < 3 and args.modo != "voronoi":
             print(f"   ⚠️  Menos de 3 pontos, criando buffer")
-            if len(filtered_points) == 1:
-                lon, lat = filtered_points[0]
-                buffer = 0.002
-                hull_coords = [
-                    [lon - buffer, lat - buffer],
-                    [lon + buffer, lat - buffer],
-                    [lon + buffer, lat + buffer],
-                    [lon - buffer, lat + buffer],
-                    [lon - buffer, lat - buffer],
-                ]
-            elif len(filtered_points) == 2:
-                buffer = 0.001
-                p1, p2 = filtered_points
-                hull_coords = [
-                    [p1[0] - buffer, p1[1] - buffer],
-                    [p2[0] + buffer, p2[1] - buffer],
-                    [p2[0] + buffer, p2[1] + buffer],
-                    [p1[0] - buffer, p1[1] + buffer],
-                    [p1[0] - buffer, p1[1] - buffer],
-                ]
-            else:
-                continue
-        else:
-            hull = convex_hull(filtered_points)
-            hull_coords = [list(p) for p in hull] + [list(hull[0])]
+        if geometria is None:
+            print(f"   ⚠️  Sem célula própria (pontos coincidem com os de outra microárea)")
+            cache.guardar("microarea", (ubs, micro_area), impressoes_micro[(ubs, micro_area)],
+                          feature=None, linha=None, descartados=descartados_grupo)
+            continue
         
         # Obter cor da UBS
         ubs_cor = UBS_INFO.get(ubs, {}).get("cor", "#888888")
@@ -179,20 +341,17 @@ def main():
             "properties": {
                 "ubs_referencia": ubs,
                 "micro_area": int(micro_area),
-                "num_ruas": len(points),
-                "num_pontos_unicos": len(filtered_points),
+                "num_ruas": int(num_ruas[(ubs, micro_area)]),
+                "num_pontos_unicos": int(n_filtrados),
+                **propriedades_metricas(tabela_micro.iloc[k]),
                 "cor": ubs_cor,
                 "stroke": ubs_cor,
                 "stroke-width": 2,
                 "fill": ubs_cor,
                 "fill-opacity": 0.3
             },
-            "geometry": {
-                "type": "Polygon",
-                "coordinates": [hull_coords]
-            }
+            "geometry": geometria
         }
-        features.append(feature)
         
         # Feature de linha (só arestas)
         linha_feature = {
@@ -204,89 +363,99 @@ def main():
                 "stroke": ubs_cor,
                 "stroke-width": 2
             },
-            "geometry": {
-                "type": "LineString",
-                "coordinates": hull_coords
-            }
+            "geometry": contorno(geometria)
         }
-        linha_features.append(linha_feature)
         
-        print(f"   ✅ Polígono gerado com {len(hull_coords)-1} vértices")
-    
-    # 5. Salvar GeoJSON de polígonos
-    geojson = {
-        "type": "FeatureCollection",
-        "name": "microareas_ubs",
-        "crs": {"type": "name", "properties": {"name": "urn:ogc:def:crs:OGC:1.3:CRS84"}},
-        "features": features
-    }
-    
-    output_path = dados_dir / "microareas_ubs.geojson"
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(geojson, f, ensure_ascii=False, indent=2)
-    print(f"\n✅ Polígonos salvos em: {output_path}")
-    
-    # 6. Salvar GeoJSON de linhas
-    linhas_geojson = {
-        "type": "FeatureCollection",
-        "name": "microareas_ubs_linhas",
-        "crs": {"type": "name", "properties": {"name": "urn:ogc:def:crs:OGC:1.3:CRS84"}},
-        "features": linha_features
-    }
-    
-    linhas_path = dados_dir / "microareas_ubs_linhas.geojson"
-    with open(linhas_path, "w", encoding="utf-8") as f:
-        json.dump(linhas_geojson, f, ensure_ascii=False, indent=2)
-    print(f"✅ Linhas salvas em: {linhas_path}")
+        cache.guardar("microarea", (ubs, micro_area), impressoes_micro[(ubs, micro_area)],
+                      feature=feature, linha=linha_feature,
+                      descartados=descartados_grupo)
+        print(f"   ✅ Polígono gerado com {sum(len(anel) - 1 for anel in aneis_geometria(geometria))} vértices")
     
-    # 7. Criar GeoJSON agregado por UBS
-    ubs_points = {}
-    for (ubs, _), points in all_points.items():
-        if ubs not in ubs_points:
-            ubs_points[ubs] = []
-        ubs_points[ubs].extend(points)
+    # 5. Áreas das UBS sujas
+    num_microareas = num_unicos.groupby(level='ubs_referencia', sort=False).size()
+    num_ruas_ubs = df_valido.groupby('ubs_referencia', sort=False).size()
     
-    ubs_features = []
-    for ubs, points in ubs_points.items():
-        unique_points = list(set(points))
-        filtered_points = filtrar_outliers(unique_points)
-        
-        if len(filtered_points) >= 3:
-            hull = convex_hull(filtered_points)
-            hull_coords = [list(p) for p in hull] + [list(hull[0])]
+    for k, ubs in enumerate(sujas_ubs):
+        n_filtrados, geometria = calculados["ubs"].get(ubs, (0, None))
+        feature = None
+        if geometria is not None and (n_filtrados >= 3 or args.modo == "voronoi"):
             ubs_cor = UBS_INFO.get(ubs, {}).get("cor", "#888888")
             
             feature = {
                 "type": "Feature",
                 "properties": {
                     "ubs_referencia": ubs,
-                    "num_microareas": len([k for k in all_points.keys() if k[0] == ubs]),
-                    "num_ruas_total": len(points),
+                    "num_microareas": int(num_microareas.get(ubs, 0)),
+                    "num_ruas_total": int(num_ruas_ubs[ubs]),
+                    **propriedades_metricas(tabela_ubs.iloc[k]),
                     "cor": ubs_cor,
                     "stroke": ubs_cor,
                     "fill": ubs_cor,
                     "fill-opacity": 0.2
                 },
-                "geometry": {
-                    "type": "Polygon",
-                    "coordinates": [hull_coords]
-                }
+                "geometry": geometria
             }
-            ubs_features.append(feature)
+        cache.guardar("ubs", ubs, impressoes_ubs[ubs], feature=feature,
+                      descartados=calculados["descartados_ubs"].get(ubs, []))
     
-    ubs_geojson = {
-        "type": "FeatureCollection",
-        "name": "ubs_areas",
-        "crs": {"type": "name", "properties": {"name": "urn:ogc:def:crs:OGC:1.3:CRS84"}},
-        "features": ubs_features
-    }
+    # 6. Montar as saídas a partir do cache (grupos recalculados + reaproveitados)
+    features, linha_features, ubs_features, linhas_descartados = [], [], [], []
+    for nivel, impressoes_nivel in (("microarea", impressoes_micro), ("ubs", impressoes_ubs)):
+        for grupo, impressao in impressoes_nivel.items():
+            entrada = cache.obter(nivel, grupo, impressao)
+            linhas_descartados += [{"nivel": nivel, **r} for r in entrada["descartados"]]
+            if entrada["feature"] is None:
+                continue
+            if nivel == "microarea":
+                features.append(entrada["feature"])
+                linha_features.append(entrada["linha"])
+            else:
+                ubs_features.append(entrada["feature"])
     
+    output_path = dados_dir / "microareas_ubs.geojson"
+    linhas_path = dados_dir / "microareas_ubs_linhas.geojson"
     ubs_output_path = dados_dir / "ubs_areas.geojson"
-    with open(ubs_output_path, "w", encoding="utf-8") as f:
-        json.dump(ubs_geojson, f, ensure_ascii=False, indent=2)
-    print(f"✅ Áreas UBS salvas em: {ubs_output_path}")
+    ubs_pontos_path = dados_dir / "ubs_pontos.geojson"
+    descartados_path = dados_dir / "pontos_descartados.csv"
+    topojson_path = dados_dir / "microareas_ubs.topojson"
+    gpkg_path = dados_dir / "mapeamento.gpkg"
+    saidas = [caminho_saida(p, args.gzip) for p in (output_path, linhas_path, ubs_output_path, ubs_pontos_path)]
+    if args.topojson:
+        saidas.append(caminho_saida(topojson_path, args.gzip))
+    fgb_paths = {nome: dados_dir / f"{nome}.fgb" for nome in ("microareas_ubs", "ubs_areas", "enderecos")}
+    if args.gpkg:
+        saidas.append(gpkg_path)
+    if args.fgb:
+        saidas.extend(fgb_paths.values())
+    # A camada de endereços (GeoPackage/FlatGeobuf) depende de todas as colunas
+    # do CSV, não só das usadas nos polígonos
+    formato = {"compacto": args.compacto, "precisao": args.precisao, "gzip": args.gzip,
+               "topojson": args.quantizacao if args.topojson else None,
+               "gpkg": args.gpkg, "fgb": args.fgb,
+               "enderecos": (str(pd.util.hash_pandas_object(df, index=False).sum())
+                             if args.gpkg or args.fgb else None)}
+    if (not (sujas or sujas_ubs or removidos) and cache.saida == formato
+            and all(p.exists() for p in saidas + [descartados_path])):
+        print("\n✅ Nenhuma microárea mudou desde a última execução: arquivos mantidos")
+        return
     
-    # 8. Criar GeoJSON com pontos das UBS
+    # 7. Salvar GeoJSON de polígonos, de linhas e agregado por UBS
+    opcoes_saida = {"compacto": args.compacto, "precisao": args.precisao, "comprimir": args.gzip}
+    for caminho, nome, lista, descricao in (
+        (output_path, "microareas_ubs", features, "\n✅ Polígonos salvos"),
+        (linhas_path, "microareas_ubs_linhas", linha_features, "✅ Linhas salvas"),
+        (ubs_output_path, "ubs_areas", ubs_features, "✅ Áreas UBS salvas"),
+    ):
+        print(f"{descricao} em: {salvar_geojson(caminho, nome, lista, **opcoes_saida)}")
+    
+    # 8. TopoJSON: microáreas e áreas das UBS com as bordas comuns em arcos compartilhados
+    #    (o contorno vem da malha de arcos, sem arquivo de linhas)
+    if args.topojson:
+        topologia = Topologia({"microareas_ubs": features, "ubs_areas": ubs_features}, args.quantizacao)
+        caminho = salvar_topojson(topojson_path, topologia.topojson(), comprimir=args.gzip)
+        print(f"✅ TopoJSON ({len(topologia.arcos)} arcos) salvo em: {caminho}")
+    
+    # 9. Criar GeoJSON com pontos das UBS
     ubs_pontos_features = []
     for ubs_nome, ubs_data in UBS_INFO.items():
         ponto_feature = {
@@ -307,17 +476,43 @@ def main():
         }
         ubs_pontos_features.append(ponto_feature)
     
-    ubs_pontos_geojson = {
-        "type": "FeatureCollection",
-        "name": "ubs_pontos",
-        "crs": {"type": "name", "properties": {"name": "urn:ogc:def:crs:OGC:1.3:CRS84"}},
-        "features": ubs_pontos_features
-    }
-    
-    ubs_pontos_path = dados_dir / "ubs_pontos.geojson"
-    with open(ubs_pontos_path, "w", encoding="utf-8") as f:
-        json.dump(ubs_pontos_geojson, f, ensure_ascii=False, indent=2)
+    ubs_pontos_path = salvar_geojson(ubs_pontos_path, "ubs_pontos", ubs_pontos_features, **opcoes_saida)
     print(f"✅ Pontos das UBS salvos em: {ubs_pontos_path}")
+    
+    # 10. GeoPackage com todas as camadas e os endereços geocodificados
+    if args.gpkg:
+        with GeoPackage(gpkg_path) as gpkg:
+            gpkg.camada_pontos("ubs_pontos", pd.DataFrame(
+                [{**f["properties"], "longitude": f["geometry"]["coordinates"][0],
+                  "latitude": f["geometry"]["coordinates"][1]} for f in ubs_pontos_features]),
+                indices=[["ubs_referencia"]], descricao="Pontos das UBS")
+            gpkg.camada_poligonos("microareas_ubs", features,
+                                  indices=[["ubs_referencia"], ["ubs_referencia", "micro_area"]],
+                                  descricao="Polígonos das microáreas")
+            gpkg.camada_poligonos("ubs_areas", ubs_features, indices=[["ubs_referencia"]],
+                                  descricao="Áreas agregadas das UBS")
+            gpkg.camada_pontos("enderecos", df_valido,
+                               indices=[["ubs_referencia"], ["ubs_referencia", "micro_area"]],
+                               descricao="Endereços geocodificados (CSV consolidado)")
+        print(f"✅ GeoPackage (4 camadas, {len(df_valido)} endereços) salvo em: {gpkg_path}")
+    
+    # 11. FlatGeobuf: polígonos e endereços com índice de Hilbert para leitura por intervalo
+    if args.fgb:
+        for nome, lista in (("microareas_ubs", features), ("ubs_areas", ubs_features)):
+            n = salvar_flatgeobuf(fgb_paths[nome], nome, lista, TIPO_MULTIPOLIGONO, colunas_features(lista))
+            print(f"✅ FlatGeobuf ({n} polígonos) salvo em: {fgb_paths[nome]}")
+        n = salvar_flatgeobuf_pontos(fgb_paths["enderecos"], "enderecos", df_valido)
+        print(f"✅ FlatGeobuf ({n} endereços) salvo em: {fgb_paths['enderecos']}")
+    
+    # 12. Registrar os pontos descartados pelo filtro de outliers
+    descartados_csv = pd.DataFrame(linhas_descartados, columns=['nivel'] + COLUNAS_DESCARTADOS, dtype=object)
+    descartados_csv.to_csv(descartados_path, index=False, encoding='utf-8-sig')
+    nivel = descartados_csv['nivel'].value_counts()
+    print(f"✅ {nivel.get('microarea', 0)} pontos descartados (microáreas) e {nivel.get('ubs', 0)} (UBS) "
+          f"registrados em: {descartados_path}")
+    
+    cache.saida = formato
+    cache.salvar()
 
 
 if __name__ == "__main__":
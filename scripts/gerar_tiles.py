@@ -0,0 +1,404 @@
+"""
+Geração de Vector Tiles (MVT) para o Mapa Web
+Gera uma pirâmide de tiles vetoriais (Mapbox Vector Tile, z10–z17) com as
+UBS, as microáreas e os endereços geocodificados, para mapas no navegador
+(MapLibre, OpenLayers, Leaflet) e para o QGIS (Camada → Vector Tile).
+
+Camadas dos tiles:
+- ubs_areas, microareas_ubs: polígonos de gerar_poligonos.py
+- ubs: pontos das UBS (ubs_pontos.geojson)
+- enderecos: endereços do CSV consolidado (a partir de ZOOM_MIN_ENDERECOS)
+
+Em cada zoom:
+1. Os polígonos são simplificados sobre a topologia de arcos compartilhados
+   (mesmo método de simplificar_poligonos.py, limiar = pixel do zoom), sem
+   abrir lacunas entre microáreas vizinhas
+2. Polígonos menores que TAMANHO_MIN_PX pixels são descartados, e abaixo do
+   zoom máximo fica no máximo um endereço por célula de
+   ESPACAMENTO_ENDERECOS_PX pixels
+3. Os polígonos descem a pirâmide de tiles do zoom recortados (com a
+   margem) em cada nível a partir do recorte do nível acima, até blocos de
+   2^NIVEL_TAREFA × 2^NIVEL_TAREFA tiles; cada bloco é uma tarefa, que
+   continua a descida até os tiles e os codifica (mvt.py), em paralelo.
+   Os pontos vão para os tiles que tocam (com a margem)
+4. O id de cada feature nos tiles é a sua posição na origem (GeoJSON ou
+   CSV) mais um, o mesmo em todos os zooms
+
+Saída: arquivo MBTiles (SQLite, tiles comprimidos com gzip) ou, se o
+caminho não terminar em .mbtiles, um diretório {z}/{x}/{y}.pbf com
+metadata.json.
+
+Uso:
+    python gerar_tiles.py [--zoom-min 10] [--zoom-max 17] [--saida ../dados/mapeamento.mbtiles]
+                          [--processos N]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from indice_espacial import expandir_intervalos
+from mvt import (
+    EXTENSAO,
+    GEOM_POLIGONO,
+    GEOM_PONTO,
+    MARGEM,
+    Camada,
+    codificar_tile,
+    comandos_poligono,
+    comandos_pontos,
+    mercator,
+    recortar_poligonos,
+)
+from saida_geojson import carregar_geojson
+from simplificar_poligonos import importancias, simplificar, tamanho_pixel_m
+from topologia import Topologia
+
+# Diretórios
+BASE_DIR = Path(__file__).parent.parent
+DADOS_DIR = BASE_DIR / "dados"
+
+ZOOM_MIN, ZOOM_MAX = 10, 17
+
+# Endereços só aparecem a partir deste zoom
+ZOOM_MIN_ENDERECOS = 13
+
+# Polígonos cuja caixa é menor que isso (pixels) nos dois eixos não entram no tile
+TAMANHO_MIN_PX = 2
+
+# Abaixo do zoom máximo: no máximo um endereço por célula deste tamanho (pixels)
+ESPACAMENTO_ENDERECOS_PX = 2
+
+# Unidades do tile por pixel (tile de 256 px)
+UNIDADES_POR_PX = EXTENSAO / 256
+
+CAMADAS_POLIGONOS = ["ubs_areas", "microareas_ubs"]
+COLUNAS_ENDERECOS = ["ubs_referencia", "micro_area", "endereco_completo", "metodo"]
+
+# Cada tarefa dos processos é um bloco de 2^NIVEL_TAREFA × 2^NIVEL_TAREFA tiles
+NIVEL_TAREFA = 3
+
+# Dados do zoom em cada processo (ver _iniciar)
+_DADOS = {}
+
+
+# ============================================================================
+# PREPARAÇÃO (UMA VEZ POR ZOOM)
+# ============================================================================
+
+def _caixas_poligonos(poligonos):
+    coords = np.concatenate([anel for poligono in poligonos for anel in poligono])
+    return (*coords.min(axis=0), *coords.max(axis=0))
+
+
+def preparar_zoom(zoom, topologia, areas, camadas, ubs, enderecos):
+    """
+    Features de cada camada no `zoom`, em coordenadas globais do tile:
+    dict camada → (tipo, lista de geometrias, lista de propriedades,
+    caixas (n, 4), posições das features na origem: feature do GeoJSON ou
+    linha do CSV). Polígonos são listas de anéis (n, 2) sem fechamento.
+    """
+    lat0 = (topologia.caixa[1] + topologia.caixa[3]) / 2
+    arcos = simplificar(topologia, areas, tamanho_pixel_m(zoom, lat0) ** 2)
+    dados = {}
+
+    for nome in CAMADAS_POLIGONOS:
+        geometrias, propriedades, caixas, origens = [], [], [], []
+        for f, feature in enumerate(camadas[nome]):
+            if not topologia.referencias[nome][f]:
+                continue
+            poligonos = []
+            for aneis in topologia.referencias[nome][f]:
+                poligono = []
+                for refs in aneis:
+                    lon, lat = np.asarray(topologia.anel(refs, arcos)).T
+                    poligono.append(np.column_stack(mercator(lon, lat, zoom))[:-1])
+                poligonos.append(poligono)
+            caixa = _caixas_poligonos(poligonos)
+            if max(caixa[2] - caixa[0], caixa[3] - caixa[1]) < TAMANHO_MIN_PX * UNIDADES_POR_PX:
+                continue
+            geometrias.append(poligonos)
+            propriedades.append(feature["properties"])
+            caixas.append(caixa)
+            origens.append(f)
+        dados[nome] = (GEOM_POLIGONO, geometrias, propriedades, np.array(caixas).reshape(-1, 4), origens)
+
+    for nome, pontos in (("ubs", ubs), ("enderecos", enderecos)):
+        if nome == "enderecos" and zoom < ZOOM_MIN_ENDERECOS:
+            continue
+        x, y = mercator(pontos["longitude"].to_numpy(), pontos["latitude"].to_numpy(), zoom)
+        manter = np.arange(len(x))
+        if nome == "enderecos" and zoom < ZOOM_MAX:
+            celula = ESPACAMENTO_ENDERECOS_PX * UNIDADES_POR_PX
+            _, manter = np.unique(np.column_stack([x // celula, y // celula]), axis=0, return_index=True)
+            manter = np.sort(manter)
+        xy = np.column_stack([x, y])[manter]
+        atributos = pontos.drop(columns=["longitude", "latitude"]).iloc[manter]
+        propriedades = atributos.astype(object).where(atributos.notna(), None).to_dict("records")
+        dados[nome] = (GEOM_PONTO, list(xy), propriedades, np.column_stack([xy, xy]),
+                      pontos.index[manter].tolist())
+    return dados
+
+
+def tiles_do_zoom(dados):
+    """
+    Tiles tocados por alguma feature (caixa + margem de recorte): dict
+    (x, y) → {camada: índices das features}.
+    """
+    tiles = {}
+    for nome, (_, _, _, caixas, _) in dados.items():
+        if len(caixas) == 0:
+            continue
+        x0 = np.floor((caixas[:, 0] - MARGEM) / EXTENSAO).astype(np.int64)
+        y0 = np.floor((caixas[:, 1] - MARGEM) / EXTENSAO).astype(np.int64)
+        largura = np.floor((caixas[:, 2] + MARGEM) / EXTENSAO).astype(np.int64) - x0 + 1
+        altura = np.floor((caixas[:, 3] + MARGEM) / EXTENSAO).astype(np.int64) - y0 + 1
+        posicoes, feature = expandir_intervalos(np.zeros(len(caixas), dtype=np.int64), largura * altura)
+        tx = x0[feature] + posicoes % largura[feature]
+        ty = y0[feature] + posicoes // largura[feature]
+        for x, y, f in zip(tx.tolist(), ty.tolist(), feature.tolist()):
+            tiles.setdefault((x, y), {}).setdefault(nome, []).append(f)
+    return tiles
+
+
+# ============================================================================
+# CODIFICAÇÃO (PROCESSOS)
+# ============================================================================
+
+def _iniciar(dados):
+    """Inicializador dos processos: recebe as features de todos os zooms uma única vez."""
+    _DADOS.clear()
+    _DADOS.update(dados)
+
+
+def recortar_piramide(poligonos, nivel, x, y, nivel_final, saida):
+    """
+    Recorta o (multi)polígono, em coordenadas globais do tile, no nó
+    (nivel, x, y) da pirâmide — o bloco de 2^nivel × 2^nivel tiles, mais a
+    margem — e desce recursivamente até `nivel_final`, cada filho
+    recortando o resultado do pai. Acrescenta (x, y, polígonos) de cada nó
+    final não vazio a `saida`.
+    """
+    tamanho = EXTENSAO << nivel
+    poligonos = recortar_poligonos(poligonos, (x * tamanho - MARGEM, y * tamanho - MARGEM),
+                                   ((x + 1) * tamanho + MARGEM, (y + 1) * tamanho + MARGEM))
+    if not poligonos:
+        return
+    if nivel == nivel_final:
+        saida.append((x, y, poligonos))
+        return
+    xmin, ymin, xmax, ymax = _caixas_poligonos(poligonos)
+    metade = tamanho // 2
+    for filho_y in (2 * y, 2 * y + 1):
+        if filho_y * metade - MARGEM > ymax or (filho_y + 1) * metade + MARGEM <= ymin:
+            continue
+        for filho_x in (2 * x, 2 * x + 1):
+            if filho_x * metade - MARGEM > xmax or (filho_x + 1) * metade + MARGEM <= xmin:
+                continue
+            recortar_piramide(poligonos, nivel - 1, filho_x, filho_y, nivel_final, saida)
+
+
+def _gerar_tiles(tarefa):
+    """
+    Tarefa de um processo: desce os polígonos do bloco até os tiles e
+    codifica os tiles do bloco.
+    """
+    zoom, nivel, bloco_x, bloco_y, poligonos, pontos = tarefa
+    dados = _DADOS[zoom]
+    tiles = {}
+    for nome, pedacos in poligonos.items():
+        for f, recortados in pedacos:
+            saida = []
+            recortar_piramide(recortados, nivel, bloco_x, bloco_y, 0, saida)
+            for x, y, recortes in saida:
+                tiles.setdefault((x, y), {}).setdefault(nome, []).append((f, recortes))
+    for (x, y), indices in pontos.items():
+        for nome, fs in indices.items():
+            tiles.setdefault((x, y), {})[nome] = [(f, dados[nome][1][f]) for f in fs]
+
+    resultado = []
+    for x, y in sorted(tiles):
+        origem = np.array([x * EXTENSAO, y * EXTENSAO], dtype=float)
+        camadas = []
+        for nome, (tipo, _, propriedades, _, origens) in dados.items():
+            camada = Camada(nome)
+            for f, geometria in tiles[x, y].get(nome, []):
+                if tipo == GEOM_POLIGONO:
+                    comandos = comandos_poligono([[anel - origem for anel in poligono] for poligono in geometria])
+                else:
+                    comandos = comandos_pontos(geometria - origem)
+                camada.adicionar(tipo, comandos, propriedades[f], identificador=origens[f] + 1)
+            camadas.append(camada)
+        tile = codificar_tile(camadas)
+        if tile:
+            resultado.append((zoom, x, y, tile))
+    return resultado
+
+
+def tarefas_do_zoom(zoom, dados_zoom):
+    """
+    Tarefas de um zoom, uma por bloco de tiles: (zoom, nível do bloco, x, y,
+    {camada: [(feature, polígonos recortados no bloco)]},
+    {(x, y) do tile: {camada: features}} dos pontos).
+    """
+    nivel = min(NIVEL_TAREFA, zoom)
+    blocos = {}
+    for nome, (tipo, geometrias, _, _, _) in dados_zoom.items():
+        if tipo != GEOM_POLIGONO:
+            continue
+        for f, poligonos in enumerate(geometrias):
+            saida = []
+            recortar_piramide(poligonos, zoom, 0, 0, nivel, saida)
+            for x, y, recortados in saida:
+                blocos.setdefault((x, y), ({}, {}))[0].setdefault(nome, []).append((f, recortados))
+    pontos = {nome: d for nome, d in dados_zoom.items() if d[0] == GEOM_PONTO}
+    for (x, y), indices in tiles_do_zoom(pontos).items():
+        blocos.setdefault((x >> nivel, y >> nivel), ({}, {}))[1][x, y] = indices
+    return [(zoom, nivel, x, y, poligonos, pontos) for (x, y), (poligonos, pontos) in sorted(blocos.items())]
+
+
+def gerar(dados, processos):
+    """Gera (zoom, x, y, bytes) de todos os tiles, repartidos entre `processos`."""
+    tarefas = [tarefa for zoom, dados_zoom in dados.items() for tarefa in tarefas_do_zoom(zoom, dados_zoom)]
+
+    if processos <= 1:
+        _iniciar(dados)
+        for tarefa in tarefas:
+            yield from _gerar_tiles(tarefa)
+        return
+    with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar, initargs=(dados,)) as executor:
+        for parcial in executor.map(_gerar_tiles, tarefas):
+            yield from parcial
+
+
+# ============================================================================
+# SAÍDA
+# ============================================================================
+
+def _tipo_campo(valores):
+    valores = [v for v in valores if v is not None]
+    if valores and all(isinstance(v, bool) for v in valores):
+        return "Boolean"
+    if valores and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in valores):
+        return "Number"
+    return "String"
+
+
+def metadados(dados, zoom_min, zoom_max, caixa):
+    """Metadados MBTiles/TileJSON, com a descrição das camadas (vector_layers)."""
+    camadas = {}
+    for zoom, dados_zoom in dados.items():
+        for nome, (_, _, propriedades, _, _) in dados_zoom.items():
+            camada = camadas.setdefault(nome, {"id": nome, "fields": {}, "minzoom": zoom, "maxzoom": zoom})
+            camada["maxzoom"] = zoom
+            for chave in dict.fromkeys(c for p in propriedades for c in p):
+                camada["fields"].setdefault(chave, _tipo_campo([p.get(chave) for p in propriedades]))
+    centro = ((caixa[0] + caixa[2]) / 2, (caixa[1] + caixa[3]) / 2)
+    return {
+        "name": "mapeamento_sms",
+        "description": "UBS, microáreas e endereços geocodificados",
+        "format": "pbf",
+        "type": "overlay",
+        "minzoom": str(zoom_min),
+        "maxzoom": str(zoom_max),
+        "bounds": ",".join(f"{v:.6f}" for v in caixa),
+        "center": f"{centro[0]:.6f},{centro[1]:.6f},{zoom_min}",
+        "json": json.dumps({"vector_layers": list(camadas.values())}, ensure_ascii=False),
+    }
+
+
+def salvar_mbtiles(caminho, tiles, meta):
+    """Grava os tiles (gzip) em um MBTiles novo; linhas em TMS (y invertido)."""
+    temporario = caminho.with_name(caminho.name + ".tmp")
+    temporario.unlink(missing_ok=True)
+    conexao = sqlite3.connect(temporario)
+    conexao.executescript("""
+        CREATE TABLE metadata (name TEXT, value TEXT);
+        CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB);
+    """)
+    conexao.executemany("INSERT INTO metadata VALUES (?, ?)", meta.items())
+    total = 0
+    for zoom, x, y, tile in tiles:
+        conexao.execute("INSERT INTO tiles VALUES (?, ?, ?, ?)",
+                        (zoom, x, 2 ** zoom - 1 - y, gzip.compress(tile, mtime=0)))
+        total += 1
+    conexao.execute("CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)")
+    conexao.commit()
+    conexao.close()
+    temporario.replace(caminho)
+    return total
+
+
+def salvar_diretorio(caminho, tiles, meta):
+    """Grava os tiles em caminho/{z}/{x}/{y}.pbf (sem compressão) e metadata.json."""
+    if caminho.exists() and not (caminho / "metadata.json").exists():
+        raise SystemExit(f"❌ {caminho} existe e não é uma pirâmide de tiles gerada por este script")
+    temporario = caminho.with_name(caminho.name + ".tmp")
+    shutil.rmtree(temporario, ignore_errors=True)
+    total = 0
+    for zoom, x, y, tile in tiles:
+        destino = temporario / str(zoom) / str(x) / f"{y}.pbf"
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        destino.write_bytes(tile)
+        total += 1
+    temporario.mkdir(parents=True, exist_ok=True)
+    with open(temporario / "metadata.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    shutil.rmtree(caminho, ignore_errors=True)
+    temporario.rename(caminho)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera tiles vetoriais (MVT) das UBS, microáreas e endereços")
+    parser.add_argument("--zoom-min", type=int, default=ZOOM_MIN, help="menor zoom (padrão: %(default)s)")
+    parser.add_argument("--zoom-max", type=int, default=ZOOM_MAX, help="maior zoom (padrão: %(default)s)")
+    parser.add_argument("--saida", type=Path, default=DADOS_DIR / "mapeamento.mbtiles",
+                        help="arquivo .mbtiles ou diretório {z}/{x}/{y}.pbf (padrão: %(default)s)")
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1,
+                        help="processos para codificar os tiles (padrão: todos os núcleos, %(default)s)")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("GERAÇÃO DE VECTOR TILES (MVT)")
+    print("=" * 70)
+
+    camadas = {nome: carregar_geojson(DADOS_DIR / f"{nome}.geojson")["features"]
+               for nome in CAMADAS_POLIGONOS}
+    ubs = pd.DataFrame([{**f["properties"], "longitude": f["geometry"]["coordinates"][0],
+                         "latitude": f["geometry"]["coordinates"][1]}
+                        for f in carregar_geojson(DADOS_DIR / "ubs_pontos.geojson")["features"]])
+    df = pd.read_csv(DADOS_DIR / "UBS_Ruas_Coordenadas_Consolidado.csv")
+    enderecos = df.loc[df['latitude'].notna() & df['longitude'].notna(),
+                       COLUNAS_ENDERECOS + ["longitude", "latitude"]]
+    print(f"\nPolígonos: {sum(len(c) for c in camadas.values())} | UBS: {len(ubs)} | "
+          f"Endereços: {len(enderecos)}")
+
+    topologia = Topologia(camadas)
+    areas = importancias(topologia)
+    zooms = range(args.zoom_min, args.zoom_max + 1)
+    dados = {zoom: preparar_zoom(zoom, topologia, areas, camadas, ubs, enderecos) for zoom in zooms}
+
+    lon = np.r_[topologia.caixa[0], topologia.caixa[2], ubs["longitude"], enderecos["longitude"]]
+    lat = np.r_[topologia.caixa[1], topologia.caixa[3], ubs["latitude"], enderecos["latitude"]]
+    meta = metadados(dados, args.zoom_min, args.zoom_max, (lon.min(), lat.min(), lon.max(), lat.max()))
+
+    print(f"\n🧩 Codificando tiles z{args.zoom_min}–z{args.zoom_max} em {args.processos} processo(s)...")
+    tiles = gerar(dados, args.processos)
+    if args.saida.suffix == ".mbtiles":
+        total = salvar_mbtiles(args.saida, tiles, meta)
+    else:
+        total = salvar_diretorio(args.saida, tiles, meta)
+    print(f"✅ {total} tiles salvos em: {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
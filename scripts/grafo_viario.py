@@ -0,0 +1,319 @@
+"""
+Grafo Viário (CSR) e Caminhos Mínimos
+Usado por areas_servico.py e sugerir_atribuicoes.py. Monta, a partir de
+um extrato do OpenStreetMap (osm.py), o grafo das ruas transitáveis a pé ou
+de carro em arrays compactos (CSR: as arestas que saem do vértice v são
+destino[inicio[v]:inicio[v + 1]]) e calcula caminhos mínimos com Dijkstra
+de múltiplas fontes: uma única passada dá, para cada vértice, o tempo até a
+fonte mais próxima e qual é ela (com dijkstra_k, até as k mais próximas).
+
+O custo das arestas é o tempo de percurso (s): comprimento ortodrômico do
+trecho dividido pela velocidade do perfil (a pé: constante; de carro: por
+tipo de via, limitada pelo maxspeed). De carro, vias de mão única só têm a
+aresta no sentido permitido. O comprimento (m) do caminho de menor tempo é
+acumulado junto.
+
+Pontos fora da rede (UBS, endereços) são ligados ao vértice mais próximo
+(indice_espacial.ArvoreKD); o trecho até ele conta como caminhada em linha
+reta.
+"""
+
+import heapq
+
+import numpy as np
+
+from geometria import KM_POR_GRAU_LAT, km_por_grau_lon
+from indice_espacial import ArvoreKD
+from metricas_poligonos import distancia_km
+
+# Velocidade a pé e do trecho fora da rede (km/h)
+VELOCIDADE_A_PE_KMH = 4.8
+
+# Velocidade de carro por tipo de via (km/h); outros tipos não são transitáveis de carro
+VELOCIDADES_CARRO_KMH = {
+    "motorway": 80, "motorway_link": 50,
+    "trunk": 60, "trunk_link": 40,
+    "primary": 50, "primary_link": 40,
+    "secondary": 40, "secondary_link": 30,
+    "tertiary": 30, "tertiary_link": 25,
+    "unclassified": 25, "residential": 25, "road": 20,
+    "living_street": 10, "service": 15, "track": 15,
+}
+
+# Tipos de via sem passagem de pedestres (ou que não são ruas)
+VIAS_SEM_PEDESTRE = {"motorway", "motorway_link", "construction", "proposed", "raceway",
+                     "bus_guideway", "abandoned", "platform", "corridor", "elevator"}
+
+MODOS = ("a_pe", "carro")
+
+_PROIBIDO = {"no", "private"}
+_PERMITIDO = {"yes", "designated", "permissive", "destination"}
+
+
+def _permite(tags, especificas):
+    """Regra de acesso do OSM: a tag mais específica (foot, motorcar...) vale sobre access."""
+    for chave in especificas:
+        if chave in tags:
+            return tags[chave] not in _PROIBIDO
+    return tags.get("access") not in _PROIBIDO or any(tags.get(c) in _PERMITIDO for c in especificas)
+
+
+def _velocidade_kmh(tags, modo):
+    """Velocidade do perfil na via, ou None se a via não é transitável nesse modo."""
+    via = tags.get("highway")
+    if via is None or tags.get("area") == "yes":
+        return None
+    if modo == "a_pe":
+        if via in VIAS_SEM_PEDESTRE or not _permite(tags, ("foot",)):
+            return None
+        return VELOCIDADE_A_PE_KMH
+    if via not in VELOCIDADES_CARRO_KMH or not _permite(tags, ("motorcar", "motor_vehicle")):
+        return None
+    velocidade = VELOCIDADES_CARRO_KMH[via]
+    limite = tags.get("maxspeed", "").split(" ")[0]
+    if limite.isdigit() and int(limite) > 0:
+        velocidade = min(velocidade, int(limite))
+    return velocidade
+
+
+def _sentido(tags, modo):
+    """+1 (só no sentido da via), -1 (só no contrário) ou 0 (os dois)."""
+    if modo == "a_pe":
+        return 0
+    oneway = tags.get("oneway")
+    if oneway in ("yes", "true", "1"):
+        return 1
+    if oneway == "-1":
+        return -1
+    if oneway is None and (tags.get("junction") in ("roundabout", "circular")
+                           or tags.get("highway") == "motorway"):
+        return 1
+    return 0
+
+
+class GrafoViario:
+    """Grafo dirigido em CSR: vértices (lon, lat), arestas com tempo_s e comprimento_m."""
+
+    def __init__(self, lon, lat, origem, destino, tempo_s, comprimento_m):
+        self.lon = np.asarray(lon, dtype=float)
+        self.lat = np.asarray(lat, dtype=float)
+        ordem = np.argsort(origem, kind="stable")
+        self.origem = np.asarray(origem, dtype=np.int64)[ordem]
+        self.destino = np.asarray(destino, dtype=np.int64)[ordem]
+        self.tempo_s = np.asarray(tempo_s, dtype=float)[ordem]
+        self.comprimento_m = np.asarray(comprimento_m, dtype=float)[ordem]
+        self.inicio = np.concatenate([[0], np.cumsum(np.bincount(self.origem, minlength=len(self.lon)))])
+        self._arvore = None
+
+    def __len__(self):
+        return len(self.lon)
+
+    @property
+    def n_arestas(self):
+        return len(self.destino)
+
+    @classmethod
+    def de_extrato(cls, extrato, modo, caixa=None):
+        """
+        Grafo do `modo` (a_pe ou carro) a partir de um ExtratoOSM. Com `caixa`
+        (dict lon_min/lon_max/lat_min/lat_max), só entram os trechos com as
+        duas pontas dentro dela. Só os nós usados pelas arestas viram vértices.
+        """
+        if modo not in MODOS:
+            raise ValueError(f"Modo desconhecido: {modo} (use {', '.join(MODOS)})")
+        velocidades = np.array([_velocidade_kmh(t, modo) or 0.0 for t in extrato.via_tags])
+        sentidos = np.array([_sentido(t, modo) for t in extrato.via_tags], dtype=np.int64)
+
+        # Trechos consecutivos de cada via (a, b), sem atravessar de uma via para a outra
+        tamanhos = np.diff(extrato.via_inicio)
+        via = np.repeat(np.arange(len(extrato)), tamanhos)
+        pos = extrato.posicoes(extrato.via_nos)
+        mesmo = via[:-1] == via[1:]
+        a, b, via = pos[:-1][mesmo], pos[1:][mesmo], via[:-1][mesmo]
+        valido = (a >= 0) & (b >= 0) & (a != b) & (velocidades[via] > 0)
+        if caixa is not None:
+            dentro = ((extrato.lon >= caixa["lon_min"]) & (extrato.lon <= caixa["lon_max"])
+                      & (extrato.lat >= caixa["lat_min"]) & (extrato.lat <= caixa["lat_max"]))
+            valido &= dentro[np.maximum(a, 0)] & dentro[np.maximum(b, 0)]
+        a, b, via = a[valido], b[valido], via[valido]
+
+        comprimento = distancia_km(extrato.lon[a], extrato.lat[a], extrato.lon[b], extrato.lat[b]) * 1000
+        tempo = comprimento / (velocidades[via] / 3.6)
+        sentido = sentidos[via]
+        ida, volta = sentido >= 0, sentido <= 0
+        origem = np.concatenate([a[ida], b[volta]])
+        destino = np.concatenate([b[ida], a[volta]])
+        tempo = np.concatenate([tempo[ida], tempo[volta]])
+        comprimento = np.concatenate([comprimento[ida], comprimento[volta]])
+
+        # Renumera só os nós usados
+        usados, indices = np.unique(np.concatenate([origem, destino]), return_inverse=True)
+        origem, destino = indices[:len(origem)], indices[len(origem):]
+        return cls(extrato.lon[usados], extrato.lat[usados], origem, destino, tempo, comprimento)
+
+    def _plano(self, lon, lat):
+        lat0 = float(self.lat.mean())
+        return (np.asarray(lon, dtype=float) * km_por_grau_lon(lat0),
+                np.asarray(lat, dtype=float) * KM_POR_GRAU_LAT)
+
+    def vertices_proximos(self, lon, lat):
+        """(vértice mais próximo, distância em m) de cada ponto; -1/NaN para coordenadas NaN."""
+        if self._arvore is None:
+            self._arvore = ArvoreKD(*self._plano(self.lon, self.lat))
+        lon, lat = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+        validos = ~(np.isnan(lon) | np.isnan(lat))
+        vertice = np.full(len(lon), -1, dtype=np.int64)
+        distancia = np.full(len(lon), np.nan)
+        if len(self) and validos.any():
+            indices, _ = self._arvore.vizinhos(*self._plano(lon[validos], lat[validos]), 1)
+            vertice[validos] = indices[:, 0]
+            distancia[validos] = distancia_km(lon[validos], lat[validos],
+                                              self.lon[indices[:, 0]], self.lat[indices[:, 0]]) * 1000
+        return vertice, distancia
+
+    def dijkstra(self, fontes, tempo_inicial=None, comprimento_inicial=None, limite_s=np.inf, alvos=None):
+        """
+        Dijkstra de múltiplas fontes (vértices; -1 é ignorado). Retorna
+        (tempo_s, comprimento_m, fonte): para cada vértice, o menor tempo até
+        alguma fonte, o comprimento desse caminho e o índice (em `fontes`) da
+        fonte que o alcança primeiro; inf/inf/-1 se não alcançado. Para ao
+        passar de `limite_s` ou quando todos os `alvos` estiverem resolvidos.
+        """
+        fontes = np.asarray(fontes, dtype=np.int64)
+        if tempo_inicial is None:
+            tempo_inicial = np.zeros(len(fontes))
+        if comprimento_inicial is None:
+            comprimento_inicial = np.zeros(len(fontes))
+        n = len(self)
+        tempo = [float("inf")] * n
+        comprimento = [float("inf")] * n
+        fonte = [-1] * n
+        heap = []
+        for k, (v, t, c) in enumerate(zip(fontes.tolist(), np.asarray(tempo_inicial, dtype=float).tolist(),
+                                          np.asarray(comprimento_inicial, dtype=float).tolist())):
+            if v >= 0 and t < tempo[v]:
+                tempo[v], comprimento[v], fonte[v] = t, c, k
+                heap.append((t, v))
+        heapq.heapify(heap)
+
+        faltam = None
+        if alvos is not None:
+            faltam = set(int(a) for a in np.asarray(alvos).ravel() if a >= 0)
+        inicio = self.inicio.tolist()
+        destino = self.destino.tolist()
+        custo = self.tempo_s.tolist()
+        extensao = self.comprimento_m.tolist()
+        resolvido = [False] * n
+        while heap:
+            t, v = heapq.heappop(heap)
+            if resolvido[v]:
+                continue
+            if t > limite_s:
+                break
+            resolvido[v] = True
+            if faltam is not None:
+                faltam.discard(v)
+                if not faltam:
+                    break
+            c, f = comprimento[v], fonte[v]
+            for e in range(inicio[v], inicio[v + 1]):
+                w = destino[e]
+                novo = t + custo[e]
+                if novo < tempo[w]:
+                    tempo[w], comprimento[w], fonte[w] = novo, c + extensao[e], f
+                    heapq.heappush(heap, (novo, w))
+
+        # Vértices não resolvidos (além do limite/parada antecipada) ficam como não alcançados
+        resolvido = np.array(resolvido, dtype=bool)
+        tempo = np.where(resolvido, tempo, np.inf)
+        comprimento = np.where(resolvido, comprimento, np.inf)
+        fonte = np.where(resolvido, fonte, -1)
+        return tempo, comprimento, fonte
+
+    def dijkstra_k(self, fontes, k, tempo_inicial=None, comprimento_inicial=None):
+        """
+        Dijkstra de múltiplas fontes com até `k` rótulos por vértice: numa
+        única passada, as k fontes distintas mais próximas de cada vértice.
+        Retorna (tempo_s, comprimento_m, fonte), arrays (vértices, k)
+        ordenados por tempo; inf/inf/-1 onde há menos de k fontes alcançadas.
+
+        Um rótulo (fonte f, vértice v) só é aceito se v ainda tem menos de k
+        rótulos; vale porque, se f não está entre as k mais próximas de um
+        vértice do caminho de f até v, também não está entre as de v.
+        """
+        fontes = np.asarray(fontes, dtype=np.int64)
+        if tempo_inicial is None:
+            tempo_inicial = np.zeros(len(fontes))
+        if comprimento_inicial is None:
+            comprimento_inicial = np.zeros(len(fontes))
+        n = len(self)
+        n_fontes = max(len(fontes), 1)
+        rotulo_t = [float("inf")] * (n * k)
+        rotulo_c = [float("inf")] * (n * k)
+        rotulo_f = [-1] * (n * k)
+        aceitos = [0] * n
+        melhor = {}  # menor tempo já enfileirado por (vértice, fonte)
+        heap = []
+        for f, (v, t, c) in enumerate(zip(fontes.tolist(), np.asarray(tempo_inicial, dtype=float).tolist(),
+                                          np.asarray(comprimento_inicial, dtype=float).tolist())):
+            if v >= 0:
+                melhor[v * n_fontes + f] = t
+                heap.append((t, v, f, c))
+        heapq.heapify(heap)
+
+        inicio = self.inicio.tolist()
+        destino = self.destino.tolist()
+        custo = self.tempo_s.tolist()
+        extensao = self.comprimento_m.tolist()
+        while heap:
+            t, v, f, c = heapq.heappop(heap)
+            a = aceitos[v]
+            if a >= k or f in rotulo_f[v * k:v * k + a]:
+                continue
+            rotulo_t[v * k + a], rotulo_c[v * k + a], rotulo_f[v * k + a] = t, c, f
+            aceitos[v] = a + 1
+            for e in range(inicio[v], inicio[v + 1]):
+                w = destino[e]
+                if aceitos[w] >= k:
+                    continue
+                novo = t + custo[e]
+                chave = w * n_fontes + f
+                if novo < melhor.get(chave, float("inf")):
+                    melhor[chave] = novo
+                    heapq.heappush(heap, (novo, w, f, c + extensao[e]))
+
+        return (np.array(rotulo_t).reshape(n, k), np.array(rotulo_c).reshape(n, k),
+                np.array(rotulo_f, dtype=np.int64).reshape(n, k))
+
+    def pontos_isocronas(self, tempo, fonte, limites_s):
+        """
+        Pontos que delimitam as isócronas: para cada limite (índice j) e
+        fonte, os vértices com tempo ≤ limite e, nas arestas que cruzam o
+        limite, o ponto interpolado onde ele é atingido (ou, se a outra ponta
+        é de outra fonte, o ponto de encontro das duas, se vier antes).
+        Retorna (lon, lat, fonte, j).
+        """
+        partes = []
+        origem, destino = self.origem, self.destino
+        outra = fonte[destino] != fonte[origem]
+        with np.errstate(invalid="ignore"):
+            encontro = np.where(outra & np.isfinite(tempo[destino]),
+                                (tempo[destino] + self.tempo_s - tempo[origem]) / (2 * self.tempo_s), 1.0)
+        for j, limite in enumerate(limites_s):
+            vertices = np.flatnonzero(tempo <= limite)
+            # Arestas que começam dentro e terminam fora ou em outra fonte
+            cruza = (tempo[origem] <= limite) & ((tempo[destino] > limite) | outra)
+            a, b = origem[cruza], destino[cruza]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                fracao = (limite - tempo[a]) / self.tempo_s[cruza]
+            fracao = np.clip(np.minimum(np.nan_to_num(fracao, nan=1.0), encontro[cruza]), 0.0, 1.0)
+            partes.append((
+                np.concatenate([self.lon[vertices], self.lon[a] + fracao * (self.lon[b] - self.lon[a])]),
+                np.concatenate([self.lat[vertices], self.lat[a] + fracao * (self.lat[b] - self.lat[a])]),
+                np.concatenate([fonte[vertices], fonte[a]]),
+                np.full(len(vertices) + len(a), j, dtype=np.int64),
+            ))
+        if not partes:
+            vazio = np.empty(0)
+            return vazio, vazio, vazio.astype(np.int64), vazio.astype(np.int64)
+        return tuple(np.concatenate(p) for p in zip(*partes))
@@ -0,0 +1,310 @@
+"""
+Histórico de Coordenadas (log append-only)
+Registra cada alteração de coordenada do CSV consolidado em um banco SQLite,
+permitindo auditar qual execução moveu um ponto e reconstruir a tabela
+como estava ao final de qualquer execução (ex.: desfazer um lote ruim do Google).
+
+Uso:
+    python historico_coordenadas.py execucoes
+    python historico_coordenadas.py auditar "<endereco_completo>"
+    python historico_coordenadas.py reconstruir <run_id> [--saida arquivo.csv] [--aplicar]
+"""
+
+import argparse
+import sqlite3
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# Diretórios
+BASE_DIR = Path(__file__).parent.parent
+DADOS_DIR = BASE_DIR / "dados"
+
+CSV_CONSOLIDADO = DADOS_DIR / "UBS_Ruas_Coordenadas_Consolidado.csv"
+HISTORICO_PATH = DADOS_DIR / "historico_coordenadas.sqlite"
+
+# Colunas que identificam um endereço no CSV consolidado
+# (a mesma rua pode aparecer em mais de uma microárea)
+COLUNAS_CHAVE = ["ubs_referencia", "micro_area", "endereco_completo"]
+
+# Colunas cujo histórico é registrado
+COLUNAS_RASTREADAS = ["latitude", "longitude", "metodo", "nota"]
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS execucoes (
+    run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    script      TEXT NOT NULL,
+    descricao   TEXT,
+    timestamp   INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS enderecos (
+    chave_id          INTEGER PRIMARY KEY,
+    ubs_referencia    TEXT NOT NULL,
+    micro_area        TEXT NOT NULL,
+    endereco_completo TEXT NOT NULL,
+    UNIQUE (ubs_referencia, micro_area, endereco_completo)
+);
+
+CREATE TABLE IF NOT EXISTS eventos (
+    evento_id     INTEGER PRIMARY KEY,
+    run_id        INTEGER NOT NULL REFERENCES execucoes (run_id),
+    chave_id      INTEGER NOT NULL REFERENCES enderecos (chave_id),
+    lat_anterior  REAL,
+    lon_anterior  REAL,
+    lat_nova      REAL,
+    lon_nova      REAL,
+    metodo        TEXT,
+    nota          TEXT,
+    location_type TEXT,
+    timestamp     INTEGER NOT NULL
+);
+
+-- Reconstrução e auditoria percorrem este índice em ordem (chave, execução)
+CREATE INDEX IF NOT EXISTS idx_eventos_chave_run ON eventos (chave_id, run_id, evento_id);
+CREATE INDEX IF NOT EXISTS idx_eventos_run ON eventos (run_id);
+
+-- Log append-only: eventos nunca são alterados nem apagados
+CREATE TRIGGER IF NOT EXISTS eventos_sem_update BEFORE UPDATE ON eventos
+BEGIN SELECT RAISE(ABORT, 'historico de coordenadas e append-only'); END;
+CREATE TRIGGER IF NOT EXISTS eventos_sem_delete BEFORE DELETE ON eventos
+BEGIN SELECT RAISE(ABORT, 'historico de coordenadas e append-only'); END;
+"""
+
+
+def _valor(v):
+    """Converte NaN/NA do pandas para None (NULL no SQLite)."""
+    return None if pd.isna(v) else v
+
+
+def _chaves(df):
+    """
+    Colunas-chave como texto. micro_area vira inteiro antes: uma coluna lida
+    como float (basta um NaN) daria "32.0" em vez de "32" e separaria o
+    histórico do mesmo endereço.
+    """
+    chaves = df[COLUNAS_CHAVE].copy()
+    if pd.api.types.is_numeric_dtype(chaves["micro_area"]):
+        chaves["micro_area"] = chaves["micro_area"].astype("Int64")
+    return chaves.astype(str)
+
+
+class HistoricoCoordenadas:
+    """Log append-only das alterações de coordenadas do CSV consolidado."""
+
+    def __init__(self, caminho=HISTORICO_PATH):
+        self.caminho = Path(caminho)
+        self.conn = sqlite3.connect(self.caminho)
+        self.conn.executescript(ESQUEMA)
+
+    def fechar(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    def iniciar_execucao(self, script, descricao=""):
+        """Registra uma nova execução e retorna seu run_id."""
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO execucoes (script, descricao, timestamp) VALUES (?, ?, ?)",
+                (script, descricao, int(time.time())),
+            )
+        return cur.lastrowid
+
+    def _chave_ids(self, df):
+        """Retorna uma Series com o chave_id de cada linha, criando os que faltam."""
+        chaves = _chaves(df)
+        unicas = list(chaves.drop_duplicates().itertuples(index=False, name=None))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO enderecos (ubs_referencia, micro_area, endereco_completo) "
+            "VALUES (?, ?, ?)",
+            unicas,
+        )
+        mapa = pd.DataFrame(
+            self.conn.execute(
+                "SELECT chave_id, ubs_referencia, micro_area, endereco_completo FROM enderecos"
+            ).fetchall(),
+            columns=["chave_id"] + COLUNAS_CHAVE,
+        )
+        return chaves.merge(mapa, on=COLUNAS_CHAVE, how="left")["chave_id"].to_numpy()
+
+    def registrar_alteracoes(self, run_id, df_antes, df_depois):
+        """
+        Compara o CSV antes/depois (mesmo índice) e grava um evento para cada
+        linha cujas coordenadas, método ou nota mudaram. Retorna o nº de eventos.
+        """
+        antes = df_antes.reindex(df_depois.index)
+        mudou = pd.Series(False, index=df_depois.index)
+        for col in COLUNAS_RASTREADAS:
+            a, d = antes[col], df_depois[col]
+            mudou |= ~((a == d) | (a.isna() & d.isna()))
+
+        alteradas = df_depois[mudou]
+        if alteradas.empty:
+            return 0
+        anteriores = antes[mudou]
+
+        location_type = alteradas["nota"].astype(str).str.extract(
+            r"^encontrado_([A-Z_]+)$", expand=False
+        )
+        agora = int(time.time())
+
+        with self.conn:
+            chave_ids = self._chave_ids(alteradas)
+            linhas = (
+                (
+                    run_id, int(chave_id),
+                    _valor(lat_a), _valor(lon_a), _valor(lat_d), _valor(lon_d),
+                    _valor(metodo), _valor(nota), _valor(lt), agora,
+                )
+                for chave_id, lat_a, lon_a, lat_d, lon_d, metodo, nota, lt in zip(
+                    chave_ids,
+                    anteriores["latitude"], anteriores["longitude"],
+                    alteradas["latitude"], alteradas["longitude"],
+                    alteradas["metodo"], alteradas["nota"], location_type,
+                )
+            )
+            self.conn.executemany(
+                "INSERT INTO eventos (run_id, chave_id, lat_anterior, lon_anterior, "
+                "lat_nova, lon_nova, metodo, nota, location_type, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                linhas,
+            )
+        return len(alteradas)
+
+    def registrar_estado_inicial(self, df, script):
+        """
+        Na primeira utilização, grava o estado atual do CSV como execução base,
+        para que a reconstrução de qualquer execução posterior seja completa.
+        """
+        if self.conn.execute("SELECT 1 FROM eventos LIMIT 1").fetchone():
+            return None
+        run_id = self.iniciar_execucao(script, "estado inicial")
+        vazio = df.copy()
+        vazio[COLUNAS_RASTREADAS] = None
+        self.registrar_alteracoes(run_id, vazio, df)
+        return run_id
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def execucoes(self):
+        """Lista as execuções com o número de eventos de cada uma."""
+        return self.conn.execute(
+            "SELECT x.run_id, x.script, x.descricao, x.timestamp, COUNT(e.evento_id) "
+            "FROM execucoes x LEFT JOIN eventos e ON e.run_id = x.run_id "
+            "GROUP BY x.run_id ORDER BY x.run_id"
+        )
+
+    def auditar(self, endereco):
+        """Itera sobre todos os eventos de um endereço, em ordem cronológica."""
+        return self.conn.execute(
+            "SELECT x.run_id, x.script, e.timestamp, d.ubs_referencia, d.micro_area, "
+            "e.lat_anterior, e.lon_anterior, e.lat_nova, e.lon_nova, e.metodo, e.nota, "
+            "e.location_type "
+            "FROM enderecos d "
+            "JOIN eventos e ON e.chave_id = d.chave_id "
+            "JOIN execucoes x ON x.run_id = e.run_id "
+            "WHERE d.endereco_completo = ? ORDER BY e.chave_id, e.evento_id",
+            (endereco,),
+        )
+
+    def estado_em(self, run_id):
+        """
+        Itera sobre o estado de cada endereço ao final da execução `run_id`.
+
+        Uma única varredura do índice (chave_id, run_id, evento_id): para cada
+        chave, o SQLite devolve as colunas da linha com o maior evento_id.
+        O cursor é consumido sob demanda, sem carregar o log em memória.
+        """
+        return self.conn.execute(
+            "SELECT d.ubs_referencia, d.micro_area, d.endereco_completo, "
+            "e.lat_nova, e.lon_nova, e.metodo, e.nota "
+            "FROM (SELECT chave_id, MAX(evento_id), lat_nova, lon_nova, metodo, nota "
+            "      FROM eventos WHERE run_id <= ? GROUP BY chave_id) e "
+            "JOIN enderecos d ON d.chave_id = e.chave_id",
+            (run_id,),
+        )
+
+    def reconstruir(self, run_id, df_atual):
+        """
+        Retorna uma cópia de `df_atual` com latitude, longitude, método e nota
+        como estavam ao final da execução `run_id`.
+        """
+        estado = pd.DataFrame(
+            self.estado_em(run_id).fetchall(),
+            columns=COLUNAS_CHAVE + COLUNAS_RASTREADAS,
+        )
+        df = df_atual.copy()
+        chaves = _chaves(df)
+        combinado = chaves.merge(estado, on=COLUNAS_CHAVE, how="left", indicator=True)
+        combinado.index = df.index
+        encontrado = combinado["_merge"] == "both"
+        for col in COLUNAS_RASTREADAS:
+            df.loc[encontrado, col] = combinado.loc[encontrado, col]
+        return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Histórico de coordenadas do CSV consolidado")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    sub.add_parser("execucoes", help="lista as execuções registradas")
+
+    p_auditar = sub.add_parser("auditar", help="mostra o histórico de um endereço")
+    p_auditar.add_argument("endereco")
+
+    p_rec = sub.add_parser("reconstruir", help="reconstrói o CSV ao final de uma execução")
+    p_rec.add_argument("run_id", type=int)
+    p_rec.add_argument("--saida", type=Path, help="arquivo CSV de saída")
+    p_rec.add_argument("--aplicar", action="store_true",
+                       help="sobrescreve o CSV consolidado (rollback registrado no histórico)")
+
+    args = parser.parse_args()
+
+    with HistoricoCoordenadas() as historico:
+        if args.comando == "execucoes":
+            print(f"{'run':>5}  {'data':19}  {'eventos':>8}  script")
+            for run_id, script, descricao, ts, n in historico.execucoes():
+                data = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+                extra = f" ({descricao})" if descricao else ""
+                print(f"{run_id:>5}  {data}  {n:>8}  {script}{extra}")
+
+        elif args.comando == "auditar":
+            eventos = historico.auditar(args.endereco).fetchall()
+            if not eventos:
+                print(f"❌ Nenhum evento para: {args.endereco}")
+                return
+            for run_id, script, ts, ubs, ma, lat_a, lon_a, lat_n, lon_n, metodo, nota, lt in eventos:
+                data = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+                print(f"[run {run_id} | {data} | {script}] {ubs}, MA{ma}")
+                print(f"   ({lat_a}, {lon_a}) → ({lat_n}, {lon_n})  {metodo} / {nota}")
+
+        elif args.comando == "reconstruir":
+            df = pd.read_csv(CSV_CONSOLIDADO)
+            df_rec = historico.reconstruir(args.run_id, df)
+            if args.aplicar:
+                run_id = historico.iniciar_execucao(
+                    "historico_coordenadas.py", f"rollback para run {args.run_id}"
+                )
+                df_rec.to_csv(CSV_CONSOLIDADO, index=False, encoding="utf-8-sig")
+                n = historico.registrar_alteracoes(run_id, df, df_rec)
+                print(f"✅ CSV consolidado restaurado para o run {args.run_id} ({n} alterações)")
+            else:
+                saida = args.saida or DADOS_DIR / f"UBS_Ruas_Coordenadas_Consolidado_run{args.run_id}.csv"
+                df_rec.to_csv(saida, index=False, encoding="utf-8-sig")
+                print(f"✅ CSV reconstruído salvo em: {saida}")
+
+
+if __name__ == "__main__":
+    main()
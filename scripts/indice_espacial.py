@@ -0,0 +1,325 @@
+"""
+Índices Espaciais
+Estruturas de busca espacial em NumPy usadas pelos scripts de verificação
+e geração de polígonos (consultas vetorizadas sobre arrays inteiros).
+"""
+
+import numpy as np
+
+
+def expandir_intervalos(inicios, contagens):
+    """
+    Concatena os intervalos [inicio, inicio + contagem) sem laço Python.
+    Retorna (posições, índice do intervalo de origem de cada posição).
+    """
+    total = int(contagens.sum())
+    origem = np.repeat(np.arange(len(contagens)), contagens)
+    if total == 0:
+        return np.empty(0, dtype=np.int64), origem
+    deslocamento = np.cumsum(contagens) - contagens
+    posicoes = np.repeat(inicios, contagens) + (np.arange(total) - np.repeat(deslocamento, contagens))
+    return posicoes, origem
+
+
+class IndiceGrade:
+    """
+    Grade uniforme sobre pontos (x, y).
+
+    Cada ponto é atribuído a uma célula de lado `tamanho_celula`; as células
+    são ordenadas por chave, e uma consulta localiza as células vizinhas com
+    `searchsorted`. Custo: O(n log n) na construção e O(q log n + pares) na
+    consulta, independente do número de pontos indexados longe da consulta.
+    """
+
+    def __init__(self, x, y, tamanho_celula):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.tamanho = float(tamanho_celula)
+
+        chaves = self._chave(*self._celula(self.x, self.y))
+        self.ordem = np.argsort(chaves, kind="stable")
+        self.chaves = chaves[self.ordem]
+
+    def __len__(self):
+        return len(self.x)
+
+    def _celula(self, x, y):
+        return (np.floor(x / self.tamanho).astype(np.int64),
+                np.floor(y / self.tamanho).astype(np.int64))
+
+    @staticmethod
+    def _chave(cx, cy):
+        # Chave única por célula (|cy| < 2**31 para qualquer grade realista)
+        return cx * 4294967296 + cy
+
+    def pares_vizinhos(self, qx, qy, raio_celulas=1):
+        """
+        Retorna (idx_consulta, idx_ponto) para todo ponto indexado nas células
+        até `raio_celulas` de distância da célula de cada consulta.
+        Consultas com NaN não geram pares.
+        """
+        qx = np.asarray(qx, dtype=float)
+        qy = np.asarray(qy, dtype=float)
+        validos = np.flatnonzero(~(np.isnan(qx) | np.isnan(qy)))
+        cx, cy = self._celula(qx[validos], qy[validos])
+
+        consultas, pontos = [], []
+        for dx in range(-raio_celulas, raio_celulas + 1):
+            for dy in range(-raio_celulas, raio_celulas + 1):
+                chave = self._chave(cx + dx, cy + dy)
+                inicio = np.searchsorted(self.chaves, chave, side="left")
+                fim = np.searchsorted(self.chaves, chave, side="right")
+                posicoes, origem = expandir_intervalos(inicio, fim - inicio)
+                consultas.append(validos[origem])
+                pontos.append(self.ordem[posicoes])
+
+        return np.concatenate(consultas), np.concatenate(pontos)
+
+    def primeiro_dentro(self, qx, qy, tolerancia):
+        """
+        Para cada consulta, o menor índice de ponto com |dx| < tol e |dy| < tol
+        (ou -1 se nenhum). Exige tolerancia <= tamanho_celula.
+        """
+        if tolerancia > self.tamanho:
+            raise ValueError("tolerância maior que o tamanho da célula da grade")
+        qx = np.asarray(qx, dtype=float)
+        qy = np.asarray(qy, dtype=float)
+        resultado = np.full(len(qx), len(self), dtype=np.int64)
+
+        q, p = self.pares_vizinhos(qx, qy)
+        dentro = (np.abs(qx[q] - self.x[p]) < tolerancia) & (np.abs(qy[q] - self.y[p]) < tolerancia)
+        np.minimum.at(resultado, q[dentro], p[dentro])
+
+        resultado[resultado == len(self)] = -1
+        return resultado
+
+
+def indice_hilbert(x, y, bits=16):
+    """
+    Posição de cada ponto (x, y) ao longo da curva de Hilbert sobre a caixa
+    envolvente dos pontos, discretizada em 2**bits × 2**bits células.
+    Pontos próximos no plano tendem a ter índices próximos.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = 1 << bits
+    if len(x) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    def discretizar(v):
+        amplitude = v.max() - v.min()
+        if amplitude == 0:
+            return np.zeros(len(v), dtype=np.int64)
+        return np.minimum(((v - v.min()) / amplitude * n).astype(np.int64), n - 1)
+
+    hx, hy = discretizar(x), discretizar(y)
+    d = np.zeros(len(x), dtype=np.int64)
+    s = n >> 1
+    while s > 0:
+        rx = (hx & s) > 0
+        ry = (hy & s) > 0
+        d += s * s * ((3 * rx.astype(np.int64)) ^ ry.astype(np.int64))
+        # Rotaciona o quadrante para que a curva continue contínua
+        espelhar = ~ry & rx
+        hx = np.where(espelhar, n - 1 - hx, hx)
+        hy = np.where(espelhar, n - 1 - hy, hy)
+        hx, hy = np.where(~ry, hy, hx), np.where(~ry, hx, hy)
+        s >>= 1
+    return d
+
+
+class ArvoreSTR:
+    """
+    R-tree empacotada (Sort-Tile-Recursive) sobre retângulos
+    (xmin, ymin, xmax, ymax).
+
+    Os itens são ordenados uma única vez em "fatias" verticais ordenadas por
+    y, e cada nível agrupa `capacidade` nós consecutivos do nível de baixo.
+    As consultas descem a árvore para todas as caixas de consulta ao mesmo
+    tempo: custo O(q log n + pares), em vez de O(q × n).
+    """
+
+    def __init__(self, xmin, ymin, xmax, ymax, capacidade=16):
+        caixas = np.column_stack([xmin, ymin, xmax, ymax]).astype(float).reshape(-1, 4)
+        self.capacidade = int(capacidade)
+        n = len(caixas)
+
+        # Ordem STR: fatias por x, e y dentro de cada fatia
+        cx = (caixas[:, 0] + caixas[:, 2]) / 2
+        cy = (caixas[:, 1] + caixas[:, 3]) / 2
+        n_fatias = max(1, int(np.ceil(np.sqrt(n / self.capacidade))))
+        por_fatia = n_fatias * self.capacidade
+        fatia = np.empty(n, dtype=np.int64)
+        fatia[np.argsort(cx, kind="stable")] = np.arange(n) // por_fatia
+        self.ordem = np.lexsort((cy, fatia))
+
+        # niveis[0] = itens na ordem STR; cada nível acima agrupa o anterior
+        self.niveis = [caixas[self.ordem]]
+        while len(self.niveis[-1]) > 1:
+            abaixo = self.niveis[-1]
+            grupos = np.arange(len(abaixo)) // self.capacidade
+            inicios = np.flatnonzero(np.r_[True, grupos[1:] != grupos[:-1]])
+            self.niveis.append(np.column_stack([
+                np.minimum.reduceat(abaixo[:, 0], inicios),
+                np.minimum.reduceat(abaixo[:, 1], inicios),
+                np.maximum.reduceat(abaixo[:, 2], inicios),
+                np.maximum.reduceat(abaixo[:, 3], inicios),
+            ]))
+
+    def __len__(self):
+        return len(self.ordem)
+
+    def consultar(self, qxmin, qymin, qxmax, qymax):
+        """
+        Retorna (idx_consulta, idx_item) para todo item cuja caixa intercepta
+        (inclusive nas bordas) a caixa de cada consulta. Para pontos, use
+        qxmin = qxmax e qymin = qymax.
+        """
+        consulta = np.column_stack([qxmin, qymin, qxmax, qymax]).astype(float).reshape(-1, 4)
+        vazio = np.empty(0, dtype=np.int64)
+        if len(self) == 0 or len(consulta) == 0:
+            return vazio, vazio
+
+        # Fronteira de pares (consulta, nó), começando pela raiz
+        q = np.arange(len(consulta))
+        no = np.zeros(len(consulta), dtype=np.int64)
+        for nivel in range(len(self.niveis) - 1, -1, -1):
+            caixas = self.niveis[nivel]
+            cruza = ((caixas[no, 0] <= consulta[q, 2]) & (caixas[no, 2] >= consulta[q, 0]) &
+                     (caixas[no, 1] <= consulta[q, 3]) & (caixas[no, 3] >= consulta[q, 1]))
+            q, no = q[cruza], no[cruza]
+            if nivel == 0:
+                break
+            inicio = no * self.capacidade
+            contagem = np.minimum(inicio + self.capacidade, len(self.niveis[nivel - 1])) - inicio
+            no, origem = expandir_intervalos(inicio, contagem)
+            q = q[origem]
+        return q, self.ordem[no]
+
+
+class ArvoreKD:
+    """
+    Árvore k-d sobre pontos (x, y) para os k vizinhos mais próximos.
+
+    A árvore é completa e implícita (nó i tem filhos 2i+1 e 2i+2): cada nó
+    divide os seus pontos ao meio pelo eixo mais largo, até folhas de no
+    máximo `tamanho_folha` pontos, guardadas contíguas em `ordem`. Cada nó
+    guarda a caixa dos seus pontos. As consultas são em lote: todas descem
+    juntas, podando os nós cuja caixa está mais longe que o k-ésimo vizinho
+    já conhecido da consulta.
+    """
+
+    def __init__(self, x, y, tamanho_folha=16):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        n = len(self.x)
+        n_folhas = max(1, int(np.ceil(n / tamanho_folha)))
+        self.profundidade = int(np.ceil(np.log2(n_folhas)))
+        n_nos = 2 ** (self.profundidade + 1) - 1
+
+        # Limites [inicio, fim) de cada nó em `ordem`, nível a nível
+        self.ordem = np.arange(n)
+        self.inicio = np.zeros(n_nos, dtype=np.int64)
+        self.fim = np.zeros(n_nos, dtype=np.int64)
+        self.fim[0] = n
+        self.caixas = np.full((n_nos, 4), [np.inf, np.inf, -np.inf, -np.inf])
+        for no in range(n_nos):
+            inicio, fim = self.inicio[no], self.fim[no]
+            indices = self.ordem[inicio:fim]
+            if len(indices):
+                px, py = self.x[indices], self.y[indices]
+                self.caixas[no] = (px.min(), py.min(), px.max(), py.max())
+            if 2 * no + 1 >= n_nos:
+                continue
+            if len(indices):
+                eixo = px if px.max() - px.min() >= py.max() - py.min() else py
+                self.ordem[inicio:fim] = indices[np.argsort(eixo, kind="stable")]
+            meio = (inicio + fim) // 2
+            self.inicio[2 * no + 1], self.fim[2 * no + 1] = inicio, meio
+            self.inicio[2 * no + 2], self.fim[2 * no + 2] = meio, fim
+        self.primeira_folha = 2 ** self.profundidade - 1
+
+    def __len__(self):
+        return len(self.x)
+
+    def _distancia2_caixa(self, qx, qy, no):
+        caixa = self.caixas[no]
+        dx = np.maximum(np.maximum(caixa[:, 0] - qx, qx - caixa[:, 2]), 0)
+        dy = np.maximum(np.maximum(caixa[:, 1] - qy, qy - caixa[:, 3]), 0)
+        return dx * dx + dy * dy
+
+    @staticmethod
+    def _menores_k(consulta, ponto, distancia2, k, n_consultas):
+        """
+        Os k pares de menor distância de cada consulta (ordenados), em arrays
+        (n_consultas, k). `consulta` vem ordenada; os candidatos de cada uma
+        viram uma linha de uma matriz preenchida com infinito, onde a seleção
+        é um argpartition por linha (bem mais barato que ordenar os pares).
+        """
+        contagens = np.bincount(consulta, minlength=n_consultas)
+        largura = max(int(contagens.max()), k)
+        inicio = np.cumsum(contagens) - contagens
+        coluna = np.arange(len(consulta)) - inicio[consulta]
+        matriz = np.full((n_consultas, largura), np.inf)
+        pontos = np.full((n_consultas, largura), -1, dtype=np.int64)
+        matriz[consulta, coluna] = distancia2
+        pontos[consulta, coluna] = ponto
+        if largura > k:
+            escolhidos = np.argpartition(matriz, k - 1, axis=1)[:, :k]
+            matriz = np.take_along_axis(matriz, escolhidos, axis=1)
+            pontos = np.take_along_axis(pontos, escolhidos, axis=1)
+        ordem = np.argsort(matriz[:, :k], axis=1, kind="stable")
+        return np.take_along_axis(pontos, ordem, axis=1), np.take_along_axis(matriz, ordem, axis=1)
+
+    def _pares_folhas(self, consulta, folha):
+        """Pares (consulta, ponto) com todos os pontos de cada folha."""
+        posicoes, origem = expandir_intervalos(self.inicio[folha], self.fim[folha] - self.inicio[folha])
+        return consulta[origem], self.ordem[posicoes]
+
+    def vizinhos(self, qx, qy, k=1, bloco=16384):
+        """
+        (índices, distâncias) dos k pontos mais próximos de cada consulta,
+        em arrays (n_consultas, k) ordenados por distância (euclidiana).
+        As consultas são processadas em blocos para limitar a memória.
+        """
+        qx = np.asarray(qx, dtype=float)
+        qy = np.asarray(qy, dtype=float)
+        k = min(int(k), len(self))
+        if k == 0 or len(qx) == 0:
+            return np.empty((len(qx), k), dtype=np.int64), np.empty((len(qx), k))
+        partes = [self._vizinhos_bloco(qx[i:i + bloco], qy[i:i + bloco], k)
+                  for i in range(0, len(qx), bloco)]
+        return np.vstack([p[0] for p in partes]), np.vstack([p[1] for p in partes])
+
+    def _vizinhos_bloco(self, qx, qy, k):
+        n_consultas = len(qx)
+        todas = np.arange(n_consultas)
+
+        # 1. Raio inicial: o k-ésimo vizinho dentro da folha "natural" de cada
+        #    consulta (a de menor distância à caixa, descendo a árvore)
+        no = np.zeros(n_consultas, dtype=np.int64)
+        for _ in range(self.profundidade):
+            esquerda, direita = 2 * no + 1, 2 * no + 2
+            vazio_dir = self.fim[direita] <= self.inicio[direita]
+            ir_esquerda = vazio_dir | (self._distancia2_caixa(qx, qy, esquerda)
+                                       <= self._distancia2_caixa(qx, qy, direita))
+            no = np.where(ir_esquerda, esquerda, direita)
+        consulta, ponto = self._pares_folhas(todas, no)
+        d2 = (self.x[ponto] - qx[consulta]) ** 2 + (self.y[ponto] - qy[consulta]) ** 2
+        _, distancias = self._menores_k(consulta, ponto, d2, k, n_consultas)
+        raio2 = distancias[:, -1]
+
+        # 2. Descida com poda: só os nós cuja caixa está dentro do raio
+        consulta, no = todas, np.zeros(n_consultas, dtype=np.int64)
+        for _ in range(self.profundidade):
+            consulta = np.repeat(consulta, 2)
+            no = (2 * np.repeat(no, 2) + 1) + np.tile([0, 1], len(no))
+            perto = ((self.fim[no] > self.inicio[no])
+                     & (self._distancia2_caixa(qx[consulta], qy[consulta], no) <= raio2[consulta]))
+            consulta, no = consulta[perto], no[perto]
+
+        # 3. Pontos das folhas alcançadas
+        consulta, ponto = self._pares_folhas(consulta, no)
+        d2 = (self.x[ponto] - qx[consulta]) ** 2 + (self.y[ponto] - qy[consulta]) ** 2
+        indices, distancias = self._menores_k(consulta, ponto, d2, k, n_consultas)
+        return indices, np.sqrt(distancias)
@@ -5,6 +5,8 @@ Integra os resultados da API do Google Maps ao CSV consolidado
 import pandas as pd
 from pathlib import Path
 
+from historico_coordenadas import HistoricoCoordenadas
+
 # Diretórios
 BASE_DIR = Path(__file__).parent.parent
 DADOS_DIR = BASE_DIR / "dados"
@@ -14,6 +16,7 @@ def main():
     # 1. Carregar CSV consolidado atual
     csv_consolidado = DADOS_DIR / "UBS_Ruas_Coordenadas_Consolidado.csv"
     df = pd.read_csv(csv_consolidado)
+    df_antes = df.copy()
     print(f"CSV consolidado: {len(df)} endereços")
     
     # 2. Carregar resultados do Google API
@@ -59,10 +62,16 @@ def main():
     
     print(f"\nEndereços atualizados com Google API: {atualizados}")
     
-    # 5. Salvar CSV atualizado
+    # 5. Salvar CSV atualizado e registrar as alterações no histórico
     df.to_csv(csv_consolidado, index=False, encoding='utf-8-sig')
     print(f"✅ CSV consolidado atualizado: {csv_consolidado}")
     
+    with HistoricoCoordenadas() as historico:
+        historico.registrar_estado_inicial(df_antes, "integrar_google_csv.py")
+        run_id = historico.iniciar_execucao("integrar_google_csv.py", csv_google.name)
+        eventos = historico.registrar_alteracoes(run_id, df_antes, df)
+    print(f"📜 Histórico: {eventos} eventos registrados (run {run_id})")
+    
     # 6. Resumo
     print("\n=== RESUMO FINAL ===")
     for metodo, count in df['metodo'].value_counts().items():
@@ -0,0 +1,263 @@
+"""
+Mapa de Cobertura das Microáreas
+Rasteriza os polígonos de dados/microareas_ubs.geojson em uma grade sobre a
+bbox do município e mostra onde não há nenhuma microárea (lacunas) e onde
+há mais de uma (sobreposições).
+
+Rasterização por linhas de varredura, vetorizada para todos os polígonos
+de uma vez: cada aresta gera os cruzamentos com os centros das linhas da
+grade que atravessa; em cada (polígono, linha) os cruzamentos ordenados
+formam intervalos (regra par-ímpar) somados em uma grade de diferenças.
+
+Saídas (em dados/):
+- cobertura_microareas.geojson: lacunas e sobreposições como retângulos
+- cobertura_microareas.png (+ .pgw, georreferência para o QGIS)
+- relatorios/cobertura_microareas.json/.html: resumo
+
+Uso:
+    python mapear_cobertura.py [--resolucao-m 50]
+"""
+
+import argparse
+import json
+import struct
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from geometria import BBOX_NSS, KM_POR_GRAU_LAT, aneis_geometria, km_por_grau_lon
+from indice_espacial import expandir_intervalos
+from relatorio import Cronometro, agora_iso, salvar_relatorio
+from saida_geojson import carregar_geojson
+
+# Diretórios
+BASE_DIR = Path(__file__).parent.parent
+DADOS_DIR = BASE_DIR / "dados"
+
+RESOLUCAO_M = 50
+
+# Cores (RGBA) do PNG: sem cobertura, uma microárea, duas ou mais
+COR_LACUNA = (230, 57, 70, 160)
+COR_COBERTA = (0, 0, 0, 0)
+COR_SOBREPOSTA = (29, 53, 87, 200)
+
+
+class Grade:
+    """Grade regular sobre a caixa; linha 0 no topo (norte), como no PNG."""
+
+    def __init__(self, caixa, resolucao_m):
+        lat_centro = (caixa["lat_min"] + caixa["lat_max"]) / 2
+        self.caixa = caixa
+        self.dy = resolucao_m / 1000 / KM_POR_GRAU_LAT
+        self.dx = resolucao_m / 1000 / km_por_grau_lon(lat_centro)
+        # Só células com o centro dentro da caixa
+        self.linhas = int((caixa["lat_max"] - caixa["lat_min"]) / self.dy + 0.5)
+        self.colunas = int((caixa["lon_max"] - caixa["lon_min"]) / self.dx + 0.5)
+
+    def x(self, coluna):
+        return self.caixa["lon_min"] + np.asarray(coluna) * self.dx
+
+    def y(self, linha):
+        return self.caixa["lat_max"] - np.asarray(linha) * self.dy
+
+
+def rasterizar(geometrias, grade):
+    """
+    Número de polígonos que cobrem o centro de cada célula da grade
+    (array linhas × colunas).
+    """
+    # Todas as arestas de todos os polígonos, com o índice do polígono
+    x1, y1, x2, y2, poligono = [], [], [], [], []
+    for k, geometria in enumerate(geometrias):
+        for anel in aneis_geometria(geometria):
+            anel = np.asarray(anel, dtype=float)
+            x1.append(anel[:-1, 0])
+            y1.append(anel[:-1, 1])
+            x2.append(anel[1:, 0])
+            y2.append(anel[1:, 1])
+            poligono.append(np.full(len(anel) - 1, k))
+    contagem = np.zeros((grade.linhas, grade.colunas), dtype=np.int32)
+    if not x1:
+        return contagem
+    x1, y1, x2, y2, poligono = map(np.concatenate, (x1, y1, x2, y2, poligono))
+
+    # Linhas da grade cujo centro yc cruza cada aresta: min(y) <= yc < max(y)
+    def posicao(y):
+        return (grade.caixa["lat_max"] - y) / grade.dy - 0.5
+
+    primeira = np.floor(posicao(np.maximum(y1, y2))).astype(np.int64) + 1
+    ultima = np.floor(posicao(np.minimum(y1, y2))).astype(np.int64)
+    primeira = np.clip(primeira, 0, grade.linhas)
+    ultima = np.clip(ultima, -1, grade.linhas - 1)
+    quantas = np.maximum(ultima - primeira + 1, 0)
+    linha, aresta = expandir_intervalos(primeira, quantas)
+
+    yc = grade.y(linha + 0.5)
+    ya, yb = y1[aresta], y2[aresta]
+    cruza = (ya > yc) != (yb > yc)
+    linha, aresta, yc = linha[cruza], aresta[cruza], yc[cruza]
+    xc = x1[aresta] + (yc - y1[aresta]) * (x2[aresta] - x1[aresta]) / (y2[aresta] - y1[aresta])
+
+    # Cruzamentos ordenados por (polígono, linha, x): pares consecutivos = intervalos
+    p = poligono[aresta]
+    ordem = np.lexsort((xc, linha, p))
+    p, linha, xc = p[ordem], linha[ordem], xc[ordem]
+    novo_grupo = np.r_[True, (p[1:] != p[:-1]) | (linha[1:] != linha[:-1])]
+    inicio_grupo = np.maximum.accumulate(np.where(novo_grupo, np.arange(len(p)), 0))
+    entrada = np.flatnonzero((np.arange(len(p)) - inicio_grupo) % 2 == 0)
+    entrada = entrada[entrada + 1 < len(p)]
+    entrada = entrada[~novo_grupo[entrada + 1]]
+    saida = entrada + 1
+
+    # Colunas cujo centro está em [x_entrada, x_saida)
+    def coluna(x):
+        return np.clip(np.ceil((x - grade.caixa["lon_min"]) / grade.dx - 0.5),
+                       0, grade.colunas).astype(np.int64)
+
+    diferencas = np.zeros((grade.linhas, grade.colunas + 1), dtype=np.int32)
+    np.add.at(diferencas, (linha[entrada], coluna(xc[entrada])), 1)
+    np.add.at(diferencas, (linha[entrada], coluna(xc[saida])), -1)
+    contagem[:] = np.cumsum(diferencas, axis=1)[:, :-1]
+    return contagem
+
+
+def retangulos(contagem, grade):
+    """
+    Lacunas (0) e sobreposições (2+) como retângulos GeoJSON: sequências
+    iguais em cada linha, unidas às idênticas das linhas seguintes.
+    """
+    classe = np.where(contagem == 1, 1, contagem)
+    linhas, colunas = classe.shape
+    plano = classe.ravel()
+    inicio = np.r_[True, plano[1:] != plano[:-1]]
+    inicio[::colunas] = True
+    pos = np.flatnonzero(inicio)
+    fim = np.r_[pos[1:], plano.size]
+    linha, c0, c1, valor = pos // colunas, pos % colunas, (fim - 1) % colunas + 1, plano[pos]
+    manter = valor != 1
+    linha, c0, c1, valor = linha[manter], c0[manter], c1[manter], valor[manter]
+
+    # Junta sequências idênticas em linhas consecutivas
+    ordem = np.lexsort((linha, c1, c0, valor))
+    linha, c0, c1, valor = linha[ordem], c0[ordem], c1[ordem], valor[ordem]
+    continua = np.zeros(len(linha), dtype=bool)
+    continua[1:] = ((valor[1:] == valor[:-1]) & (c0[1:] == c0[:-1]) &
+                    (c1[1:] == c1[:-1]) & (linha[1:] == linha[:-1] + 1))
+    grupo_inicio = np.flatnonzero(~continua)
+    grupo_fim = np.r_[grupo_inicio[1:], len(linha)] - 1
+
+    features = []
+    for a, b in zip(grupo_inicio, grupo_fim):
+        x0, x1 = float(grade.x(c0[a])), float(grade.x(c1[a]))
+        y0, y1 = float(grade.y(linha[a])), float(grade.y(linha[b] + 1))
+        features.append({
+            "type": "Feature",
+            "properties": {
+                "classe": "lacuna" if valor[a] == 0 else "sobreposicao",
+                "cobertura": int(valor[a]),
+            },
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [[[x0, y1], [x1, y1], [x1, y0], [x0, y0], [x0, y1]]],
+            },
+        })
+    return features
+
+
+def salvar_png(caminho, rgba):
+    """Grava um array (altura, largura, 4) uint8 como PNG RGBA (zlib + struct)."""
+    altura, largura, _ = rgba.shape
+    cru = np.hstack([np.zeros((altura, 1), dtype=np.uint8), rgba.reshape(altura, -1)])
+
+    def bloco(tipo, dados):
+        return (struct.pack(">I", len(dados)) + tipo + dados +
+                struct.pack(">I", zlib.crc32(tipo + dados) & 0xFFFFFFFF))
+
+    with open(caminho, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(bloco(b"IHDR", struct.pack(">IIBBBBB", largura, altura, 8, 6, 0, 0, 0)))
+        f.write(bloco(b"IDAT", zlib.compress(cru.tobytes(), 6)))
+        f.write(bloco(b"IEND", b""))
+
+
+def salvar_world_file(caminho, grade):
+    """World file (.pgw) com a georreferência do PNG (centro do pixel superior esquerdo)."""
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write(f"{grade.dx:.12f}\n0.0\n0.0\n{-grade.dy:.12f}\n"
+                f"{float(grade.x(0.5)):.12f}\n{float(grade.y(0.5)):.12f}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mapa de lacunas e sobreposições das microáreas")
+    parser.add_argument("--resolucao-m", type=float, default=RESOLUCAO_M,
+                        help="lado da célula da grade em metros (padrão: %(default)s)")
+    args = parser.parse_args()
+
+    microareas = carregar_geojson(DADOS_DIR / "microareas_ubs.geojson")
+    geometrias = [feature["geometry"] for feature in microareas["features"]]
+
+    cron = Cronometro()
+    grade = Grade(BBOX_NSS, args.resolucao_m)
+    with cron.etapa("rasterizacao"):
+        contagem = rasterizar(geometrias, grade)
+    with cron.etapa("retangulos"):
+        features = retangulos(contagem, grade)
+
+    geojson_path = DADOS_DIR / "cobertura_microareas.geojson"
+    with open(geojson_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "type": "FeatureCollection",
+            "name": "cobertura_microareas",
+            "crs": {"type": "name", "properties": {"name": "urn:ogc:def:crs:OGC:1.3:CRS84"}},
+            "features": features,
+        }, f, ensure_ascii=False)
+
+    cores = np.array([COR_LACUNA, COR_COBERTA, COR_SOBREPOSTA], dtype=np.uint8)
+    png_path = DADOS_DIR / "cobertura_microareas.png"
+    salvar_png(png_path, cores[np.minimum(contagem, 2)])
+    salvar_world_file(png_path.with_suffix(".pgw"), grade)
+
+    celulas = contagem.size
+    area_celula_km2 = (args.resolucao_m / 1000) ** 2
+    contagens = {
+        "celulas": int(celulas),
+        "linhas": grade.linhas,
+        "colunas": grade.colunas,
+        "sem_cobertura": int((contagem == 0).sum()),
+        "cobertura_unica": int((contagem == 1).sum()),
+        "sobrepostas": int((contagem >= 2).sum()),
+    }
+    for chave in ("sem_cobertura", "cobertura_unica", "sobrepostas"):
+        contagens[f"{chave}_km2"] = round(contagens[chave] * area_celula_km2, 3)
+        contagens[f"{chave}_pct"] = round(100 * contagens[chave] / celulas, 2)
+
+    relatorio = {
+        "relatorio": "cobertura_microareas",
+        "titulo": "Cobertura das Microáreas no Município",
+        "gerado_em": agora_iso(),
+        "entrada": "dados/microareas_ubs.geojson",
+        "parametros": {"bbox": BBOX_NSS, "resolucao_m": args.resolucao_m},
+        "problemas": contagens["sobrepostas"],
+        "contagens": contagens,
+        "tempos_s": cron.tempos,
+    }
+    caminho_json, caminho_html = salvar_relatorio(relatorio, "cobertura_microareas")
+
+    print("=" * 70)
+    print("COBERTURA DAS MICROÁREAS")
+    print("=" * 70)
+    print(f"\nGrade: {grade.linhas} × {grade.colunas} células de {args.resolucao_m:g} m")
+    print(f"   ⬜ Sem cobertura: {contagens['sem_cobertura_pct']}% ({contagens['sem_cobertura_km2']} km²)")
+    print(f"   ✅ Uma microárea: {contagens['cobertura_unica_pct']}% ({contagens['cobertura_unica_km2']} km²)")
+    print(f"   ⚠️  Sobrepostas: {contagens['sobrepostas_pct']}% ({contagens['sobrepostas_km2']} km²)")
+    print(f"   ⏱️  Rasterização: {cron.tempos['rasterizacao']:.3f} s")
+
+    print(f"\n📁 Lacunas e sobreposições: {geojson_path}")
+    print(f"📁 Imagem: {png_path} (+ .pgw)")
+    print(f"📁 Relatório JSON: {caminho_json}")
+    print(f"📁 Relatório HTML: {caminho_html}")
+
+
+if __name__ == "__main__":
+    main()
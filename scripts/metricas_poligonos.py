@@ -0,0 +1,193 @@
+"""
+Métricas dos Polígonos
+Usado por verificar_poligonos.py e gerar_poligonos.py.
+
+Todas as features são carregadas de uma vez em arrays NumPy "ragged"
+(vértices de todos os anéis concatenados + índice do anel e da feature de
+cada vértice) e as métricas saem em uma única passada vetorizada, sem laço
+por polígono:
+- área (km²) numa projeção azimutal equivalente de Lambert (área exata no
+  elipsoide WGS84, via latitude autálica) centrada nos próprios dados
+- centróide verdadeiro do polígono (não a média dos vértices), buracos
+  descontados
+- caixa envolvente (lon/lat), largura e altura (km)
+- perímetro (km) de todos os anéis
+- compacidade de Polsby–Popper: 4πA/P² (1 = círculo, → 0 = alongado)
+- distância (km, ortodrômica) do centróide até o ponto da UBS
+"""
+
+import numpy as np
+import pandas as pd
+
+# Elipsoide WGS84
+SEMIEIXO_KM = 6378.137
+ACHATAMENTO = 1 / 298.257223563
+E2 = ACHATAMENTO * (2 - ACHATAMENTO)
+E = np.sqrt(E2)
+
+# Raio médio da Terra (distâncias ortodrômicas)
+RAIO_MEDIO_KM = 6371.0088
+
+# Coeficientes da série latitude geodésica ↔ autálica
+_A1 = E2 / 3 + 31 * E2 ** 2 / 180 + 517 * E2 ** 3 / 5040
+_A2 = 23 * E2 ** 2 / 360 + 251 * E2 ** 3 / 3780
+_A3 = 761 * E2 ** 3 / 45360
+_QP = 1 - (1 - E2) / (2 * E) * np.log((1 - E) / (1 + E))
+RAIO_AUTALICO_KM = SEMIEIXO_KM * np.sqrt(_QP / 2)
+
+COLUNAS = ["area_km2", "perimetro_km", "compacidade", "centroide_lon", "centroide_lat",
+           "lon_min", "lat_min", "lon_max", "lat_max", "largura_km", "altura_km",
+           "vertices", "distancia_ubs_km"]
+
+
+def _autalica(phi):
+    return phi - _A1 * np.sin(2 * phi) + _A2 * np.sin(4 * phi) - _A3 * np.sin(6 * phi)
+
+
+def _geodesica(beta):
+    return beta + _A1 * np.sin(2 * beta) + _A2 * np.sin(4 * beta) + _A3 * np.sin(6 * beta)
+
+
+class ProjecaoEquivalente:
+    """Azimutal equivalente de Lambert (elipsoidal) centrada em (lon0, lat0), em km."""
+
+    def __init__(self, lon0, lat0):
+        self.lon0 = np.radians(lon0)
+        self.beta0 = _autalica(np.radians(lat0))
+
+    def direta(self, lon, lat):
+        beta = _autalica(np.radians(lat))
+        dlon = np.radians(lon) - self.lon0
+        cos_c = (np.sin(self.beta0) * np.sin(beta)
+                 + np.cos(self.beta0) * np.cos(beta) * np.cos(dlon))
+        k = RAIO_AUTALICO_KM * np.sqrt(2 / (1 + cos_c))
+        x = k * np.cos(beta) * np.sin(dlon)
+        y = k * (np.cos(self.beta0) * np.sin(beta) - np.sin(self.beta0) * np.cos(beta) * np.cos(dlon))
+        return x, y
+
+    def inversa(self, x, y):
+        rho = np.hypot(x, y)
+        c = 2 * np.arcsin(np.clip(rho / (2 * RAIO_AUTALICO_KM), -1, 1))
+        seno_c, cos_c = np.sin(c), np.cos(c)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            beta = np.where(rho > 0, np.arcsin(cos_c * np.sin(self.beta0)
+                                               + y * seno_c * np.cos(self.beta0) / rho), self.beta0)
+        dlon = np.arctan2(x * seno_c,
+                          rho * np.cos(self.beta0) * cos_c - y * np.sin(self.beta0) * seno_c)
+        return np.degrees(self.lon0 + dlon), np.degrees(_geodesica(beta))
+
+
+def distancia_km(lon1, lat1, lon2, lat2):
+    """Distância ortodrômica (haversine, km) entre pontos; aceita arrays."""
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(v, dtype=float)) for v in (lon1, lat1, lon2, lat2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * RAIO_MEDIO_KM * np.arcsin(np.sqrt(a))
+
+
+def aneis_concatenados(geometrias):
+    """
+    Arrays ragged de todas as geometrias (Polygon/MultiPolygon; None = vazia):
+    (coords (n, 2) com os anéis fechados, anel de cada vértice, feature de
+    cada anel, sinal de cada anel: +1 externo, -1 buraco).
+    """
+    partes, tamanhos, feature, sinal = [], [], [], []
+    for k, geometria in enumerate(geometrias):
+        if geometria is None:
+            continue
+        poligonos = ([geometria["coordinates"]] if geometria["type"] == "Polygon"
+                     else geometria["coordinates"])
+        for poligono in poligonos:
+            for a, anel in enumerate(poligono):
+                partes.append(np.asarray(anel, dtype=float).reshape(-1, 2))
+                tamanhos.append(len(anel))
+                feature.append(k)
+                sinal.append(1.0 if a == 0 else -1.0)
+    if not partes:
+        return np.empty((0, 2)), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    return (np.concatenate(partes), np.repeat(np.arange(len(tamanhos)), tamanhos),
+            np.array(feature), np.array(sinal))
+
+
+def metricas(geometrias, ubs_lon=None, ubs_lat=None):
+    """
+    Métricas (DataFrame com as COLUNAS, uma linha por geometria, NaN para
+    geometrias vazias) de uma lista de geometrias GeoJSON. `ubs_lon` e
+    `ubs_lat` (arrays alinhados às geometrias, NaN se desconhecido) dão o
+    ponto da UBS de cada feature para distancia_ubs_km.
+    """
+    n = len(geometrias)
+    resultado = pd.DataFrame(np.nan, index=range(n), columns=COLUNAS)
+    coords, anel, feature_anel, sinal = aneis_concatenados(geometrias)
+    if len(coords) == 0:
+        resultado["vertices"] = 0
+        return resultado
+    n_aneis = len(feature_anel)
+    feature = feature_anel[anel]
+
+    # Projeção equivalente centrada nos dados
+    projecao = ProjecaoEquivalente(coords[:, 0].mean(), coords[:, 1].mean())
+    x, y = projecao.direta(coords[:, 0], coords[:, 1])
+
+    # Segmentos (i, i+1) dentro do mesmo anel (os anéis são fechados)
+    mesmo = anel[:-1] == anel[1:]
+    seg_anel = anel[:-1][mesmo]
+    x0, y0, x1, y1 = x[:-1][mesmo], y[:-1][mesmo], x[1:][mesmo], y[1:][mesmo]
+    cruz = x0 * y1 - x1 * y0
+
+    # Área e momentos por anel; buracos contam negativo, qualquer que seja a orientação
+    area_anel = np.bincount(seg_anel, cruz, n_aneis) / 2
+    fator = sinal * np.sign(area_anel)
+    mx_anel = np.bincount(seg_anel, (x0 + x1) * cruz, n_aneis) / 6
+    my_anel = np.bincount(seg_anel, (y0 + y1) * cruz, n_aneis) / 6
+    area = np.bincount(feature_anel, fator * area_anel, n)
+    mx = np.bincount(feature_anel, fator * mx_anel, n)
+    my = np.bincount(feature_anel, fator * my_anel, n)
+    perimetro = np.bincount(feature[:-1][mesmo], np.hypot(x1 - x0, y1 - y0), n)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        centroide_lon, centroide_lat = projecao.inversa(mx / area, my / area)
+        compacidade = 4 * np.pi * area / perimetro ** 2
+
+    # Caixa envolvente
+    lon_min = np.full(n, np.inf)
+    lat_min = np.full(n, np.inf)
+    lon_max = np.full(n, -np.inf)
+    lat_max = np.full(n, -np.inf)
+    np.minimum.at(lon_min, feature, coords[:, 0])
+    np.minimum.at(lat_min, feature, coords[:, 1])
+    np.maximum.at(lon_max, feature, coords[:, 0])
+    np.maximum.at(lat_max, feature, coords[:, 1])
+
+    # Vértices distintos: os anéis fechados repetem o primeiro vértice
+    vertices = np.bincount(feature_anel, np.bincount(anel, minlength=n_aneis) - 1, n)
+
+    presente = np.bincount(feature_anel, minlength=n) > 0
+    lon_min, lat_min, lon_max, lat_max = (v[presente] for v in (lon_min, lat_min, lon_max, lat_max))
+    lat_centro = (lat_min + lat_max) / 2
+    resultado.loc[presente, "area_km2"] = area[presente]
+    resultado.loc[presente, "perimetro_km"] = perimetro[presente]
+    resultado.loc[presente, "compacidade"] = compacidade[presente]
+    resultado.loc[presente, "centroide_lon"] = centroide_lon[presente]
+    resultado.loc[presente, "centroide_lat"] = centroide_lat[presente]
+    resultado.loc[presente, "lon_min"] = lon_min
+    resultado.loc[presente, "lat_min"] = lat_min
+    resultado.loc[presente, "lon_max"] = lon_max
+    resultado.loc[presente, "lat_max"] = lat_max
+    resultado.loc[presente, "largura_km"] = distancia_km(lon_min, lat_centro, lon_max, lat_centro)
+    resultado.loc[presente, "altura_km"] = distancia_km(lon_min, lat_min, lon_min, lat_max)
+    resultado["vertices"] = vertices.astype(int)
+    if ubs_lon is not None and ubs_lat is not None:
+        resultado["distancia_ubs_km"] = distancia_km(centroide_lon, centroide_lat, ubs_lon, ubs_lat)
+        resultado.loc[~presente, "distancia_ubs_km"] = np.nan
+    return resultado
+
+
+def propriedades_metricas(linha):
+    """
+    Métricas de uma linha de `metricas` arredondadas para gravar nas
+    properties das features e nos relatórios (NaN → None).
+    """
+    casas = {"area_km2": 4, "perimetro_km": 3, "compacidade": 3,
+             "centroide_lon": 6, "centroide_lat": 6, "distancia_ubs_km": 3}
+    return {c: None if pd.isna(linha[c]) else round(float(linha[c]), k) for c, k in casas.items()}
@@ -0,0 +1,244 @@
+"""
+Codificação de Vector Tiles (Mapbox Vector Tile 2.1)
+Usado por gerar_tiles.py.
+
+Um tile MVT é uma mensagem protobuf (vector_tile.proto) com camadas; cada
+camada tem features com geometria em coordenadas inteiras do tile
+(0..EXTENSAO, y para baixo) codificada como comandos MoveTo/LineTo/
+ClosePath com deltas em zigzag, e atributos em tabelas de chaves/valores
+compartilhadas pela camada. O protobuf é escrito à mão (só os campos
+usados), sem dependências.
+
+Polígonos são recortados no quadrado do tile mais uma margem (MARGEM), com
+Sutherland–Hodgman vetorizado em NumPy (recortar_poligonos também recorta
+em retângulos maiores, para descer a pirâmide de tiles a partir do pai); anéis externos saem em sentido
+horário na tela (área positiva), buracos no anti-horário, como exige a
+especificação.
+"""
+
+import json
+import math
+
+import numpy as np
+
+# Resolução interna do tile e margem de recorte (unidades do tile)
+EXTENSAO = 4096
+MARGEM = 64
+
+GEOM_PONTO = 1
+GEOM_POLIGONO = 3
+
+_MOVE_TO, _LINE_TO, _CLOSE_PATH = 1, 2, 7
+
+
+# ============================================================================
+# PROTOBUF
+# ============================================================================
+
+def _varint(valor):
+    partes = bytearray()
+    while True:
+        byte = valor & 0x7F
+        valor >>= 7
+        if valor:
+            partes.append(byte | 0x80)
+        else:
+            partes.append(byte)
+            return bytes(partes)
+
+
+def _campo_varint(numero, valor):
+    return _varint(numero << 3) + _varint(valor)
+
+
+def _campo_bytes(numero, dados):
+    return _varint(numero << 3 | 2) + _varint(len(dados)) + dados
+
+
+def _empacotado(numero, valores):
+    return _campo_bytes(numero, b"".join(_varint(int(v)) for v in valores))
+
+
+def _zigzag(valores):
+    valores = np.asarray(valores, dtype=np.int64)
+    return (valores << 1) ^ (valores >> 63)
+
+
+def _valor(valor):
+    """Mensagem Value de um atributo."""
+    if isinstance(valor, bool):
+        return _campo_varint(7, int(valor))
+    if isinstance(valor, int):
+        if valor >= 0:
+            return _campo_varint(5, valor)
+        return _campo_varint(6, int(_zigzag([valor])[0]) & 0xFFFFFFFFFFFFFFFF)
+    if isinstance(valor, float):
+        return _varint(3 << 3 | 1) + np.float64(valor).tobytes()
+    if isinstance(valor, (list, dict)):
+        valor = json.dumps(valor, ensure_ascii=False)
+    return _campo_bytes(1, str(valor).encode("utf-8"))
+
+
+# ============================================================================
+# GEOMETRIA
+# ============================================================================
+
+def _recortar_borda(anel, eixo, limite, manter_menor):
+    """Um passo de Sutherland–Hodgman: recorta o anel (n, 2) no semiplano do eixo."""
+    if len(anel) == 0:
+        return anel
+    dentro = anel[:, eixo] <= limite if manter_menor else anel[:, eixo] >= limite
+    seguinte = np.concatenate([anel[1:], anel[:1]])
+    dentro_seguinte = np.concatenate([dentro[1:], dentro[:1]])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = (limite - anel[:, eixo]) / (seguinte[:, eixo] - anel[:, eixo])
+        cruzamento = anel + t[:, None] * (seguinte - anel)
+    cruzamento[:, eixo] = limite
+    # Cada aresta emite o vértice inicial (se dentro) e o cruzamento (se cruza)
+    candidatos = np.stack([anel, cruzamento], axis=1).reshape(-1, 2)
+    emitir = np.column_stack([dentro, dentro != dentro_seguinte]).ravel()
+    return candidatos[emitir]
+
+
+def recortar_anel(anel, minimo, maximo):
+    """
+    Recorta um anel (n, 2), sem vértice de fechamento, no retângulo
+    [minimo, maximo] (escalares ou (x, y)). Só as bordas que o anel cruza
+    são recortadas; um anel inteiro dentro do retângulo volta sem cópia.
+    """
+    if len(anel) == 0:
+        return anel
+    if np.isscalar(minimo):
+        minimo, maximo = (minimo, minimo), (maximo, maximo)
+    baixo, alto = anel.min(axis=0), anel.max(axis=0)
+    for eixo in (0, 1):
+        if baixo[eixo] < minimo[eixo]:
+            anel = _recortar_borda(anel, eixo, minimo[eixo], manter_menor=False)
+        if alto[eixo] > maximo[eixo]:
+            anel = _recortar_borda(anel, eixo, maximo[eixo], manter_menor=True)
+    return anel
+
+
+def recortar_poligonos(poligonos, minimo, maximo):
+    """
+    Recorta um (multi)polígono (listas de anéis (n, 2)) no retângulo
+    [minimo, maximo]. Anéis que ficam vazios saem; um externo vazio leva
+    junto o polígono e os seus buracos.
+    """
+    recortados = []
+    for poligono in poligonos:
+        aneis = []
+        for a, anel in enumerate(poligono):
+            anel = recortar_anel(anel, minimo, maximo)
+            if len(anel):
+                aneis.append(anel)
+            elif a == 0:
+                break
+        if aneis:
+            recortados.append(aneis)
+    return recortados
+
+
+def _inteiros(anel):
+    """Arredonda para a grade do tile e remove vértices consecutivos repetidos."""
+    anel = np.round(anel).astype(np.int64)
+    if len(anel) == 0:
+        return anel
+    diferente = np.any(anel != np.roll(anel, 1, axis=0), axis=1)
+    return anel[diferente]
+
+
+def _area_dupla(anel):
+    x, y = anel[:, 0], anel[:, 1]
+    return int(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+
+
+def comandos_poligono(poligonos):
+    """
+    Comandos MVT de um (multi)polígono em coordenadas do tile (float, anéis
+    sem fechamento, já recortados ou não). Retorna [] se nada sobra.
+    """
+    comandos, cursor = [], np.zeros(2, dtype=np.int64)
+    for poligono in poligonos:
+        for a, anel in enumerate(poligono):
+            anel = _inteiros(recortar_anel(anel, -MARGEM, EXTENSAO + MARGEM))
+            area = _area_dupla(anel) if len(anel) >= 3 else 0
+            if area == 0:
+                if a == 0:
+                    break  # externo degenerado: descarta o polígono e seus buracos
+                continue
+            # Externo com área positiva (horário na tela), buraco negativa
+            if (area > 0) != (a == 0):
+                anel = anel[::-1]
+            deltas = np.diff(np.vstack([cursor, anel]), axis=0)
+            cursor = anel[-1]
+            comandos.append(np.r_[_MOVE_TO | 1 << 3, _zigzag(deltas[0]),
+                                  _LINE_TO | (len(anel) - 1) << 3, _zigzag(deltas[1:]).ravel(),
+                                  _CLOSE_PATH | 1 << 3])
+    return np.concatenate(comandos).tolist() if comandos else []
+
+
+def comandos_pontos(pontos):
+    """Comandos MVT de um (multi)ponto: array (n, 2) em coordenadas do tile."""
+    pontos = np.round(pontos).astype(np.int64).reshape(-1, 2)
+    deltas = np.diff(np.vstack([[0, 0], pontos]), axis=0)
+    return np.r_[_MOVE_TO | len(pontos) << 3, _zigzag(deltas).ravel()].tolist()
+
+
+# ============================================================================
+# TILE
+# ============================================================================
+
+class Camada:
+    """Camada de um tile: acumula features e serializa com chaves/valores deduplicados."""
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.features = []
+        self._chaves, self._valores = {}, {}
+
+    def adicionar(self, tipo, comandos, propriedades, identificador=None):
+        if not comandos:
+            return
+        tags = []
+        for chave, valor in propriedades.items():
+            if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+                continue
+            tags.append(self._chaves.setdefault(chave, len(self._chaves)))
+            tags.append(self._valores.setdefault(_valor(valor), len(self._valores)))
+        mensagem = b""
+        if identificador is not None:
+            mensagem += _campo_varint(1, identificador)
+        mensagem += _empacotado(2, tags) + _campo_varint(3, tipo) + _empacotado(4, comandos)
+        self.features.append(mensagem)
+
+    def __len__(self):
+        return len(self.features)
+
+    def codificar(self):
+        partes = [_campo_varint(15, 2), _campo_bytes(1, self.nome.encode("utf-8"))]
+        partes += [_campo_bytes(2, f) for f in self.features]
+        partes += [_campo_bytes(3, c.encode("utf-8")) for c in self._chaves]
+        partes += [_campo_bytes(4, v) for v in self._valores]
+        partes.append(_campo_varint(5, EXTENSAO))
+        return b"".join(partes)
+
+
+def codificar_tile(camadas):
+    """Tile MVT (bytes) com as camadas não vazias."""
+    return b"".join(_campo_bytes(3, c.codificar()) for c in camadas if len(c))
+
+
+# ============================================================================
+# WEB MERCATOR
+# ============================================================================
+
+def mercator(lon, lat, zoom):
+    """(lon, lat) → coordenadas globais em unidades de tile (EXTENSAO por tile) no zoom."""
+    lon, lat = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+    escala = EXTENSAO * 2 ** zoom
+    x = (lon + 180) / 360 * escala
+    seno = np.sin(np.radians(lat))
+    y = (0.5 - np.log((1 + seno) / (1 - seno)) / (4 * np.pi)) * escala
+    return x, y
+
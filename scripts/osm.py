@@ -0,0 +1,270 @@
+"""
+Leitura de Extratos do OpenStreetMap
+Usado por grafo_viario.py. Lê nós e vias de um extrato local, sem
+dependências: OSM XML (.osm, também .osm.gz/.osm.bz2) ou PBF (.osm.pbf,
+o formato dos extratos da Geofabrik).
+
+O PBF é uma sequência de blocos (BlobHeader + Blob comprimido com zlib),
+cada um com uma mensagem protobuf (osmformat.proto). O protobuf é lido à
+mão, só os campos usados; os campos "packed" (coordenadas dos DenseNodes,
+referências das vias) são decodificados em lote com NumPy.
+
+Só as vias aceitas por `manter_via` (por padrão, as com tag highway) são
+guardadas, com as tags de `tags`; os nós são todos guardados, porque no
+arquivo eles vêm antes das vias que os referenciam.
+"""
+
+import bz2
+import gzip
+import struct
+import xml.etree.ElementTree as ET
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+# Recursos do cabeçalho PBF que sabemos ler
+RECURSOS_SUPORTADOS = {"OsmSchema-V0.6", "DenseNodes"}
+
+# Tags guardadas por padrão (as que grafo_viario.py usa)
+TAGS_VIAS = ("highway", "oneway", "junction", "access", "foot", "motor_vehicle", "motorcar",
+             "maxspeed", "area", "name")
+
+
+def _tem_highway(tags):
+    return "highway" in tags
+
+
+class ExtratoOSM:
+    """
+    Nós (ids ordenados, lon, lat) e vias (lista de nós concatenada em
+    `via_nos`, com a via k em via_nos[via_inicio[k]:via_inicio[k + 1]], e
+    um dict de tags por via em `via_tags`).
+    """
+
+    def __init__(self, ids, lon, lat, via_nos, via_inicio, via_tags):
+        ordem = np.argsort(ids, kind="stable")
+        self.ids = np.asarray(ids, dtype=np.int64)[ordem]
+        self.lon = np.asarray(lon, dtype=float)[ordem]
+        self.lat = np.asarray(lat, dtype=float)[ordem]
+        self.via_nos = np.asarray(via_nos, dtype=np.int64)
+        self.via_inicio = np.asarray(via_inicio, dtype=np.int64)
+        self.via_tags = via_tags
+
+    def __len__(self):
+        return len(self.via_tags)
+
+    def posicoes(self, ids):
+        """Posição de cada id de nó em self.ids, ou -1 se o nó não está no extrato."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(self.ids) == 0:
+            return np.full(len(ids), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+        return np.where(self.ids[pos] == ids, pos, -1)
+
+
+class _Acumulador:
+    """Junta nós e vias lidos em partes e monta o ExtratoOSM."""
+
+    def __init__(self, manter_via, tags):
+        self.manter_via = manter_via
+        self.tags = tags
+        self.ids, self.lon, self.lat = [], [], []
+        self.via_nos, self.via_tamanhos, self.via_tags = [], [], []
+
+    def nos(self, ids, lon, lat):
+        self.ids.append(np.asarray(ids, dtype=np.int64))
+        self.lon.append(np.asarray(lon, dtype=float))
+        self.lat.append(np.asarray(lat, dtype=float))
+
+    def via(self, nos, tags):
+        if len(nos) >= 2 and self.manter_via(tags):
+            self.via_nos.append(np.asarray(nos, dtype=np.int64))
+            self.via_tamanhos.append(len(nos))
+            self.via_tags.append({k: v for k, v in tags.items() if k in self.tags})
+
+    def extrato(self):
+        def juntar(partes, dtype):
+            return np.concatenate(partes) if partes else np.empty(0, dtype=dtype)
+        via_inicio = np.concatenate([[0], np.cumsum(self.via_tamanhos, dtype=np.int64)])
+        return ExtratoOSM(juntar(self.ids, np.int64), juntar(self.lon, float), juntar(self.lat, float),
+                          juntar(self.via_nos, np.int64), via_inicio, self.via_tags)
+
+
+# ============================================================================
+# OSM XML
+# ============================================================================
+
+def _abrir_xml(caminho):
+    if caminho.suffix == ".gz":
+        return gzip.open(caminho, "rb")
+    if caminho.suffix == ".bz2":
+        return bz2.open(caminho, "rb")
+    return open(caminho, "rb")
+
+
+def _ler_xml(caminho, acumulador):
+    ids, lon, lat = [], [], []
+    with _abrir_xml(caminho) as arquivo:
+        for _, elemento in ET.iterparse(arquivo, events=("end",)):
+            if elemento.tag == "node":
+                ids.append(int(elemento.get("id")))
+                lon.append(float(elemento.get("lon")))
+                lat.append(float(elemento.get("lat")))
+            elif elemento.tag == "way":
+                nos = [int(nd.get("ref")) for nd in elemento.iter("nd")]
+                tags = {tag.get("k"): tag.get("v") for tag in elemento.iter("tag")}
+                acumulador.via(nos, tags)
+            elif elemento.tag != "relation":
+                continue
+            elemento.clear()
+    acumulador.nos(ids, lon, lat)
+
+
+# ============================================================================
+# OSM PBF
+# ============================================================================
+
+def _varint(dados, pos):
+    resultado = deslocamento = 0
+    while True:
+        byte = dados[pos]
+        pos += 1
+        resultado |= (byte & 0x7F) << deslocamento
+        if byte < 0x80:
+            return resultado, pos
+        deslocamento += 7
+
+
+def _campos(dados):
+    """(número, valor) de cada campo de uma mensagem protobuf: int ou memoryview."""
+    dados = memoryview(dados)
+    pos, fim = 0, len(dados)
+    while pos < fim:
+        chave, pos = _varint(dados, pos)
+        numero, tipo = chave >> 3, chave & 7
+        if tipo == 0:
+            valor, pos = _varint(dados, pos)
+        elif tipo == 2:
+            tamanho, pos = _varint(dados, pos)
+            valor, pos = dados[pos:pos + tamanho], pos + tamanho
+        elif tipo == 1:
+            valor, pos = int.from_bytes(dados[pos:pos + 8], "little"), pos + 8
+        elif tipo == 5:
+            valor, pos = int.from_bytes(dados[pos:pos + 4], "little"), pos + 4
+        else:
+            raise ValueError(f"Tipo de campo protobuf não suportado: {tipo}")
+        yield numero, valor
+
+
+def _varints(dados):
+    """Decodifica um campo packed de varints (uint64) de uma vez."""
+    b = np.frombuffer(dados, dtype=np.uint8)
+    if len(b) == 0:
+        return np.empty(0, dtype=np.uint64)
+    fim = b < 0x80
+    inicio = np.flatnonzero(np.r_[True, fim[:-1]])
+    grupo = np.cumsum(np.r_[0, fim[:-1]])
+    posicao = (np.arange(len(b)) - inicio[grupo]).astype(np.uint64)
+    # Os 7 bits de cada byte não se sobrepõem: a soma é o OU bit a bit
+    return np.add.reduceat((b & 0x7F).astype(np.uint64) << (np.uint64(7) * posicao), inicio)
+
+
+def _zigzag(valores):
+    valores = np.asarray(valores, dtype=np.uint64)
+    return (valores >> np.uint64(1)).astype(np.int64) ^ -(valores & np.uint64(1)).astype(np.int64)
+
+
+def _zigzag_int(valor):
+    return (valor >> 1) ^ -(valor & 1)
+
+
+def _blocos(arquivo):
+    """(tipo, dados descomprimidos) de cada bloco de um arquivo PBF."""
+    while True:
+        prefixo = arquivo.read(4)
+        if not prefixo:
+            return
+        cabecalho = dict(_campos(arquivo.read(struct.unpack(">I", prefixo)[0])))
+        blob = dict(_campos(arquivo.read(cabecalho[3])))
+        if 1 in blob:
+            dados = bytes(blob[1])
+        elif 3 in blob:
+            dados = zlib.decompress(blob[3])
+        else:
+            raise ValueError("Bloco PBF com compressão não suportada (só zlib ou sem compressão)")
+        yield bytes(cabecalho[1]).decode(), dados
+
+
+def _ler_pbf(caminho, acumulador):
+    with open(caminho, "rb") as arquivo:
+        for tipo, dados in _blocos(arquivo):
+            if tipo == "OSMHeader":
+                recursos = {bytes(v).decode() for n, v in _campos(dados) if n == 4}
+                faltando = recursos - RECURSOS_SUPORTADOS
+                if faltando:
+                    raise ValueError(f"Recursos PBF não suportados: {', '.join(sorted(faltando))}")
+            elif tipo == "OSMData":
+                _ler_bloco_primitivo(dados, acumulador)
+
+
+def _ler_bloco_primitivo(dados, acumulador):
+    strings, grupos = [], []
+    granularidade, lat_offset, lon_offset = 100, 0, 0
+    for numero, valor in _campos(dados):
+        if numero == 1:
+            strings = [bytes(s).decode("utf-8") for n, s in _campos(valor) if n == 1]
+        elif numero == 2:
+            grupos.append(valor)
+        elif numero == 17:
+            granularidade = valor
+        elif numero == 19:
+            lat_offset = _int64(valor)
+        elif numero == 20:
+            lon_offset = _int64(valor)
+
+    def graus(valores, offset):
+        return 1e-9 * (offset + granularidade * valores)
+
+    for grupo in grupos:
+        ids, lat, lon = [], [], []
+        for numero, valor in _campos(grupo):
+            if numero == 1:  # Node
+                no = dict(_campos(valor))
+                ids.append(_zigzag_int(no[1]))
+                lat.append(_zigzag_int(no[8]))
+                lon.append(_zigzag_int(no[9]))
+            elif numero == 2:  # DenseNodes: ids e coordenadas em deltas
+                densos = dict((n, v) for n, v in _campos(valor) if n in (1, 8, 9))
+                acumulador.nos(np.cumsum(_zigzag(_varints(densos.get(1, b"")))),
+                               graus(np.cumsum(_zigzag(_varints(densos.get(9, b"")))), lon_offset),
+                               graus(np.cumsum(_zigzag(_varints(densos.get(8, b"")))), lat_offset))
+            elif numero == 3:  # Way
+                via = {n: v for n, v in _campos(valor) if n in (2, 3, 8)}
+                chaves = _varints(via.get(2, b"")).tolist()
+                valores = _varints(via.get(3, b"")).tolist()
+                tags = {strings[c]: strings[v] for c, v in zip(chaves, valores)}
+                acumulador.via(np.cumsum(_zigzag(_varints(via.get(8, b"")))), tags)
+        if ids:
+            acumulador.nos(ids, graus(np.array(lon, dtype=np.int64), lon_offset),
+                           graus(np.array(lat, dtype=np.int64), lat_offset))
+
+
+def _int64(valor):
+    """Varint de um campo int64 (negativos vêm em complemento de dois)."""
+    return valor - (1 << 64) if valor >= 1 << 63 else valor
+
+
+# ============================================================================
+# ENTRADA
+# ============================================================================
+
+def ler_osm(caminho, manter_via=_tem_highway, tags=TAGS_VIAS):
+    """Lê um extrato .osm.pbf ou OSM XML e retorna um ExtratoOSM."""
+    caminho = Path(caminho)
+    acumulador = _Acumulador(manter_via, set(tags))
+    if caminho.name.endswith(".pbf"):
+        _ler_pbf(caminho, acumulador)
+    else:
+        _ler_xml(caminho, acumulador)
+    return acumulador.extrato()
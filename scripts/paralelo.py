@@ -0,0 +1,70 @@
+"""
+Tabelas em Memória Compartilhada
+Usado por gerar_poligonos.py para repartir os pontos por UBS entre processos
+(ProcessPoolExecutor) sem copiar os dados via pickle.
+
+As colunas numéricas de um DataFrame vão para um único bloco
+multiprocessing.shared_memory (matriz float64, linhas ordenadas pela coluna
+de partição). Cada tarefa recebe só um descritor pequeno (nome do bloco e
+fatia de linhas) e lê a própria fatia diretamente da memória compartilhada.
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+
+class TabelaCompartilhada:
+    """
+    DataFrame em memória compartilhada, particionado pela coluna `particao`
+    (texto, ex.: ubs_referencia). As demais colunas devem ser numéricas.
+    Usar como context manager: o bloco é liberado na saída.
+    """
+
+    def __init__(self, df, particao):
+        ordem = np.argsort(pd.factorize(df[particao], sort=False)[0], kind="stable")
+        df = df.iloc[ordem]
+        self.particao = particao
+        self.colunas = list(df.columns)
+        self.numericas = [c for c in self.colunas if c != particao]
+        self.tipos = {c: str(df[c].dtype) for c in self.numericas}
+
+        valores = df[self.numericas].to_numpy(dtype=np.float64)
+        self._bloco = shared_memory.SharedMemory(create=True, size=max(valores.nbytes, 1))
+        np.ndarray(valores.shape, dtype=np.float64, buffer=self._bloco.buf)[:] = valores
+
+        # Fatia [início, fim) de cada valor da partição, na ordem de primeira aparição
+        rotulos = df[particao].to_numpy()
+        inicios = np.flatnonzero(np.r_[True, rotulos[1:] != rotulos[:-1]]) if len(rotulos) else []
+        limites = np.r_[inicios, len(rotulos)].astype(int)
+        self.fatias = {rotulos[a]: (int(a), int(b)) for a, b in zip(limites[:-1], limites[1:])}
+        self._forma = valores.shape
+
+    def descritor(self, valor):
+        """Descritor (picklable) das linhas com particao == valor; vazio se não houver."""
+        inicio, fim = self.fatias.get(valor, (0, 0))
+        return {
+            "bloco": self._bloco.name, "forma": self._forma, "inicio": inicio, "fim": fim,
+            "particao": self.particao, "valor": valor, "colunas": self.colunas, "tipos": self.tipos,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self._bloco.close()
+        self._bloco.unlink()
+
+
+def ler_fatia(descritor):
+    """Reconstrói (em outro processo) o DataFrame de uma fatia da tabela."""
+    bloco = shared_memory.SharedMemory(name=descritor["bloco"])
+    matriz = np.ndarray(descritor["forma"], dtype=np.float64, buffer=bloco.buf)
+    valores = matriz[descritor["inicio"]:descritor["fim"]].copy()
+    del matriz  # o bloco só pode ser fechado sem referências ao buffer
+    bloco.close()
+    numericas = [c for c in descritor["colunas"] if c != descritor["particao"]]
+    df = pd.DataFrame(valores, columns=numericas).astype(descritor["tipos"])
+    df[descritor["particao"]] = descritor["valor"]
+    return df[descritor["colunas"]]
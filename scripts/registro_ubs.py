@@ -0,0 +1,112 @@
+"""
+Registro das UBS
+Localização de todas as UBS a partir dos próprios dados: as colunas
+localizacao_ubs/link_map_ubs dos CSVs por UBS (dados/UBS_Ruas - *.csv/.tsv)
+e do CSV consolidado. Usado por ubs_proximas.py.
+
+As coordenadas saem do link do Google Maps: o pino do lugar (!3d<lat>!4d<lon>)
+quando existe, senão o centro do mapa (@lat,lon). Links curtos
+(maps.app.goo.gl) não trazem coordenadas. Por cima disso valem as
+correções: UBS_INFO de gerar_poligonos.py e, se existir,
+dados/ubs_coordenadas.csv (colunas: ubs_referencia, latitude, longitude),
+que tem a palavra final.
+
+A coluna `origem` diz de onde veio cada coordenada: link_pino, link_mapa,
+correcao ou sem_coordenada.
+"""
+
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from gerar_poligonos import UBS_INFO
+
+# Diretórios
+BASE_DIR = Path(__file__).parent.parent
+DADOS_DIR = BASE_DIR / "dados"
+
+CORRECOES_CSV = DADOS_DIR / "ubs_coordenadas.csv"
+CSV_CONSOLIDADO = DADOS_DIR / "UBS_Ruas_Coordenadas_Consolidado.csv"
+
+COLUNAS_REGISTRO = ['ubs_referencia', 'localizacao_ubs', 'latitude', 'longitude', 'origem', 'link_map_ubs']
+
+_PINO = re.compile(r"!3d(-?\d+(?:\.\d+)?)!4d(-?\d+(?:\.\d+)?)")
+_MAPA = re.compile(r"@(-?\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?)")
+
+# Preferência entre as origens quando a mesma UBS aparece com links diferentes
+_PRIORIDADE = {"link_pino": 0, "link_mapa": 1, "sem_coordenada": 2}
+
+
+def coordenadas_link(link):
+    """(lat, lon, origem) de um link do Google Maps, ou (nan, nan, 'sem_coordenada')."""
+    if isinstance(link, str):
+        pinos = _PINO.findall(link)
+        if pinos:
+            # O último pino é o do lugar (os anteriores são de buscas/rotas)
+            return float(pinos[-1][0]), float(pinos[-1][1]), "link_pino"
+        mapa = _MAPA.search(link)
+        if mapa:
+            return float(mapa.group(1)), float(mapa.group(2)), "link_mapa"
+    return float("nan"), float("nan"), "sem_coordenada"
+
+
+def _ler_csv_ubs(caminho):
+    """Lê um CSV/TSV por UBS, pulando linhas em branco antes do cabeçalho (como gerar_kml.py)."""
+    separador = "\t" if caminho.suffix == ".tsv" else ","
+    df = pd.read_csv(caminho, sep=separador, dtype=str)
+    for skiprows in range(1, 5):
+        if 'ubs_referencia' in df.columns:
+            break
+        df = pd.read_csv(caminho, sep=separador, dtype=str, skiprows=skiprows)
+    colunas = ['ubs_referencia', 'localizacao_ubs', 'link_map_ubs']
+    if not set(colunas) <= set(df.columns):
+        return pd.DataFrame(columns=colunas)
+    return df[colunas]
+
+
+def carregar_registro(dados_dir=DADOS_DIR, correcoes=CORRECOES_CSV):
+    """
+    DataFrame com uma linha por UBS (ubs_referencia sem espaços nas pontas)
+    e as colunas de COLUNAS_REGISTRO. UBS sem coordenada ficam com NaN.
+    """
+    fontes = [_ler_csv_ubs(c) for c in sorted(Path(dados_dir).glob("UBS_Ruas - *"))
+              if c.suffix in (".csv", ".tsv")]
+    consolidado = Path(dados_dir) / CSV_CONSOLIDADO.name
+    if consolidado.exists():
+        fontes.append(pd.read_csv(consolidado, dtype=str)[['ubs_referencia', 'localizacao_ubs', 'link_map_ubs']])
+    ubs = pd.concat(fontes, ignore_index=True).dropna(subset=['ubs_referencia'])
+    ubs['ubs_referencia'] = ubs['ubs_referencia'].str.strip()
+    ubs = ubs[ubs['ubs_referencia'] != ""].drop_duplicates()
+
+    coordenadas = pd.DataFrame([coordenadas_link(link) for link in ubs['link_map_ubs']],
+                               columns=['latitude', 'longitude', 'origem'], index=ubs.index)
+    ubs = ubs.join(coordenadas)
+    ubs['_prioridade'] = ubs['origem'].map(_PRIORIDADE)
+    registro = (ubs.sort_values(['ubs_referencia', '_prioridade'], kind='stable')
+                .drop_duplicates('ubs_referencia')
+                .set_index('ubs_referencia'))
+
+    # Correções: UBS_INFO e depois o CSV opcional
+    linhas = [{"ubs_referencia": nome, "latitude": info["latitude"], "longitude": info["longitude"],
+               "localizacao_ubs": info.get("endereco")} for nome, info in UBS_INFO.items()]
+    if Path(correcoes).exists():
+        linhas.extend(pd.read_csv(correcoes).to_dict("records"))
+    for linha in linhas:
+        nome = str(linha["ubs_referencia"]).strip()
+        registro.loc[nome, ['latitude', 'longitude', 'origem']] = (
+            float(linha["latitude"]), float(linha["longitude"]), "correcao")
+        if pd.isna(registro.loc[nome, 'localizacao_ubs']) and isinstance(linha.get("localizacao_ubs"), str):
+            registro.loc[nome, 'localizacao_ubs'] = linha["localizacao_ubs"]
+
+    registro = registro.reset_index()
+    registro['latitude'] = registro['latitude'].astype(float)
+    registro['longitude'] = registro['longitude'].astype(float)
+    return registro[COLUNAS_REGISTRO].sort_values('ubs_referencia', ignore_index=True)
+
+
+def posicoes_ubs(registro, nomes):
+    """Posição em `registro` de cada nome (espaços nas pontas ignorados), ou -1."""
+    nomes = pd.Series(np.asarray(nomes, dtype=object)).astype(str).str.strip()
+    return pd.Index(registro['ubs_referencia']).get_indexer(nomes)
@@ -0,0 +1,164 @@
+"""
+Relatórios Estruturados (JSON + HTML)
+Usado pelos scripts de verificação para salvar o resultado em formato
+comparável entre execuções (JSON com chaves ordenadas) e em uma página
+HTML autocontida para consulta rápida.
+"""
+
+import html
+import json
+import math
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Diretórios
+BASE_DIR = Path(__file__).parent.parent
+DADOS_DIR = BASE_DIR / "dados"
+RELATORIOS_DIR = DADOS_DIR / "relatorios"
+
+# Mudam a cada execução: só vão para o HTML, para o JSON ter diffs limpos
+CAMPOS_VOLATEIS = ("gerado_em", "tempos_s")
+
+
+class Cronometro:
+    """Acumula a duração (s) de cada etapa: `with cron.etapa("nome"): ...`"""
+
+    def __init__(self):
+        self.tempos = {}
+
+    @contextmanager
+    def etapa(self, nome):
+        inicio = time.perf_counter()
+        yield
+        self.tempos[nome] = round(time.perf_counter() - inicio, 4)
+
+
+def registros(df, colunas=None):
+    """Converte um DataFrame em lista de dicts com NaN → None."""
+    if colunas is not None:
+        df = df[colunas]
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def _normalizar(valor):
+    """Converte tipos NumPy/pandas e NaN para tipos JSON nativos."""
+    if isinstance(valor, dict):
+        return {str(k): _normalizar(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple, np.ndarray, pd.Series)):
+        return [_normalizar(v) for v in list(valor)]
+    if isinstance(valor, (np.bool_, bool)):
+        return bool(valor)
+    if isinstance(valor, np.integer):
+        return int(valor)
+    if isinstance(valor, (np.floating, float)):
+        return None if math.isnan(valor) else float(valor)
+    if valor is pd.NA or valor is pd.NaT:
+        return None
+    return valor
+
+
+# ----------------------------------------------------------------------------
+# HTML
+# ----------------------------------------------------------------------------
+
+CSS = """
+body { font-family: -apple-system, Segoe UI, Roboto, sans-serif; margin: 2em; color: #222; }
+h1 { border-bottom: 3px solid #1D3557; padding-bottom: .3em; }
+h2 { color: #1D3557; margin-top: 1.6em; }
+table { border-collapse: collapse; margin: .5em 0 1em; font-size: 0.9em; }
+th, td { border: 1px solid #ccc; padding: 4px 8px; text-align: left; vertical-align: top; }
+th { background: #f1f3f5; }
+tr:nth-child(even) td { background: #fafafa; }
+.meta { color: #666; font-size: .9em; }
+.ok { color: #2b8a3e; } .alerta { color: #c92a2a; }
+"""
+
+
+def _celula(valor):
+    if isinstance(valor, float):
+        return f"{valor:.7g}"
+    if isinstance(valor, (list, dict)):
+        return html.escape(json.dumps(valor, ensure_ascii=False))
+    return html.escape("" if valor is None else str(valor))
+
+
+def _tabela(linhas):
+    """Tabela HTML a partir de uma lista de dicts (ou de um dict chave → valor)."""
+    if isinstance(linhas, dict):
+        linhas = [{"item": k, "valor": v} for k, v in linhas.items()]
+    if not linhas:
+        return '<p class="ok">Nenhuma ocorrência.</p>'
+    colunas = list(dict.fromkeys(c for linha in linhas for c in linha))
+    cab = "".join(f"<th>{html.escape(c)}</th>" for c in colunas)
+    corpo = "".join(
+        "<tr>" + "".join(f"<td>{_celula(linha.get(c))}</td>" for c in colunas) + "</tr>"
+        for linha in linhas
+    )
+    return f"<table><thead><tr>{cab}</tr></thead><tbody>{corpo}</tbody></table>"
+
+
+def gerar_html(relatorio):
+    """Página HTML autocontida com contagens, métricas e ocorrências."""
+    titulo = html.escape(relatorio.get("titulo", relatorio.get("relatorio", "Relatório")))
+    partes = [
+        f"<!DOCTYPE html><html lang='pt-BR'><head><meta charset='utf-8'>"
+        f"<title>{titulo}</title><style>{CSS}</style></head><body>",
+        f"<h1>{titulo}</h1>",
+        f"<p class='meta'>Gerado em {html.escape(relatorio.get('gerado_em', ''))} — "
+        f"entrada: {html.escape(str(relatorio.get('entrada', '')))}</p>",
+    ]
+    problemas = relatorio.get("problemas", 0)
+    classe = "alerta" if problemas else "ok"
+    partes.append(f"<p class='{classe}'><strong>{problemas} problema(s) potencial(is)</strong></p>")
+
+    for secao, chave in (("Contagens", "contagens"), ("Parâmetros", "parametros"),
+                         ("Tempos (s)", "tempos_s")):
+        if relatorio.get(chave):
+            partes.append(f"<h2>{secao}</h2>{_tabela(relatorio[chave])}")
+
+    for chave, titulo_secao in (("por_ubs", "Por UBS"), ("por_microarea", "Por microárea")):
+        if chave in relatorio:
+            partes.append(f"<h2>{titulo_secao}</h2>{_tabela(relatorio[chave])}")
+
+    for nome, linhas in relatorio.get("ocorrencias", {}).items():
+        n = len(linhas) if isinstance(linhas, list) else ""
+        partes.append(f"<h2>{html.escape(nome)} ({n})</h2>{_tabela(linhas)}")
+
+    partes.append("</body></html>")
+    return "\n".join(partes)
+
+
+# ----------------------------------------------------------------------------
+# SALVAR
+# ----------------------------------------------------------------------------
+
+def salvar_relatorio(relatorio, nome, diretorio=RELATORIOS_DIR):
+    """
+    Salva `relatorio` (dict) em <diretorio>/<nome>.json e <nome>.html.
+    O JSON usa chaves ordenadas e deixa de fora CAMPOS_VOLATEIS (data e
+    tempos de execução, que ficam só no HTML) para que execuções sucessivas
+    gerem diffs limpos.
+    Retorna (caminho_json, caminho_html).
+    """
+    diretorio = Path(diretorio)
+    diretorio.mkdir(parents=True, exist_ok=True)
+    relatorio = _normalizar(relatorio)
+
+    caminho_json = diretorio / f"{nome}.json"
+    with open(caminho_json, "w", encoding="utf-8") as f:
+        json.dump({k: v for k, v in relatorio.items() if k not in CAMPOS_VOLATEIS},
+                  f, ensure_ascii=False, indent=2, sort_keys=True)
+
+    caminho_html = diretorio / f"{nome}.html"
+    with open(caminho_html, "w", encoding="utf-8") as f:
+        f.write(gerar_html(relatorio))
+
+    return caminho_json, caminho_html
+
+
+def agora_iso():
+    return time.strftime("%Y-%m-%dT%H:%M:%S")
@@ -0,0 +1,127 @@
+"""
+Escrita e Leitura de GeoJSON
+Usado por gerar_poligonos.py (escrita) e pelos scripts que leem os polígonos.
+
+salvar_geojson grava a FeatureCollection feature por feature (a coleção
+nunca é serializada inteira na memória), em dois formatos:
+- legível (padrão): indent=2, coordenadas em float64 completo, idêntico a
+  json.dump(..., indent=2)
+- compacto: sem indentação nem espaços e coordenadas arredondadas para
+  `precisao` casas decimais (6 casas ≈ 10 cm)
+Opcionalmente comprimido com gzip (arquivo .geojson.gz). A gravação vai
+para um arquivo .tmp que só substitui o destino no final; a versão no outro
+formato (comprimida ou não) é removida depois disso, então uma falha no meio
+da escrita nunca deixa os leitores sem arquivo ou com um arquivo truncado.
+
+salvar_topojson grava a topologia de topologia.py no mesmo esquema.
+"""
+
+import gzip
+import json
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+CRS84 = {"type": "name", "properties": {"name": "urn:ogc:def:crs:OGC:1.3:CRS84"}}
+
+# Casas decimais das coordenadas no modo compacto (≈ 10 cm)
+PRECISAO_PADRAO = 6
+
+
+def arredondar_coordenadas(coordenadas, casas):
+    """Arredonda as coordenadas (listas aninhadas de qualquer profundidade) de uma geometria."""
+    if not coordenadas or not isinstance(coordenadas[0], list):
+        return np.round(np.asarray(coordenadas, dtype=float), casas).tolist()
+    if not isinstance(coordenadas[0][0], list):
+        # Lista de posições (anel, linha): arredonda em bloco
+        return np.round(np.asarray(coordenadas, dtype=float), casas).tolist()
+    return [arredondar_coordenadas(c, casas) for c in coordenadas]
+
+
+def _arredondar_feature(feature, casas):
+    geometria = feature.get("geometry")
+    if not geometria or "coordinates" not in geometria:
+        return feature
+    return {**feature, "geometry": {**geometria,
+                                    "coordinates": arredondar_coordenadas(geometria["coordinates"], casas)}}
+
+
+def caminho_saida(caminho, comprimir):
+    """Caminho efetivo do arquivo (.geojson ou .geojson.gz)."""
+    caminho = Path(caminho)
+    return caminho.with_name(caminho.name + ".gz") if comprimir else caminho
+
+
+@contextmanager
+def _gravar(caminho, comprimir):
+    """
+    Abre um .tmp ao lado do destino para escrita de texto; ao sair sem erro,
+    substitui o destino e remove a versão no outro formato. Produz o destino.
+    """
+    destino = caminho_saida(caminho, comprimir)
+    temporario = destino.with_name(destino.name + ".tmp")
+    abrir = gzip.open if comprimir else open
+    try:
+        with abrir(temporario, "wt", encoding="utf-8") as f:
+            yield f
+    except BaseException:
+        temporario.unlink(missing_ok=True)
+        raise
+    temporario.replace(destino)
+    caminho_saida(caminho, not comprimir).unlink(missing_ok=True)
+
+
+def salvar_geojson(caminho, nome, features, compacto=False, precisao=None, comprimir=False):
+    """
+    Grava uma FeatureCollection com as `features` (qualquer iterável) em
+    `caminho`. Com `comprimir`, grava `caminho`.gz e, concluída a gravação,
+    remove a versão não comprimida (e vice-versa), para que os leitores
+    nunca vejam uma cópia desatualizada. `precisao` (casas decimais) vale nos dois formatos; no
+    compacto o padrão é PRECISAO_PADRAO. Retorna o caminho gravado.
+    """
+    if compacto and precisao is None:
+        precisao = PRECISAO_PADRAO
+    if compacto:
+        opcoes = {"ensure_ascii": False, "separators": (",", ":")}
+        abertura, separador, fechamento = "[", ",", "]}"
+        recuo = ""
+    else:
+        opcoes = {"ensure_ascii": False, "indent": 2}
+        abertura, separador, fechamento = "[\n", ",\n", "\n  ]\n}"
+        recuo = "    "
+    cabecalho = json.dumps({"type": "FeatureCollection", "name": nome, "crs": CRS84, "features": []},
+                           **opcoes)
+    # O cabeçalho termina em '"features": []' + fechamento do objeto
+    cabecalho = cabecalho[:cabecalho.rindex("[")]
+
+    with _gravar(caminho, comprimir) as f:
+        f.write(cabecalho)
+        vazia = True
+        for feature in features:
+            if precisao is not None:
+                feature = _arredondar_feature(feature, precisao)
+            texto = json.dumps(feature, **opcoes)
+            if recuo:
+                texto = texto.replace("\n", "\n" + recuo)
+            f.write((abertura if vazia else separador) + recuo + texto)
+            vazia = False
+        f.write("[]}" if compacto and vazia else "[]\n}" if vazia else fechamento)
+    return caminho_saida(caminho, comprimir)
+
+
+def salvar_topojson(caminho, topologia, comprimir=False):
+    """Grava um dict TopoJSON (compacto), com as mesmas regras de .gz de salvar_geojson."""
+    with _gravar(caminho, comprimir) as f:
+        json.dump(topologia, f, ensure_ascii=False, separators=(",", ":"))
+    return caminho_saida(caminho, comprimir)
+
+
+def carregar_geojson(caminho):
+    """Lê um GeoJSON gravado por salvar_geojson (aceita a versão .gz)."""
+    caminho = Path(caminho)
+    if not caminho.exists() and caminho_saida(caminho, True).exists():
+        with gzip.open(caminho_saida(caminho, True), "rt", encoding="utf-8") as f:
+            return json.load(f)
+    with open(caminho, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,305 @@
+"""
+Serviço de Consulta: Qual Microárea Atende Este Ponto/Endereço?
+Serviço HTTP/JSON local (e API Python) para a recepção das UBS responder,
+sem abrir o QGIS, qual UBS e microárea cobrem um ponto ou um endereço.
+
+- Ponto: os polígonos de microareas_ubs.geojson ficam numa R-tree
+  (indice_espacial.ArvoreSTR); só os candidatos cuja caixa contém o ponto
+  passam pelo teste ponto-em-polígono (par-ímpar, vetorizado sobre as
+  arestas; pontos sobre a borda contam como dentro)
+- Endereço: busca pelo texto normalizado (sem acentos/caixa/pontuação,
+  abreviações expandidas) no CSV consolidado e, na falta, no cache de
+  resultados do Google; se o texto completo não bate, tenta só o nome da
+  rua (antes da primeira vírgula). Cada endereço encontrado traz a
+  microárea cadastrada no CSV e as microáreas cujo polígono contém a sua
+  coordenada
+- Recarga a quente: a cada INTERVALO_RECARGA_S, o serviço confere a data
+  de modificação dos arquivos e, se algum mudou, monta um estado novo e
+  troca a referência (as outras consultas seguem no estado antigo enquanto
+  isso; se a leitura falhar, por exemplo com o arquivo pela metade, o
+  estado antigo é mantido e a recarga é tentada de novo)
+
+Uso:
+    python servico_consulta.py servir [--host 127.0.0.1] [--porta 8765]
+    python servico_consulta.py ponto <lat> <lon>
+    python servico_consulta.py endereco "Rua 2 de Fevereiro, Guajará"
+
+Rotas HTTP (GET, respostas em JSON):
+    /ponto?lat=-10.89&lon=-37.15
+    /endereco?q=Rua 2 de Fevereiro
+    /saude
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from geometria import TOLERANCIA_BORDA, aneis_geometria
+from indice_espacial import ArvoreSTR
+from saida_geojson import caminho_saida, carregar_geojson
+
+# Diretórios
+BASE_DIR = Path(__file__).parent.parent
+DADOS_DIR = BASE_DIR / "dados"
+
+POLIGONOS_PATH = DADOS_DIR / "microareas_ubs.geojson"
+CSV_CONSOLIDADO = DADOS_DIR / "UBS_Ruas_Coordenadas_Consolidado.csv"
+CACHE_GOOGLE = DADOS_DIR / "UBS_Ruas_GoogleAPI_Resultados.csv"
+
+# Intervalo mínimo (s) entre verificações de arquivos alterados
+INTERVALO_RECARGA_S = 1.0
+
+HOST_PADRAO = "127.0.0.1"
+PORTA_PADRAO = 8765
+
+ABREVIACOES = {"r": "rua", "av": "avenida", "tv": "travessa", "trav": "travessa",
+               "pca": "praca", "pc": "praca", "al": "alameda", "rod": "rodovia",
+               "cj": "conjunto", "conj": "conjunto", "lot": "loteamento"}
+
+
+def normalizar_endereco(texto):
+    """Chave de busca: sem acentos, minúsculas, sem pontuação, abreviações expandidas."""
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode()
+    palavras = re.sub(r"[^a-z0-9,]+", " ", texto.lower()).replace(",", " , ").split()
+    return " ".join(ABREVIACOES.get(p, p) for p in palavras).replace(" , ", ", ").strip(" ,")
+
+
+def _nome_rua(chave):
+    return chave.split(",")[0].strip()
+
+
+def _versao(caminhos):
+    """(mtime, tamanho) de cada arquivo (None se não existe)."""
+    versao = []
+    for caminho in caminhos:
+        try:
+            info = caminho.stat()
+            versao.append((info.st_mtime_ns, info.st_size))
+        except FileNotFoundError:
+            versao.append(None)
+    return tuple(versao)
+
+
+class _Estado:
+    """Polígonos indexados e tabela de endereços de uma versão dos arquivos (imutável)."""
+
+    def __init__(self, caminho_poligonos, caminho_csv, caminho_cache):
+        # Polígonos: arestas de cada feature (todos os anéis, regra par-ímpar)
+        features = [f for f in carregar_geojson(caminho_poligonos)["features"] if f.get("geometry")]
+        self.microareas = [{"ubs_referencia": f["properties"].get("ubs_referencia"),
+                            "micro_area": f["properties"].get("micro_area")} for f in features]
+        self.arestas = []
+        caixas = []
+        for f in features:
+            aneis = [np.asarray(anel, dtype=float) for anel in aneis_geometria(f["geometry"])]
+            inicio = np.concatenate(aneis)
+            fim = np.concatenate([np.roll(anel, -1, axis=0) for anel in aneis])
+            self.arestas.append((inicio[:, 0], inicio[:, 1], fim[:, 0], fim[:, 1]))
+            caixas.append((*inicio.min(axis=0), *inicio.max(axis=0)))
+        caixas = np.array(caixas, dtype=float).reshape(-1, 4)
+        self.arvore = ArvoreSTR(caixas[:, 0], caixas[:, 1], caixas[:, 2], caixas[:, 3])
+
+        # Endereços: chave normalizada → linhas (consolidado primeiro, depois o cache)
+        self.enderecos, self.ruas = {}, {}
+        if caminho_csv.exists():
+            df = pd.read_csv(caminho_csv)
+            for linha in df.itertuples(index=False):
+                self._registrar(linha.endereco_completo, linha.latitude, linha.longitude, "consolidado",
+                                {"ubs_referencia": linha.ubs_referencia, "micro_area": linha.micro_area})
+        if caminho_cache.exists():
+            cache = pd.read_csv(caminho_cache)
+            for linha in cache.itertuples(index=False):
+                if normalizar_endereco(linha.endereco_original) not in self.enderecos:
+                    self._registrar(linha.endereco_original, linha.latitude, linha.longitude,
+                                    "cache_google", None)
+
+    def _registrar(self, endereco, lat, lon, fonte, cadastro):
+        if pd.isna(endereco):
+            return
+        chave = normalizar_endereco(endereco)
+        registro = {
+            "endereco": endereco,
+            "latitude": None if pd.isna(lat) else float(lat),
+            "longitude": None if pd.isna(lon) else float(lon),
+            "fonte": fonte,
+            "cadastro": cadastro and {k: (None if pd.isna(v) else v.item() if hasattr(v, "item") else v)
+                                      for k, v in cadastro.items()},
+        }
+        self.enderecos.setdefault(chave, []).append(registro)
+        self.ruas.setdefault(_nome_rua(chave), []).append(registro)
+
+    def localizar(self, lon, lat):
+        """Índices das microáreas cujo polígono contém (lon, lat), borda inclusive."""
+        _, candidatos = self.arvore.consultar([lon], [lat], [lon], [lat])
+        resultado = []
+        for f in np.sort(candidatos).tolist():
+            x1, y1, x2, y2 = self.arestas[f]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                cruza = (y1 > lat) != (y2 > lat)
+                dentro = np.count_nonzero(cruza & (lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1))) % 2
+                if not dentro:
+                    dx, dy = x2 - x1, y2 - y1
+                    t = np.clip(((lon - x1) * dx + (lat - y1) * dy) / (dx * dx + dy * dy), 0, 1)
+                    t = np.where(np.isnan(t), 0, t)
+                    dentro = np.any((lon - x1 - t * dx) ** 2 + (lat - y1 - t * dy) ** 2
+                                    <= TOLERANCIA_BORDA ** 2)
+            if dentro:
+                resultado.append(f)
+        return resultado
+
+
+class ConsultaMicroareas:
+    """
+    API Python do serviço. Thread-safe: cada consulta usa um estado
+    imutável; a recarga monta um estado novo e troca a referência.
+    """
+
+    def __init__(self, caminho_poligonos=POLIGONOS_PATH, caminho_csv=CSV_CONSOLIDADO,
+                 caminho_cache=CACHE_GOOGLE, intervalo_recarga=INTERVALO_RECARGA_S):
+        poligonos = Path(caminho_poligonos)
+        # carregar_geojson aceita a versão .gz: vigia as duas
+        self._arquivos = (poligonos, caminho_saida(poligonos, True), Path(caminho_csv), Path(caminho_cache))
+        self.intervalo_recarga = intervalo_recarga
+        self._trava = threading.Lock()
+        self._proxima_verificacao = 0.0
+        self.versao = _versao(self._arquivos)
+        self.estado = _Estado(poligonos, self._arquivos[2], self._arquivos[3])
+        self.recarregado_em = time.time()
+
+    def _atualizar(self):
+        agora = time.monotonic()
+        if agora < self._proxima_verificacao or not self._trava.acquire(blocking=False):
+            return self.estado
+        try:
+            self._proxima_verificacao = agora + self.intervalo_recarga
+            versao = _versao(self._arquivos)
+            if versao != self.versao:
+                try:
+                    self.estado = _Estado(self._arquivos[0], self._arquivos[2], self._arquivos[3])
+                    self.versao = versao
+                    self.recarregado_em = time.time()
+                    print(f"🔄 Dados recarregados ({len(self.estado.microareas)} microáreas)")
+                # EOFError/zlib.error: .geojson.gz ainda sendo escrito por gerar_poligonos.py --gzip
+                except (OSError, EOFError, zlib.error, ValueError, KeyError) as e:
+                    print(f"⚠️  Recarga falhou, mantendo a versão anterior: {e}")
+        finally:
+            self._trava.release()
+        return self.estado
+
+    def ponto(self, lat, lon):
+        """Microáreas (UBS + microárea) que cobrem o ponto."""
+        estado = self._atualizar()
+        microareas = [estado.microareas[f] for f in estado.localizar(float(lon), float(lat))]
+        return {"latitude": float(lat), "longitude": float(lon), "microareas": microareas}
+
+    def endereco(self, texto):
+        """Endereços que batem com o texto, com a microárea cadastrada e a do polígono."""
+        estado = self._atualizar()
+        chave = normalizar_endereco(texto)
+        registros = estado.enderecos.get(chave) or estado.ruas.get(_nome_rua(chave), [])
+        resultado = []
+        for registro in registros:
+            microareas = []
+            if registro["latitude"] is not None and registro["longitude"] is not None:
+                microareas = [estado.microareas[f]
+                              for f in estado.localizar(registro["longitude"], registro["latitude"])]
+            resultado.append({**registro, "microareas": microareas})
+        return {"consulta": texto, "encontrado": bool(resultado), "enderecos": resultado}
+
+    def saude(self):
+        estado = self._atualizar()
+        return {"microareas": len(estado.microareas), "enderecos": len(estado.enderecos),
+                "recarregado_em": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.recarregado_em))}
+
+
+# ============================================================================
+# HTTP
+# ============================================================================
+
+class _Manipulador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: sem um handshake TCP por consulta
+    disable_nagle_algorithm = True  # cabeçalho e corpo saem sem esperar o ACK do cliente
+    consulta = None
+    verboso = False
+
+    def _responder(self, status, corpo):
+        dados = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(dados)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parametros = {k: v[0] for k, v in parse_qs(url.query).items()}
+        try:
+            if url.path == "/ponto":
+                self._responder(200, self.consulta.ponto(float(parametros["lat"]), float(parametros["lon"])))
+            elif url.path == "/endereco":
+                self._responder(200, self.consulta.endereco(parametros["q"]))
+            elif url.path == "/saude":
+                self._responder(200, self.consulta.saude())
+            else:
+                self._responder(404, {"erro": "rota desconhecida (use /ponto, /endereco ou /saude)"})
+        except (KeyError, ValueError) as e:
+            self._responder(400, {"erro": f"parâmetro ausente ou inválido: {e}"})
+
+    def log_message(self, formato, *args):
+        if self.verboso:
+            super().log_message(formato, *args)
+
+
+def servir(consulta, host=HOST_PADRAO, porta=PORTA_PADRAO, verboso=False):
+    manipulador = type("Manipulador", (_Manipulador,), {"consulta": consulta, "verboso": verboso})
+    servidor = ThreadingHTTPServer((host, porta), manipulador)
+    servidor.daemon_threads = True
+    print(f"✅ Serviço de consulta em http://{host}:{porta}  (/ponto, /endereco, /saude)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\nEncerrado.")
+    finally:
+        servidor.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta de UBS/microárea por ponto ou endereço")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_servir = sub.add_parser("servir", help="inicia o serviço HTTP/JSON")
+    p_servir.add_argument("--host", default=HOST_PADRAO)
+    p_servir.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    p_servir.add_argument("--verboso", action="store_true", help="registra cada requisição")
+
+    p_ponto = sub.add_parser("ponto", help="microáreas que cobrem um ponto")
+    p_ponto.add_argument("lat", type=float)
+    p_ponto.add_argument("lon", type=float)
+
+    p_end = sub.add_parser("endereco", help="microáreas de um endereço")
+    p_end.add_argument("texto")
+
+    args = parser.parse_args()
+    consulta = ConsultaMicroareas()
+
+    if args.comando == "servir":
+        servir(consulta, args.host, args.porta, args.verboso)
+    elif args.comando == "ponto":
+        print(json.dumps(consulta.ponto(args.lat, args.lon), ensure_ascii=False, indent=2))
+    else:
+        print(json.dumps(consulta.endereco(args.texto), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Simplificação dos Polígonos por Nível de Zoom
+Gera versões leves de microareas_ubs.geojson e ubs_areas.geojson para
+visualização em escalas menores (QGIS, mapas web), lado a lado com os
+originais: dados/microareas_ubs_z12.geojson, dados/ubs_areas_z12.geojson...
+
+Método (Visvalingam–Whyatt sobre a topologia de arcos, topologia.py):
+1. Os polígonos viram arcos compartilhados: a borda comum entre duas
+   microáreas (ou entre a microárea e a área da UBS) é um único arco
+2. Cada vértice interno de cada arco recebe a sua área efetiva (área do
+   triângulo com os vizinhos no momento em que seria removido), calculada
+   uma única vez com um heap, em m² numa projeção local
+3. Em cada zoom, ficam os vértices com área efetiva ≥ (tamanho do pixel)²;
+   as junções (extremos dos arcos) nunca são removidas
+
+Como os vizinhos usam o mesmo arco simplificado, a simplificação não abre
+lacunas nem sobreposições entre microáreas. Todo anel mantém ao menos 3
+vértices. Cruzamentos entre arcos distintos não são verificados: em zooms
+muito baixos, polígonos estreitos podem se autointerceptar.
+
+Uso:
+    python simplificar_poligonos.py [--zooms 10 12 14] [--compacto] [--gzip]
+"""
+
+import argparse
+import heapq
+from pathlib import Path
+
+import numpy as np
+
+from geometria import KM_POR_GRAU_LAT, km_por_grau_lon
+from saida_geojson import carregar_geojson, salvar_geojson
+from topologia import Topologia, poligonos_geometria
+
+# Diretórios
+BASE_DIR = Path(__file__).parent.parent
+DADOS_DIR = BASE_DIR / "dados"
+
+CAMADAS = ["microareas_ubs", "ubs_areas"]
+
+ZOOMS_PADRAO = [10, 12, 14]
+
+# Metros por pixel (tile de 256 px) no zoom 0, no equador
+METROS_POR_PIXEL_Z0 = 156543.03392
+
+
+def tamanho_pixel_m(zoom, latitude):
+    """Tamanho (m) de um pixel de tela no `zoom` (Web Mercator) na `latitude`."""
+    return METROS_POR_PIXEL_Z0 * np.cos(np.radians(latitude)) / 2 ** zoom
+
+
+def areas_efetivas(x, y):
+    """
+    Área efetiva de Visvalingam–Whyatt de cada vértice da linha (x, y).
+    Os extremos recebem infinito. As áreas são monótonas: um vértice nunca
+    vale menos que os removidos antes dele.
+    """
+    n = len(x)
+    area = np.full(n, np.inf)
+    if n < 3:
+        return area
+    anterior = list(range(-1, n - 1))
+    seguinte = list(range(1, n + 1))
+
+    def triangulo(i):
+        a, c = anterior[i], seguinte[i]
+        return abs((x[a] - x[i]) * (y[c] - y[i]) - (x[c] - x[i]) * (y[a] - y[i])) / 2
+
+    atual = [triangulo(i) for i in range(1, n - 1)]
+    heap = [(atual[i - 1], i) for i in range(1, n - 1)]
+    heapq.heapify(heap)
+    atual = [np.inf] + atual + [np.inf]
+    removido = [False] * n
+    maior = 0.0
+    while heap:
+        valor, i = heapq.heappop(heap)
+        if removido[i] or valor != atual[i]:
+            continue  # entrada desatualizada
+        maior = max(maior, valor)
+        area[i] = maior
+        removido[i] = True
+        a, c = anterior[i], seguinte[i]
+        seguinte[a], anterior[c] = c, a
+        for k in (a, c):
+            if 0 < k < n - 1:
+                atual[k] = triangulo(k)
+                heapq.heappush(heap, (atual[k], k))
+    return area
+
+
+def importancias(topologia):
+    """Áreas efetivas (m²) dos vértices de cada arco, numa projeção local."""
+    lat0 = (topologia.caixa[1] + topologia.caixa[3]) / 2
+    fator = topologia.escala * np.array([km_por_grau_lon(lat0), KM_POR_GRAU_LAT]) * 1000
+    resultado = []
+    for arco in topologia.arcos:
+        metros = arco * fator
+        resultado.append(areas_efetivas(metros[:, 0], metros[:, 1]))
+    return resultado
+
+
+def simplificar(topologia, areas, limiar_m2):
+    """
+    Arcos simplificados: vértices com área efetiva ≥ limiar. Anéis que
+    ficariam com menos de 3 vértices recuperam os mais importantes.
+    """
+    manter = [a >= limiar_m2 for a in areas]
+
+    for camada in topologia.referencias.values():
+        for poligonos in camada:
+            for refs in (r for aneis in poligonos for r in aneis):
+                arcos = [ref if ref >= 0 else ~ref for ref in refs]
+                faltam = 3 - sum(int(manter[a].sum()) - 1 for a in arcos)
+                if faltam <= 0:
+                    continue
+                candidatos = sorted(((-areas[a][i], a, i) for a in set(arcos)
+                                     for i in np.flatnonzero(~manter[a])), key=lambda c: c[0])
+                for _, a, i in candidatos[:faltam]:
+                    manter[a][i] = True
+    return [arco[m] for arco, m in zip(topologia.arcos, manter)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera versões simplificadas dos polígonos por zoom")
+    parser.add_argument("--zooms", type=int, nargs="+", default=ZOOMS_PADRAO,
+                        help="níveis de zoom (Web Mercator) a gerar (padrão: %(default)s)")
+    parser.add_argument("--compacto", action="store_true",
+                        help="GeoJSON sem indentação e com coordenadas arredondadas")
+    parser.add_argument("--gzip", action="store_true",
+                        help="grava os GeoJSON comprimidos (.geojson.gz)")
+    args = parser.parse_args()
+
+    camadas = {nome: carregar_geojson(DADOS_DIR / f"{nome}.geojson")["features"] for nome in CAMADAS}
+    topologia = Topologia(camadas)
+    areas = importancias(topologia)
+    lat0 = (topologia.caixa[1] + topologia.caixa[3]) / 2
+    vertices_originais = sum(len(anel) - 1 for f in camadas["microareas_ubs"]
+                             for poligono in poligonos_geometria(f["geometry"]) for anel in poligono)
+
+    print("=" * 70)
+    print("SIMPLIFICAÇÃO DOS POLÍGONOS POR ZOOM")
+    print("=" * 70)
+    print(f"\nArcos: {len(topologia.arcos)} | Vértices das microáreas: {vertices_originais}")
+
+    for zoom in sorted(args.zooms):
+        pixel = tamanho_pixel_m(zoom, lat0)
+        arcos = simplificar(topologia, areas, pixel ** 2)
+        print(f"\n🔎 Zoom {zoom} (pixel ≈ {pixel:.1f} m)")
+        for nome, features in camadas.items():
+            simplificadas = [
+                {**feature, "geometry": topologia.geometria(nome, f, arcos)}
+                for f, feature in enumerate(features)
+                if topologia.referencias[nome][f]
+            ]
+            vertices = sum(len(anel) - 1 for feature in simplificadas
+                           for poligono in poligonos_geometria(feature["geometry"]) for anel in poligono)
+            caminho = salvar_geojson(DADOS_DIR / f"{nome}_z{zoom}.geojson", f"{nome}_z{zoom}",
+                                     simplificadas, compacto=args.compacto, comprimir=args.gzip)
+            print(f"   ✅ {len(simplificadas)} polígonos, {vertices} vértices: {caminho}")
+
+
+if __name__ == "__main__":
+    main()
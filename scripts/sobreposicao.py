@@ -0,0 +1,269 @@
+"""
+Sobreposição e Adjacência entre Polígonos
+Usado por verificar_poligonos.py para comparar as microáreas entre si.
+
+1. Caixas envolventes dos polígonos em uma R-tree (indice_espacial.ArvoreSTR):
+   só os pares cujas caixas se tocam são examinados (quase linear, em vez de
+   O(polígonos²))
+2. Área exata da interseção pelo contorno (teorema de Green): os
+   segmentos de cada polígono são cortados onde cruzam os do outro (pares
+   candidatos de uma R-tree sobre os segmentos) e somam-se os trechos de
+   cada um que ficam dentro do outro
+3. Distância entre contornos para identificar microáreas vizinhas
+4. Junção ponto-polígono (caixa na R-tree + ray casting) para achar os
+   endereços que caem em mais de um polígono
+
+Todas as medidas são feitas em uma projeção local em km.
+"""
+
+import numpy as np
+
+from geometria import KM_POR_GRAU_LAT, aneis_geometria, km_por_grau_lon, pontos_em_geometria
+from indice_espacial import ArvoreSTR
+
+# Interseções menores que isso (km² = 1 m²) são ruído numérico de bordas comuns
+AREA_MINIMA_KM2 = 1e-6
+
+# Pontos a até essa distância (km, 0,1 mm) de um segmento estão sobre ele
+EPSILON_KM = 1e-7
+
+
+class Projecao:
+    """Projeção equiretangular local (lon, lat) → (x, y) em km, com origem em (lon0, lat0)."""
+
+    def __init__(self, lat0, lon0=0.0):
+        self.kx = km_por_grau_lon(lat0)
+        self.lon0, self.lat0 = lon0, lat0
+
+    def __call__(self, anel):
+        anel = np.asarray(anel, dtype=float)
+        return np.column_stack([(anel[:, 0] - self.lon0) * self.kx,
+                                (anel[:, 1] - self.lat0) * KM_POR_GRAU_LAT])
+
+
+def _area_assinada(pontos):
+    x, y = pontos[:, 0], pontos[:, 1]
+    return 0.5 * float(np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y))
+
+
+def _cruz(ux, uy, vx, vy):
+    return ux * vy - uy * vx
+
+
+class Contorno:
+    """
+    Segmentos orientados (m, 2, 2) de um Polygon/MultiPolygon projetado,
+    anéis externos no sentido anti-horário e buracos no horário, em uma
+    R-tree (ArvoreSTR) sobre as caixas dos segmentos.
+    """
+
+    def __init__(self, geometria, projecao):
+        poligonos = ([geometria["coordinates"]] if geometria["type"] == "Polygon"
+                     else geometria["coordinates"])
+        partes = []
+        for poligono in poligonos:
+            for k, anel in enumerate(poligono):
+                p = projecao(anel)
+                if len(p) > 1 and np.array_equal(p[0], p[-1]):
+                    p = p[:-1]
+                if len(p) < 3:
+                    continue
+                if (_area_assinada(p) < 0) == (k == 0):
+                    p = p[::-1]
+                partes.append(np.stack([p, np.roll(p, -1, axis=0)], axis=1))
+        segmentos = np.concatenate(partes) if partes else np.empty((0, 2, 2))
+        self.segmentos = segmentos[np.any(segmentos[:, 0] != segmentos[:, 1], axis=1)]
+        a, b = self.segmentos[:, 0], self.segmentos[:, 1]
+        self.arvore = ArvoreSTR(np.minimum(a[:, 0], b[:, 0]), np.minimum(a[:, 1], b[:, 1]),
+                                np.maximum(a[:, 0], b[:, 0]), np.maximum(a[:, 1], b[:, 1]))
+
+    def __len__(self):
+        return len(self.segmentos)
+
+    def dentro(self, px, py, bloco=4096):
+        """Ray casting (par-ímpar) com as arestas candidatas vindas da R-tree, em blocos de pontos."""
+        resultado = np.zeros(len(px), dtype=bool)
+        for inicio in range(0, len(px), bloco):
+            x, y = px[inicio:inicio + bloco], py[inicio:inicio + bloco]
+            q, s = self.arvore.consultar(x, y, np.full(len(x), np.inf), y)
+            a, b = self.segmentos[s, 0], self.segmentos[s, 1]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                cruza = (((a[:, 1] > y[q]) != (b[:, 1] > y[q]))
+                         & (x[q] < a[:, 0] + (y[q] - a[:, 1]) * (b[:, 0] - a[:, 0]) / (b[:, 1] - a[:, 1])))
+            resultado[inicio:inicio + bloco] = np.bincount(q[cruza], minlength=len(x)) % 2 == 1
+        return resultado
+
+    def sobre(self, px, py):
+        """Índice de um segmento a até EPSILON_KM de cada ponto, ou -1."""
+        q, s = self.arvore.consultar(px - EPSILON_KM, py - EPSILON_KM, px + EPSILON_KM, py + EPSILON_KM)
+        a, b = self.segmentos[s, 0], self.segmentos[s, 1]
+        dx, dy = b[:, 0] - a[:, 0], b[:, 1] - a[:, 1]
+        t = np.clip(((px[q] - a[:, 0]) * dx + (py[q] - a[:, 1]) * dy) / (dx * dx + dy * dy), 0, 1)
+        perto = np.hypot(px[q] - a[:, 0] - t * dx, py[q] - a[:, 1] - t * dy) <= EPSILON_KM
+        segmento = np.full(len(px), -1, dtype=np.int64)
+        segmento[q[perto][::-1]] = s[perto][::-1]
+        return segmento
+
+
+def _cortes(seg_a, seg_b, ia, ib):
+    """
+    Parâmetros (0..1) onde os segmentos seg_a[ia] são cortados pelos
+    seg_b[ib]: cruzamentos próprios e pontas de um sobre o outro (o que
+    também separa os trechos colineares em comum).
+    """
+    p, r = seg_a[ia, 0], seg_a[ia, 1] - seg_a[ia, 0]
+    q, s = seg_b[ib, 0], seg_b[ib, 1] - seg_b[ib, 0]
+    qp = q - p
+    denominador = _cruz(r[:, 0], r[:, 1], s[:, 0], s[:, 1])
+    comprimento2 = (r * r).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = _cruz(qp[:, 0], qp[:, 1], s[:, 0], s[:, 1]) / denominador
+        u = _cruz(qp[:, 0], qp[:, 1], r[:, 0], r[:, 1]) / denominador
+    proprio = ((np.abs(denominador) > 1e-12 * np.sqrt(comprimento2 * (s * s).sum(axis=1)))
+               & (t > 0) & (t < 1) & (u > 0) & (u < 1))
+    indices, parametros = [ia[proprio]], [t[proprio]]
+    for ponta in (q, q + s):
+        d = ponta - p
+        tt = (d * r).sum(axis=1) / comprimento2
+        folga = EPSILON_KM / np.sqrt(comprimento2)
+        sobre = ((np.abs(_cruz(r[:, 0], r[:, 1], d[:, 0], d[:, 1])) <= EPSILON_KM * np.sqrt(comprimento2))
+                 & (tt > folga) & (tt < 1 - folga))
+        indices.append(ia[sobre])
+        parametros.append(tt[sobre])
+    return np.concatenate(indices), np.concatenate(parametros)
+
+
+def _trechos(segmentos, indices, parametros):
+    """Divide os segmentos nos cortes: retorna os trechos (k, 2, 2) e o segmento de origem."""
+    m = len(segmentos)
+    seg = np.concatenate([np.arange(m), np.arange(m), indices])
+    t = np.concatenate([np.zeros(m), np.ones(m), parametros])
+    ordem = np.lexsort((t, seg))
+    seg, t = seg[ordem], t[ordem]
+    # Cortes a menos de EPSILON_KM um do outro viram um só
+    comprimento = np.linalg.norm(segmentos[:, 1] - segmentos[:, 0], axis=1)
+    manter = np.r_[True, (seg[1:] != seg[:-1]) | ((t[1:] - t[:-1]) * comprimento[seg[1:]] > EPSILON_KM)]
+    manter[np.r_[seg[1:] != seg[:-1], True]] = True  # t = 1 de cada segmento fica sempre
+    seg, t = seg[manter], t[manter]
+    continua = seg[1:] == seg[:-1]
+    origem, t0, t1 = seg[:-1][continua], t[:-1][continua], t[1:][continua]
+    a, d = segmentos[origem, 0], segmentos[origem, 1] - segmentos[origem, 0]
+    return np.stack([a + t0[:, None] * d, a + t1[:, None] * d], axis=1), origem
+
+
+def area_intersecao(contorno_a, contorno_b):
+    """
+    Área (km²) da interseção de dois polígonos, pelo teorema de Green: soma
+    de x dy ao longo do contorno da interseção, que é formado pelos trechos
+    do contorno de A dentro de B, os de B dentro de A e os trechos comuns
+    percorridos no mesmo sentido (bordas comuns em sentidos opostos, de
+    polígonos vizinhos, não contam). Os pares de segmentos que podem se
+    cruzar vêm da R-tree de B.
+    """
+    if len(contorno_a) == 0 or len(contorno_b) == 0:
+        return 0.0
+    seg_a, seg_b = contorno_a.segmentos, contorno_b.segmentos
+    a0, a1 = seg_a[:, 0], seg_a[:, 1]
+    ia, ib = contorno_b.arvore.consultar(
+        np.minimum(a0[:, 0], a1[:, 0]) - EPSILON_KM, np.minimum(a0[:, 1], a1[:, 1]) - EPSILON_KM,
+        np.maximum(a0[:, 0], a1[:, 0]) + EPSILON_KM, np.maximum(a0[:, 1], a1[:, 1]) + EPSILON_KM)
+    trechos_a, _ = _trechos(seg_a, *_cortes(seg_a, seg_b, ia, ib))
+    trechos_b, _ = _trechos(seg_b, *_cortes(seg_b, seg_a, ib, ia))
+
+    def contribuicao(trechos, outro, mesmo_sentido):
+        meio = trechos.mean(axis=1)
+        sobre = outro.sobre(meio[:, 0], meio[:, 1])
+        incluir = (sobre < 0) & outro.dentro(meio[:, 0], meio[:, 1])
+        if mesmo_sentido:
+            d = trechos[:, 1] - trechos[:, 0]
+            d_outro = outro.segmentos[sobre, 1] - outro.segmentos[sobre, 0]
+            incluir |= (sobre >= 0) & ((d * d_outro).sum(axis=1) > 0)
+        p, q = trechos[incluir, 0], trechos[incluir, 1]
+        return 0.5 * float(np.sum(_cruz(p[:, 0], p[:, 1], q[:, 0], q[:, 1])))
+
+    return contribuicao(trechos_a, contorno_b, True) + contribuicao(trechos_b, contorno_a, False)
+
+
+def _distancia_pontos_segmentos(pontos, segmentos):
+    a, b = segmentos[None, :, 0], segmentos[None, :, 1]
+    ab = b - a
+    comprimento2 = np.maximum((ab ** 2).sum(axis=2), 1e-30)
+    t = np.clip(((pontos[:, None] - a) * ab).sum(axis=2) / comprimento2, 0, 1)
+    mais_proximo = a + t[:, :, None] * ab
+    return np.sqrt(((pontos[:, None] - mais_proximo) ** 2).sum(axis=2)).min()
+
+
+def distancia_contornos(seg_a, seg_b):
+    """Menor distância (km) entre os contornos de dois polígonos sem interseção."""
+    return min(_distancia_pontos_segmentos(seg_a[:, 0], seg_b),
+               _distancia_pontos_segmentos(seg_b[:, 0], seg_a))
+
+
+def caixas(geometrias):
+    """Caixas envolventes (xmin, ymin, xmax, ymax) em lon/lat de cada geometria."""
+    resultado = np.empty((len(geometrias), 4))
+    for k, geometria in enumerate(geometrias):
+        coords = np.concatenate([np.asarray(a, dtype=float) for a in aneis_geometria(geometria)])
+        resultado[k] = [coords[:, 0].min(), coords[:, 1].min(),
+                        coords[:, 0].max(), coords[:, 1].max()]
+    return resultado
+
+
+def analisar_pares(geometrias, tolerancia_km):
+    """
+    Compara os polígonos cujas caixas (ampliadas por `tolerancia_km`) se tocam.
+    Retorna uma lista de dicts {i, j, area_km2, distancia_km}: area_km2 > 0
+    para sobreposições; distancia_km é 0 quando os contornos se cruzam.
+    """
+    if not geometrias:
+        return []
+    cx = caixas(geometrias)
+    projecao = Projecao(float(np.mean(cx[:, [1, 3]])), float(np.mean(cx[:, [0, 2]])))
+    folga_lon = tolerancia_km / projecao.kx
+    folga_lat = tolerancia_km / KM_POR_GRAU_LAT
+    arvore = ArvoreSTR(cx[:, 0], cx[:, 1], cx[:, 2], cx[:, 3])
+    qi, qj = arvore.consultar(cx[:, 0] - folga_lon, cx[:, 1] - folga_lat,
+                              cx[:, 2] + folga_lon, cx[:, 3] + folga_lat)
+    candidatos = qi < qj
+
+    contornos = {}
+    pares = []
+    for i, j in sorted(zip(qi[candidatos].tolist(), qj[candidatos].tolist())):
+        for k in (i, j):
+            if k not in contornos:
+                contornos[k] = Contorno(geometrias[k], projecao)
+        area = area_intersecao(contornos[i], contornos[j])
+        if area > AREA_MINIMA_KM2:
+            distancia = 0.0
+        else:
+            area = 0.0
+            distancia = distancia_contornos(contornos[i].segmentos, contornos[j].segmentos)
+        if area > 0 or distancia <= tolerancia_km:
+            pares.append({"i": i, "j": j, "area_km2": area, "distancia_km": distancia})
+    return pares
+
+
+def juncao_pontos(lon, lat, geometrias):
+    """
+    Junção espacial ponto-polígono: retorna (idx_ponto, idx_geometria) para
+    cada ponto dentro (ou sobre o contorno) de cada geometria. Pontos NaN são
+    ignorados.
+    """
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    vazio = np.empty(0, dtype=np.int64)
+    if not geometrias:
+        return vazio, vazio
+    cx = caixas(geometrias)
+    arvore = ArvoreSTR(cx[:, 0], cx[:, 1], cx[:, 2], cx[:, 3])
+    p, g = arvore.consultar(lon, lat, lon, lat)
+
+    # Ray casting só nos pontos cuja caixa bate, uma geometria por vez
+    ordem = np.lexsort((p, g))
+    p, g = p[ordem], g[ordem]
+    dentro = np.zeros(len(p), dtype=bool)
+    inicios = np.flatnonzero(np.r_[True, g[1:] != g[:-1]]) if len(g) else vazio
+    for inicio, fim in zip(inicios, np.r_[inicios[1:], len(g)]):
+        pts = p[inicio:fim]
+        dentro[inicio:fim] = pontos_em_geometria(lon[pts], lat[pts], geometrias[g[inicio]], borda=True)
+    return p[dentro], g[dentro]
@@ -0,0 +1,314 @@
+"""
+Sugestões de Atribuição de Ruas às UBS pela Rede Viária
+As atribuições de ubs_referencia nos CSVs são manuais. Este script dá a
+evidência para revê-las: atribui cada rua geocodificada à UBS mais próxima
+pela rede viária (Voronoi de rede) e lista onde isso difere da atribuição
+atual, com o ganho em tempo e distância.
+
+- Rede: o grafo viário de um extrato local do OpenStreetMap
+  (grafo_viario.py) e um Dijkstra de múltiplas fontes a partir de todas as
+  UBS, que guarda em cada vértice as --k UBS mais próximas
+  (areas_servico.rotulos_ubs); a primeira é o Voronoi de rede, que decide
+  a votação
+- Rua: cada endereço do CSV consolidado (UBS atual + endereço normalizado,
+  ver servico_consulta.normalizar_endereco). Os pontos da rua são o ponto
+  geocodificado e, quando o nome bate com o de vias do OSM a até
+  RAIO_RUA_KM dele, os nós dessas vias (a rua inteira, não só o ponto)
+- Sugestão: a UBS mais próxima do maior número de pontos da rua; o tempo
+  médio até a UBS atual e até a sugerida é a média sobre todos os pontos
+  da rua que votaram (e que as duas alcançam). Os tempos saem dos mesmos
+  rótulos; para os pontos em que a UBS não está entre as k, um Dijkstra só
+  dela, que para ao alcançar esses pontos (um por UBS que precisa). O
+  resultado não depende de --k, que só reduz essas buscas extras
+
+Status por rua: manter, reatribuir (outra UBS, ganho ≥ --ganho-min),
+limite (outra UBS, ganho menor), sem_caminho (nenhum ponto da rua tem
+caminho pela rede até a UBS atual; tempo e ganho ficam vazios),
+fora_da_rede, ubs_sem_coordenada ou sem_coordenada.
+
+Saídas:
+- dados/sugestoes_atribuicao.csv: uma linha por rua
+- dados/relatorios/sugestoes_atribuicao.json/.html: resumo, pares de UBS e ocorrências
+
+Uso:
+    python sugerir_atribuicoes.py [--osm dados/socorro.osm.pbf] [--modo a_pe] [--k 3] [--ganho-min 1]
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from areas_servico import ACESSO_MAX_M, OSM_PADRAO, caixa_municipio, rotulos_ubs, ubs_na_rede
+from grafo_viario import MODOS, VELOCIDADE_A_PE_KMH, GrafoViario
+from metricas_poligonos import distancia_km
+from osm import ler_osm
+from registro_ubs import carregar_registro, posicoes_ubs
+from relatorio import Cronometro, agora_iso, registros, salvar_relatorio
+from servico_consulta import normalizar_endereco
+
+# Diretórios
+BASE_DIR = Path(__file__).parent.parent
+DADOS_DIR = BASE_DIR / "dados"
+
+SAIDA_CSV = DADOS_DIR / "sugestoes_atribuicao.csv"
+
+# Nós de vias do OSM com o mesmo nome contam como pontos da rua até essa distância do ponto geocodificado
+RAIO_RUA_KM = 1.0
+
+# Ganho mínimo (minutos) para sugerir a reatribuição
+GANHO_MIN_MIN = 1.0
+
+# UBS mais próximas guardadas por vértice da rede (só afeta quantas buscas extras são feitas)
+K_PADRAO = 3
+
+COLUNAS_RUA = ['ubs_referencia', 'micro_area', 'endereco_completo', 'latitude', 'longitude',
+               'pontos_osm', 'ubs_sugerida', 'votos_sugerida', 'pontos_sem_caminho', 'tempo_atual_min',
+               'tempo_sugerida_min', 'ganho_min', 'distancia_atual_km', 'distancia_sugerida_km', 'ganho_km', 'status']
+
+
+def ruas(df):
+    """
+    Ruas do CSV consolidado: uma linha por (UBS, endereço normalizado), com
+    as microáreas juntadas e a primeira coordenada geocodificada.
+    """
+    chave = df['endereco_completo'].map(normalizar_endereco)
+    return (
+        df.assign(ubs_referencia=df['ubs_referencia'].str.strip(), chave=chave,
+                  micro_area=df['micro_area'].astype(str),
+                  nome_osm=chave.str.split(",").str[0].str.strip())
+        .groupby(['ubs_referencia', 'chave'], sort=False)
+        .agg(micro_area=('micro_area', lambda m: ", ".join(sorted(set(m)))),
+             endereco_completo=('endereco_completo', 'first'),
+             latitude=('latitude', 'first'), longitude=('longitude', 'first'),
+             nome_osm=('nome_osm', 'first'))
+        .reset_index()
+    )
+
+
+def pontos_osm(extrato, tabela):
+    """
+    (rua, lon, lat) dos nós das vias do OSM cujo nome normalizado é o da rua
+    e que estão a até RAIO_RUA_KM do ponto geocodificado dela.
+    """
+    vias_por_nome = {}
+    for k, tags in enumerate(extrato.via_tags):
+        if "name" in tags:
+            vias_por_nome.setdefault(normalizar_endereco(tags["name"]), []).append(k)
+    rua, nos = [], []
+    for r, (nome, lat) in enumerate(zip(tabela['nome_osm'], tabela['latitude'])):
+        if pd.isna(lat) or nome not in vias_por_nome:
+            continue
+        for k in vias_por_nome[nome]:
+            nos.append(extrato.via_nos[extrato.via_inicio[k]:extrato.via_inicio[k + 1]])
+            rua.append(np.full(len(nos[-1]), r))
+    if not nos:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+    rua, posicao = np.concatenate(rua), extrato.posicoes(np.concatenate(nos))
+    rua, posicao = rua[posicao >= 0], posicao[posicao >= 0]
+    lon, lat = extrato.lon[posicao], extrato.lat[posicao]
+    perto = distancia_km(lon, lat, tabela['longitude'].to_numpy()[rua],
+                         tabela['latitude'].to_numpy()[rua]) <= RAIO_RUA_KM
+    return rua[perto], lon[perto], lat[perto]
+
+
+def _ate_ubs(rotulos, alvo):
+    """
+    (tempo_s, comprimento_m) de cada ponto até a UBS `alvo` pelos rótulos do
+    ponto (linhas de rotulos_ubs); NaN onde ela não está entre as k (ver
+    _completar).
+    """
+    tempo, comprimento, fonte = rotulos
+    acerto = (fonte == np.asarray(alvo)[:, None]) & (fonte >= 0)
+    coluna = acerto.argmax(axis=1)[:, None]
+    presente = acerto.any(axis=1)
+    return (np.where(presente, np.take_along_axis(tempo, coluna, axis=1)[:, 0], np.nan),
+            np.where(presente, np.take_along_axis(comprimento, coluna, axis=1)[:, 0], np.nan))
+
+
+def _completar(grafo, ubs, alvos, tempos, vertice, acesso):
+    """
+    Completa, em `tempos` (dict nome → (tempo_s, comprimento_m)), os pontos
+    marcados em `alvos` (dict nome → (UBS de cada ponto, máscara)) com um
+    Dijkstra por UBS, que para ao alcançar os seus pontos. Pontos sem
+    caminho até a UBS ficam com inf. Retorna o número de buscas.
+    """
+    buscas = np.unique(np.concatenate([u[falta] for u, falta in alvos.values()]))
+    for u in buscas:
+        pontos = {nome: np.flatnonzero(falta & (alvo == u)) for nome, (alvo, falta) in alvos.items()}
+        acesso_ubs = ubs['acesso_m'].iat[u]
+        t, c, _ = grafo.dijkstra([ubs['vertice'].iat[u]], [acesso_ubs / (VELOCIDADE_A_PE_KMH / 3.6)], [acesso_ubs],
+                                 alvos=vertice[np.concatenate(list(pontos.values()))])
+        for nome, p in pontos.items():
+            tempos[nome][0][p] = t[vertice[p]] + acesso[p] / (VELOCIDADE_A_PE_KMH / 3.6)
+            tempos[nome][1][p] = c[vertice[p]] + acesso[p]
+    return len(buscas)
+
+
+def sugerir(df, registro, extrato, modo="a_pe", ganho_min=GANHO_MIN_MIN, k=K_PADRAO):
+    """Retorna (tabela de ruas com a sugestão, relatório)."""
+    cron = Cronometro()
+    with cron.etapa("grafo"):
+        grafo = GrafoViario.de_extrato(extrato, modo, caixa_municipio())
+    with cron.etapa("dijkstra"):
+        ubs = ubs_na_rede(grafo, registro)
+        n_ubs = len(ubs)
+        k = max(1, min(k, n_ubs))
+        tempo_v, comprimento_v, fonte_v = rotulos_ubs(grafo, ubs, k)
+
+    with cron.etapa("pontos_ruas"):
+        tabela = ruas(df)
+        geocodificada = tabela['latitude'].notna() & tabela['longitude'].notna()
+        p_rua = np.flatnonzero(geocodificada.to_numpy())
+        o_rua, o_lon, o_lat = pontos_osm(extrato, tabela)
+        rua = np.concatenate([p_rua, o_rua])
+        lon = np.concatenate([tabela['longitude'].to_numpy(dtype=float)[p_rua], o_lon])
+        lat = np.concatenate([tabela['latitude'].to_numpy(dtype=float)[p_rua], o_lat])
+        vertice, acesso = grafo.vertices_proximos(lon, lat)
+        na_rede = (vertice >= 0) & (acesso <= ACESSO_MAX_M)
+        v = np.maximum(vertice, 0)
+        fonte = np.where(na_rede[:, None], fonte_v[v], -1)
+        rotulos = (tempo_v[v] + (acesso / (VELOCIDADE_A_PE_KMH / 3.6))[:, None],
+                   comprimento_v[v] + acesso[:, None], fonte)
+        mais_proxima = fonte[:, 0]
+
+    with cron.etapa("votacao"):
+        # Votos (rua, UBS): cada ponto alcançado vota na sua UBS mais próxima
+        n_ruas = len(tabela)
+        votou = mais_proxima >= 0
+        votos = np.bincount(rua[votou] * n_ubs + mais_proxima[votou],
+                            minlength=n_ruas * n_ubs).reshape(n_ruas, max(n_ubs, 1))
+        total = votos.sum(axis=1)
+        sugerida = np.where(total > 0, votos.argmax(axis=1), -1)
+        atual = posicoes_ubs(ubs, tabela['ubs_referencia'])
+
+    with cron.etapa("tempos"):
+        # Tempos até a UBS atual e a sugerida em todos os pontos que votaram:
+        # pelos rótulos e, onde a UBS não está entre as k, por busca própria
+        ate = {"atual": atual[rua], "sugerida": sugerida[rua]}
+        tempos = {nome: _ate_ubs(rotulos, alvo) for nome, alvo in ate.items()}
+        alvos = {nome: (alvo, votou & (alvo >= 0) & np.isnan(tempos[nome][0])) for nome, alvo in ate.items()}
+        buscas = _completar(grafo, ubs, alvos, tempos, vertice, acesso)
+        comparavel = votou & np.isfinite(tempos["atual"][0]) & np.isfinite(tempos["sugerida"][0])
+        sem_caminho = np.bincount(rua[votou & ~comparavel], minlength=n_ruas)
+        quantos = np.bincount(rua[comparavel], minlength=n_ruas)
+        for nome, (t, c) in tempos.items():
+            tempos[nome] = (np.bincount(rua[comparavel], t[comparavel] / 60, n_ruas),
+                            np.bincount(rua[comparavel], c[comparavel] / 1000, n_ruas))
+
+    with cron.etapa("classificacao"):
+        resultado = tabela.drop(columns=['chave', 'nome_osm'])
+        nomes = np.append(ubs['ubs_referencia'].to_numpy(dtype=object), None)
+        resultado['pontos_osm'] = np.bincount(o_rua, minlength=n_ruas)
+        resultado['ubs_sugerida'] = nomes[sugerida]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            resultado['votos_sugerida'] = np.round(votos[np.arange(n_ruas), np.maximum(sugerida, 0)] / total, 3)
+            resultado['pontos_sem_caminho'] = sem_caminho
+            for nome in ("atual", "sugerida"):
+                soma_t, soma_c = tempos[nome]
+                resultado[f'tempo_{nome}_min'] = np.round(np.where(quantos > 0, soma_t / quantos, np.nan), 2)
+                resultado[f'distancia_{nome}_km'] = np.round(np.where(quantos > 0, soma_c / quantos, np.nan), 3)
+        resultado['ganho_min'] = (resultado['tempo_atual_min'] - resultado['tempo_sugerida_min']).round(2)
+        resultado['ganho_km'] = (resultado['distancia_atual_km'] - resultado['distancia_sugerida_km']).round(3)
+
+        ganho = resultado['ganho_min'].to_numpy()
+        status = np.where(sugerida == atual, "manter",
+                          np.where(quantos == 0, "sem_caminho",
+                                   np.where(ganho >= ganho_min, "reatribuir", "limite")))
+        status = np.where(total > 0, status, "fora_da_rede")
+        status = np.where(atual >= 0, status, "ubs_sem_coordenada")
+        status = np.where(geocodificada, status, "sem_coordenada")
+        resultado['status'] = status
+        resultado = resultado[COLUNAS_RUA]
+
+    contagem = resultado['status'].value_counts()
+    reatribuir = resultado[resultado['status'] == "reatribuir"].sort_values('ganho_min', ascending=False)
+    limite = resultado[resultado['status'] == "limite"].sort_values('ganho_min', ascending=False)
+    sem = resultado[resultado['status'] == "sem_caminho"]
+    pares = (
+        reatribuir.groupby(['ubs_referencia', 'ubs_sugerida'], sort=False)
+        .agg(ruas=('status', 'size'), ganho_medio_min=('ganho_min', 'mean'), ganho_max_min=('ganho_min', 'max'))
+        .round(2).sort_values('ruas', ascending=False).reset_index()
+        .rename(columns={'ubs_referencia': 'de', 'ubs_sugerida': 'para'})
+    )
+
+    relatorio = {
+        "relatorio": "sugestoes_atribuicao",
+        "titulo": "Sugestões de Atribuição de Ruas às UBS (Voronoi de Rede)",
+        "gerado_em": agora_iso(),
+        "entrada": "extrato OSM, dados/UBS_Ruas_Coordenadas_Consolidado.csv, dados/UBS_Ruas - *.csv",
+        "parametros": {"modo": modo, "k": k, "ganho_min": ganho_min, "raio_rua_km": RAIO_RUA_KM,
+                       "acesso_max_m": ACESSO_MAX_M},
+        "problemas": int(len(reatribuir) + len(sem)),
+        "contagens": {
+            "ruas": int(len(resultado)),
+            "ubs_na_rede": int(n_ubs),
+            "vertices": len(grafo), "arestas": grafo.n_arestas,
+            "pontos": int(len(rua)), "pontos_osm": int(len(o_rua)), "buscas_extras": buscas,
+            **{s: int(contagem.get(s, 0)) for s in
+               ("manter", "reatribuir", "limite", "sem_caminho", "fora_da_rede", "ubs_sem_coordenada",
+                "sem_coordenada")},
+        },
+        "pares": registros(pares),
+        "tempos_s": cron.tempos,
+        "ocorrencias": {
+            "reatribuir": registros(reatribuir),
+            "limite": registros(limite),
+            "sem_caminho": registros(sem),
+        },
+    }
+    return resultado, relatorio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sugere a UBS de cada rua pela rede viária (Voronoi de rede)")
+    parser.add_argument("--osm", type=Path, default=OSM_PADRAO,
+                        help=f"Extrato do OpenStreetMap (.osm.pbf ou .osm) (padrão: {OSM_PADRAO})")
+    parser.add_argument("--modo", choices=MODOS, default="a_pe",
+                        help="Modo de deslocamento (padrão: a_pe)")
+    parser.add_argument("--k", type=int, default=K_PADRAO,
+                        help=f"UBS mais próximas guardadas por ponto da rede (padrão: {K_PADRAO})")
+    parser.add_argument("--ganho-min", type=float, default=GANHO_MIN_MIN,
+                        help=f"Ganho mínimo, em minutos, para sugerir reatribuir (padrão: {GANHO_MIN_MIN})")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("SUGESTÕES DE ATRIBUIÇÃO DE RUAS ÀS UBS PELA REDE VIÁRIA")
+    print("=" * 70)
+    if not args.osm.exists():
+        print(f"\n❌ Extrato do OpenStreetMap não encontrado: {args.osm}")
+        print("   Veja em areas_servico.py como obter o extrato e use --osm")
+        return
+
+    inicio = time.perf_counter()
+    extrato = ler_osm(args.osm)
+    df = pd.read_csv(DADOS_DIR / "UBS_Ruas_Coordenadas_Consolidado.csv")
+    resultado, relatorio = sugerir(df, carregar_registro(), extrato, args.modo, args.ganho_min, args.k)
+    resultado.to_csv(SAIDA_CSV, index=False, encoding='utf-8-sig')
+    caminho_json, caminho_html = salvar_relatorio(relatorio, 'sugestoes_atribuicao')
+
+    c = relatorio['contagens']
+    print(f"\nRede ({args.modo}): {c['vertices']} vértices, {c['arestas']} arestas, {c['ubs_na_rede']} UBS")
+    print(f"Ruas: {c['ruas']} ({c['pontos']} pontos, {c['pontos_osm']} de vias do OSM com o mesmo nome)")
+    print(f"Buscas extras (UBS fora das {relatorio['parametros']['k']} mais próximas de algum ponto): "
+          f"{c['buscas_extras']}")
+    print(f"   ✅ Já na UBS mais próxima pela rede: {c['manter']}")
+    print(f"   🔁 Sugerido reatribuir (ganho ≥ {args.ganho_min:g} min): {c['reatribuir']}")
+    print(f"   ≈  Outra UBS, mas com ganho menor: {c['limite']}")
+    print(f"   ❓ Sem caminho pela rede até a UBS atual: {c['sem_caminho']}")
+    if c['fora_da_rede'] or c['ubs_sem_coordenada'] or c['sem_coordenada']:
+        print(f"   - Fora da rede: {c['fora_da_rede']} | UBS sem coordenada: {c['ubs_sem_coordenada']}"
+              f" | Sem coordenada: {c['sem_coordenada']}")
+    for par in relatorio['pares'][:10]:
+        print(f"      {par['de']} → {par['para']}: {par['ruas']} rua(s), ganho médio {par['ganho_medio_min']} min")
+    print(f"\n⏱️  Tempo total: {time.perf_counter() - inicio:.1f}s")
+
+    print(f"\n📁 Sugestões por rua: {SAIDA_CSV}")
+    print(f"📁 Relatório JSON: {caminho_json}")
+    print(f"📁 Relatório HTML: {caminho_html}")
+
+
+if __name__ == "__main__":
+    main()
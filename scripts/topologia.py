@@ -0,0 +1,182 @@
+"""
+Topologia de Arcos Compartilhados (TopoJSON)
+Usado por gerar_poligonos.py --topojson.
+
+Os anéis de todos os polígonos (microáreas e áreas das UBS) são
+quantizados em uma grade inteira e cortados nas junções: vértices onde
+anéis vizinhos se separam. Cada trecho entre junções vira um arco,
+guardado uma única vez e referenciado pelos dois polígonos que o
+compartilham (o segundo o percorre ao contrário, índice ~i). No arquivo,
+os arcos são codificados em deltas (diferença para o vértice anterior).
+
+Método:
+1. Quantização: (lon, lat) → inteiros em [0, quantizacao - 1] na caixa dos dados
+2. Junções: um vértice é junção se aparece com pares de vizinhos
+   diferentes em anéis diferentes (NumPy, sem laços por vértice)
+3. Corte dos anéis nas junções e deduplicação dos arcos (mesma sequência
+   ou sequência invertida). Anéis sem junção viram um arco fechado,
+   começando no menor vértice, para que anéis iguais coincidam.
+"""
+
+import numpy as np
+
+# Pontos da grade de quantização por eixo (1e5 na caixa do município ≈ 30 cm)
+QUANTIZACAO_PADRAO = 100_000
+
+
+def poligonos_geometria(geometria):
+    """Lista de polígonos (listas de anéis) de um Polygon/MultiPolygon GeoJSON."""
+    if geometria is None:
+        return []
+    return [geometria["coordinates"]] if geometria["type"] == "Polygon" else geometria["coordinates"]
+
+
+def _sem_repetidos(anel):
+    """Remove vértices consecutivos iguais (inclusive o fechamento) de um anel inteiro."""
+    if len(anel) == 0:
+        return anel
+    diferente = np.any(anel != np.roll(anel, 1, axis=0), axis=1)
+    return anel[diferente] if diferente.any() else anel[:1]
+
+
+class Topologia:
+    """
+    Topologia de camadas de features GeoJSON (Polygon/MultiPolygon).
+
+    `camadas` é um dict nome → lista de features. Depois da construção:
+    - arcos: lista de arrays (k, 2) de inteiros quantizados (absolutos)
+    - referencias[nome][f]: polígonos → anéis → índices de arcos (~i = invertido)
+    - escala, translacao: (lon, lat) = inteiro × escala + translacao
+    """
+
+    def __init__(self, camadas, quantizacao=QUANTIZACAO_PADRAO):
+        self.camadas = camadas
+        self.quantizacao = int(quantizacao)
+
+        # 1. Quantização na caixa de todos os vértices
+        todos = [np.asarray(anel, dtype=float)
+                 for features in camadas.values() for f in features
+                 for poligono in poligonos_geometria(f["geometry"]) for anel in poligono]
+        coords = np.concatenate(todos) if todos else np.zeros((1, 2))
+        minimo, maximo = coords.min(axis=0), coords.max(axis=0)
+        extensao = np.where(maximo > minimo, maximo - minimo, 1.0)
+        self.translacao = minimo
+        self.escala = extensao / (self.quantizacao - 1)
+        self.caixa = [*minimo.tolist(), *maximo.tolist()]
+
+        # Anéis quantizados (abertos) e sua posição em camada/feature/polígono
+        aneis, posicoes = [], []
+        for nome, features in camadas.items():
+            for f, feature in enumerate(features):
+                for p, poligono in enumerate(poligonos_geometria(feature["geometry"])):
+                    for a, anel in enumerate(poligono):
+                        q = np.round((np.asarray(anel, dtype=float)[:-1] - minimo) / self.escala)
+                        q = _sem_repetidos(q.astype(np.int64))
+                        if len(q) >= 3:
+                            aneis.append(q)
+                            posicoes.append((nome, f, p, a))
+
+        # 2. Junções
+        juncao = self._juncoes(aneis)
+
+        # 3. Corte nos arcos e deduplicação
+        self.arcos = []
+        indice_arco = {}
+
+        def registrar(arco):
+            chave = arco.tobytes()
+            if chave in indice_arco:
+                return indice_arco[chave]
+            invertida = arco[::-1].tobytes()
+            if invertida in indice_arco:
+                return ~indice_arco[invertida]
+            indice_arco[chave] = len(self.arcos)
+            self.arcos.append(arco)
+            return indice_arco[chave]
+
+        self.referencias = {nome: [[] for _ in features] for nome, features in camadas.items()}
+        poligono_atual = {}
+        for anel, j, (nome, f, p, a) in zip(aneis, juncao, posicoes):
+            cortes = np.flatnonzero(j)
+            if len(cortes) == 0:
+                inicio = int(np.lexsort((anel[:, 1], anel[:, 0]))[0])
+                anel = np.roll(anel, -inicio, axis=0)
+                refs = [registrar(np.concatenate([anel, anel[:1]]))]
+            else:
+                anel = np.roll(anel, -cortes[0], axis=0)
+                cortes = np.r_[cortes - cortes[0], len(anel)]
+                fechado = np.concatenate([anel, anel[:1]])
+                refs = [registrar(fechado[c0:c1 + 1]) for c0, c1 in zip(cortes[:-1], cortes[1:])]
+            # Buracos de um anel externo degenerado (descartado) também são descartados
+            if a == 0:
+                poligono_atual[(nome, f, p)] = []
+                self.referencias[nome][f].append(poligono_atual[(nome, f, p)])
+            if (nome, f, p) in poligono_atual:
+                poligono_atual[(nome, f, p)].append(refs)
+
+    @staticmethod
+    def _juncoes(aneis):
+        """Para cada anel, array booleano com os vértices que são junções."""
+        if not aneis:
+            return []
+        tamanhos = np.array([len(a) for a in aneis])
+        inicios = np.r_[0, np.cumsum(tamanhos)[:-1]]
+        pontos = np.concatenate(aneis)
+        _, ids = np.unique(pontos, axis=0, return_inverse=True)
+        ids = ids.ravel()
+
+        anel = np.repeat(np.arange(len(aneis)), tamanhos)
+        local = np.arange(len(pontos)) - inicios[anel]
+        anterior = ids[inicios[anel] + (local - 1) % tamanhos[anel]]
+        seguinte = ids[inicios[anel] + (local + 1) % tamanhos[anel]]
+        pares = np.column_stack([ids, np.minimum(anterior, seguinte), np.maximum(anterior, seguinte)])
+        distintos = np.unique(pares, axis=0)
+        juncao = np.bincount(distintos[:, 0], minlength=ids.max() + 1) > 1
+        return np.split(juncao[ids], inicios[1:])
+
+    def coordenadas(self, arco):
+        """Vértices (lon, lat) de um arco quantizado."""
+        return arco * self.escala + self.translacao
+
+    def anel(self, refs, arcos=None):
+        """Anel fechado (lista de [lon, lat]) a partir das referências de arcos."""
+        arcos = self.arcos if arcos is None else arcos
+        partes = []
+        for k, ref in enumerate(refs):
+            arco = arcos[ref] if ref >= 0 else arcos[~ref][::-1]
+            partes.append(arco if k == 0 else arco[1:])
+        return self.coordenadas(np.concatenate(partes)).tolist()
+
+    def geometria(self, nome, f, arcos=None):
+        """Geometria GeoJSON de uma feature remontada a partir dos arcos (opcionalmente outros)."""
+        poligonos = [[self.anel(refs, arcos) for refs in aneis] for aneis in self.referencias[nome][f]]
+        if not poligonos:
+            return None
+        if len(poligonos) == 1:
+            return {"type": "Polygon", "coordinates": poligonos[0]}
+        return {"type": "MultiPolygon", "coordinates": poligonos}
+
+    def topojson(self, arcos=None):
+        """Dict TopoJSON (arcos em deltas) com um GeometryCollection por camada."""
+        arcos = self.arcos if arcos is None else arcos
+        objetos = {}
+        for nome, features in self.camadas.items():
+            geometrias = []
+            for f, feature in enumerate(features):
+                poligonos = self.referencias[nome][f]
+                if not poligonos:
+                    continue
+                if len(poligonos) == 1:
+                    geometrias.append({"type": "Polygon", "arcs": poligonos[0],
+                                       "properties": feature["properties"]})
+                else:
+                    geometrias.append({"type": "MultiPolygon", "arcs": poligonos,
+                                       "properties": feature["properties"]})
+            objetos[nome] = {"type": "GeometryCollection", "geometries": geometrias}
+        return {
+            "type": "Topology",
+            "bbox": self.caixa,
+            "transform": {"scale": self.escala.tolist(), "translate": self.translacao.tolist()},
+            "objects": objetos,
+            "arcs": [np.concatenate([arco[:1], np.diff(arco, axis=0)]).tolist() for arco in arcos],
+        }
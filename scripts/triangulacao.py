@@ -0,0 +1,194 @@
+"""
+Triangulação de Delaunay e Contorno Côncavo
+Implementação sem SciPy, usada pelo modo côncavo de gerar_poligonos.py.
+
+- delaunay: triangulação incremental (Bowyer–Watson). Os pontos são
+  inseridos na ordem da curva de Hilbert, então a busca do triângulo que
+  contém cada novo ponto (caminhada a partir do último triângulo criado)
+  percorre poucos triângulos: custo esperado O(n log n).
+- contorno_concavo: χ-shape (Duckham et al., 2008). Parte da triangulação
+  (convex hull) e remove, da maior para a menor, as arestas do contorno mais
+  longas que um limite, sempre mantendo um único polígono simples que contém
+  todos os pontos. Custo O(n log n) com um heap.
+"""
+
+import heapq
+
+import numpy as np
+
+from indice_espacial import indice_hilbert
+
+# Distância (relativa à extensão dos pontos) dos vértices do supertriângulo
+SUPERTRIANGULO = 1e4
+
+
+def _orientacao(ax, ay, bx, by, cx, cy):
+    """> 0 se a, b, c estão em ordem anti-horária."""
+    return (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+
+
+def _no_circuncirculo(ax, ay, bx, by, cx, cy, px, py):
+    """> 0 se p está dentro do circuncírculo do triângulo anti-horário abc."""
+    adx, ady = ax - px, ay - py
+    bdx, bdy = bx - px, by - py
+    cdx, cdy = cx - px, cy - py
+    ad = adx * adx + ady * ady
+    bd = bdx * bdx + bdy * bdy
+    cd = cdx * cdx + cdy * cdy
+    return (adx * (bdy * cd - bd * cdy)
+            - ady * (bdx * cd - bd * cdx)
+            + ad * (bdx * cdy - bdy * cdx))
+
+
+def delaunay(x, y):
+    """
+    Triangulação de Delaunay dos pontos (x, y), que devem ser distintos.
+
+    Retorna (triangulos, vizinhos): arrays (m, 3) com os vértices de cada
+    triângulo em ordem anti-horária e, em vizinhos[t, i], o triângulo do outro
+    lado da aresta oposta ao vértice i (-1 no contorno). Pontos todos
+    colineares não formam triângulos (m = 0).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    vazio = np.empty((0, 3), dtype=np.int64)
+    if n < 3:
+        return vazio, vazio
+
+    # Normaliza para [0, 1] (estabilidade numérica) e acrescenta um
+    # supertriângulo distante que contém todos os pontos
+    x0, y0 = x.min(), y.min()
+    escala = max(x.max() - x0, y.max() - y0) or 1.0
+    m = SUPERTRIANGULO
+    px = ((x - x0) / escala).tolist() + [-m, m, 0.5]
+    py = ((y - y0) / escala).tolist() + [-m, -m, m]
+
+    tv = [[n, n + 1, n + 2]]  # vértices de cada triângulo
+    tn = [[-1, -1, -1]]       # vizinho oposto a cada vértice
+    vivo = [True]
+    ultimo = 0
+
+    for p in np.argsort(indice_hilbert(x, y), kind="stable").tolist():
+        xp, yp = px[p], py[p]
+
+        # Caminhada até o triângulo que contém p
+        t = ultimo
+        while True:
+            a, b, c = tv[t]
+            if _orientacao(px[b], py[b], px[c], py[c], xp, yp) < 0:
+                t = tn[t][0]
+            elif _orientacao(px[c], py[c], px[a], py[a], xp, yp) < 0:
+                t = tn[t][1]
+            elif _orientacao(px[a], py[a], px[b], py[b], xp, yp) < 0:
+                t = tn[t][2]
+            else:
+                break
+
+        # Cavidade: triângulos conectados cujo circuncírculo contém p
+        ruins = {t}
+        pilha = [t]
+        while pilha:
+            u = pilha.pop()
+            for w in tn[u]:
+                if w < 0 or w in ruins:
+                    continue
+                a, b, c = tv[w]
+                if _no_circuncirculo(px[a], py[a], px[b], py[b], px[c], py[c], xp, yp) > 0:
+                    ruins.add(w)
+                    pilha.append(w)
+
+        # Liga p a cada aresta da borda da cavidade
+        inicio, fim, novos = {}, {}, []
+        for u in ruins:
+            vivo[u] = False
+            for i in range(3):
+                w = tn[u][i]
+                if w in ruins:
+                    continue
+                va, vb = tv[u][(i + 1) % 3], tv[u][(i + 2) % 3]
+                k = len(tv)
+                tv.append([va, vb, p])
+                tn.append([-1, -1, w])
+                vivo.append(True)
+                if w >= 0:
+                    tn[w][tn[w].index(u)] = k
+                inicio[va] = k
+                fim[vb] = k
+                novos.append(k)
+        for k in novos:
+            va, vb, _ = tv[k]
+            tn[k][0] = inicio[vb]
+            tn[k][1] = fim[va]
+        ultimo = novos[-1]
+
+    # Descarta os triângulos mortos e os que usam o supertriângulo
+    tv = np.array(tv, dtype=np.int64)
+    tn = np.array(tn, dtype=np.int64)
+    manter = np.array(vivo) & (tv < n).all(axis=1)
+    novo_indice = np.full(len(tv) + 1, -1, dtype=np.int64)
+    novo_indice[np.flatnonzero(manter)] = np.arange(manter.sum())
+    return tv[manter], novo_indice[tn[manter]]
+
+
+def contorno_concavo(x, y, comprimento_max):
+    """
+    Contorno côncavo (χ-shape) dos pontos distintos (x, y): arestas do
+    contorno mais longas que `comprimento_max` (mesma unidade de x, y) são
+    removidas enquanto o polígono continuar simples e contendo todos os pontos.
+    Com comprimento_max infinito, o resultado é o convex hull.
+
+    Retorna os índices dos vértices do anel em ordem anti-horária (sem repetir
+    o primeiro), ou None se os pontos não formam triângulos (colineares).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    triangulos, vizinhos = delaunay(x, y)
+    if len(triangulos) == 0:
+        return None
+    tri = triangulos.tolist()
+    viz = vizinhos.tolist()
+    vivo = [True] * len(tri)
+
+    def aresta(t, i):
+        a, b = tri[t][(i + 1) % 3], tri[t][(i + 2) % 3]
+        return -float(np.hypot(x[a] - x[b], y[a] - y[b])), t, i
+
+    na_borda = np.zeros(len(x), dtype=bool)
+    heap = []
+    for t, i in zip(*np.nonzero(vizinhos < 0)):
+        na_borda[triangulos[t, (i + 1) % 3]] = True
+        heap.append(aresta(int(t), int(i)))
+    heapq.heapify(heap)
+
+    # Remove o triângulo atrás da aresta de contorno mais longa, desde que o
+    # vértice oposto ainda seja interior (senão o polígono deixaria de ser simples)
+    while heap and -heap[0][0] > comprimento_max:
+        _, t, i = heapq.heappop(heap)
+        c = tri[t][i]
+        if not vivo[t] or na_borda[c]:
+            continue
+        vivo[t] = False
+        na_borda[c] = True
+        for j in ((i + 1) % 3, (i + 2) % 3):
+            w = viz[t][j]
+            heapq.heappush(heap, aresta(w, viz[w].index(t)))
+
+    # Percorre o contorno: cada aresta (a, b) de um triângulo vivo sem vizinho
+    # vivo, na orientação do triângulo, deixa o interior à esquerda
+    proximo = {}
+    for t in range(len(tri)):
+        if not vivo[t]:
+            continue
+        for i in range(3):
+            w = viz[t][i]
+            if w < 0 or not vivo[w]:
+                proximo[tri[t][(i + 1) % 3]] = tri[t][(i + 2) % 3]
+
+    primeiro = min(proximo, key=lambda v: (x[v], y[v]))
+    anel = [primeiro]
+    v = proximo[primeiro]
+    while v != primeiro:
+        anel.append(v)
+        v = proximo[v]
+    return np.array(anel, dtype=np.int64)
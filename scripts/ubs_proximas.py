@@ -0,0 +1,186 @@
+"""
+UBS Mais Próximas de Cada Endereço
+Para cada endereço geocodificado do CSV consolidado, encontra as k UBS mais
+próximas em linha reta (registro de registro_ubs.py) e sinaliza os
+endereços atribuídos a uma UBS que não está entre elas.
+
+As UBS ficam em uma árvore k-d (indice_espacial.ArvoreKD) em um plano local
+em km, e todos os endereços são consultados de uma vez, em lote; as
+distâncias informadas são ortodrômicas (haversine). Status por endereço:
+ok, fora_k (UBS atribuída não está entre as k mais próximas),
+ubs_sem_coordenada (UBS atribuída fora do registro ou sem coordenada) ou
+sem_coordenada.
+
+Saídas:
+- dados/ubs_proximas.csv: o CSV consolidado com as colunas ubs_mais_proxima,
+  distancia_mais_proxima_km, ubs_proximas, distancia_atribuida_km,
+  posicao_atribuida, excesso_km e status
+- dados/relatorios/ubs_proximas.json/.html: registro das UBS, resumo e ocorrências
+
+Uso:
+    python ubs_proximas.py [--k 3]
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from geometria import KM_POR_GRAU_LAT, km_por_grau_lon
+from indice_espacial import ArvoreKD
+from metricas_poligonos import distancia_km
+from registro_ubs import carregar_registro, posicoes_ubs
+from relatorio import Cronometro, agora_iso, registros, salvar_relatorio
+
+# Diretórios
+BASE_DIR = Path(__file__).parent.parent
+DADOS_DIR = BASE_DIR / "dados"
+
+SAIDA_CSV = DADOS_DIR / "ubs_proximas.csv"
+
+K_PADRAO = 3
+
+COLUNAS_OCORRENCIA = ['ubs_referencia', 'micro_area', 'endereco_completo', 'latitude', 'longitude',
+                      'ubs_mais_proxima', 'distancia_mais_proxima_km', 'distancia_atribuida_km', 'excesso_km']
+
+
+def plano_km(lon, lat, lat_referencia):
+    """Projeção equiretangular local (km) em torno de `lat_referencia`."""
+    return (np.asarray(lon, dtype=float) * km_por_grau_lon(lat_referencia),
+            np.asarray(lat, dtype=float) * KM_POR_GRAU_LAT)
+
+
+def ubs_proximas(df, registro, k=K_PADRAO):
+    """
+    Retorna (df com as colunas de proximidade, relatório). `registro` é o
+    DataFrame de registro_ubs.carregar_registro.
+    """
+    cron = Cronometro()
+    com_coordenada = registro['latitude'].notna() & registro['longitude'].notna()
+    ubs = registro[com_coordenada].reset_index(drop=True)
+    k = min(k, len(ubs))
+    nomes = ubs['ubs_referencia'].to_numpy(dtype=object)
+    lat_referencia = float(ubs['latitude'].mean())
+
+    with cron.etapa("indice"):
+        arvore = ArvoreKD(*plano_km(ubs['longitude'], ubs['latitude'], lat_referencia))
+
+    with cron.etapa("consulta"):
+        validos = (df['latitude'].notna() & df['longitude'].notna()).to_numpy()
+        lon, lat = df['longitude'].to_numpy(dtype=float), df['latitude'].to_numpy(dtype=float)
+        vizinhos = np.full((len(df), k), -1, dtype=np.int64)
+        vizinhos[validos], _ = arvore.vizinhos(*plano_km(lon[validos], lat[validos], lat_referencia), k)
+
+    with cron.etapa("classificacao"):
+        atribuida = posicoes_ubs(ubs, df['ubs_referencia'])
+        tem_vizinho = vizinhos >= 0
+        distancias = np.where(tem_vizinho, distancia_km(
+            lon[:, None], lat[:, None],
+            ubs['longitude'].to_numpy()[vizinhos], ubs['latitude'].to_numpy()[vizinhos]), np.nan)
+        # Reordena pela distância ortodrômica (o plano local pode inverter quase empates)
+        ordem = np.argsort(np.where(tem_vizinho, distancias, np.inf), axis=1, kind="stable")
+        vizinhos = np.take_along_axis(vizinhos, ordem, axis=1)
+        distancias = np.take_along_axis(distancias, ordem, axis=1)
+        atribuida_valida = validos & (atribuida >= 0)
+        distancia_atribuida = np.where(atribuida_valida, distancia_km(
+            lon, lat, ubs['longitude'].to_numpy()[atribuida], ubs['latitude'].to_numpy()[atribuida]), np.nan)
+
+        # Posição (1..k) da UBS atribuída entre as k mais próximas, 0 se não está
+        acerto = (vizinhos == atribuida[:, None]) & tem_vizinho
+        posicao = np.where(acerto.any(axis=1), acerto.argmax(axis=1) + 1, 0)
+
+        resultado = df.copy()
+        resultado['ubs_mais_proxima'] = np.where(validos, nomes[vizinhos[:, 0]], None)
+        resultado['distancia_mais_proxima_km'] = distancias[:, 0].round(3)
+        rotulos = [pd.Series(nomes[vizinhos[:, j]]) + " (" + pd.Series(distancias[:, j]).round(2).astype(str)
+                   + " km)" for j in range(k)]
+        proximas = rotulos[0]
+        for rotulo in rotulos[1:]:
+            proximas = proximas + "; " + rotulo
+        resultado['ubs_proximas'] = proximas.where(validos, "").to_numpy()
+        resultado['distancia_atribuida_km'] = distancia_atribuida.round(3)
+        resultado['posicao_atribuida'] = np.where(atribuida_valida, posicao, np.nan)
+        resultado['excesso_km'] = (distancia_atribuida - distancias[:, 0]).round(3)
+
+        status = np.where(posicao > 0, "ok", "fora_k")
+        status = np.where(atribuida >= 0, status, "ubs_sem_coordenada")
+        status = np.where(validos, status, "sem_coordenada")
+        resultado['status'] = status
+
+    contagem = resultado['status'].value_counts()
+    fora = resultado[resultado['status'] == "fora_k"].sort_values('excesso_km', ascending=False)
+    por_ubs = (
+        resultado[validos]
+        .assign(fora_k=lambda d: d['status'] == "fora_k",
+                mais_proxima=lambda d: d['posicao_atribuida'] == 1)
+        .groupby('ubs_referencia', sort=False)
+        .agg(enderecos=('status', 'size'),
+             mais_proxima=('mais_proxima', 'sum'),
+             fora_k=('fora_k', 'sum'),
+             distancia_media_km=('distancia_atribuida_km', 'mean'),
+             distancia_max_km=('distancia_atribuida_km', 'max'))
+        .round(3)
+        .reset_index()
+    )
+
+    relatorio = {
+        "relatorio": "ubs_proximas",
+        "titulo": "UBS Mais Próximas de Cada Endereço",
+        "gerado_em": agora_iso(),
+        "entrada": "dados/UBS_Ruas_Coordenadas_Consolidado.csv, dados/UBS_Ruas - *.csv",
+        "parametros": {"k": k},
+        "problemas": int(len(fora)),
+        "contagens": {
+            "enderecos": int(len(resultado)),
+            "ubs": int(len(registro)),
+            "ubs_com_coordenada": int(len(ubs)),
+            **{s: int(contagem.get(s, 0)) for s in ("ok", "fora_k", "ubs_sem_coordenada", "sem_coordenada")},
+            "na_mais_proxima": int((resultado['posicao_atribuida'] == 1).sum()),
+        },
+        "ubs": registros(registro, ['ubs_referencia', 'latitude', 'longitude', 'origem', 'localizacao_ubs']),
+        "por_ubs": registros(por_ubs),
+        "tempos_s": cron.tempos,
+        "ocorrencias": {
+            "fora_k": registros(fora, COLUNAS_OCORRENCIA),
+        },
+    }
+    return resultado, relatorio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UBS mais próximas de cada endereço (árvore k-d)")
+    parser.add_argument("--k", type=int, default=K_PADRAO,
+                        help=f"Quantas UBS mais próximas considerar (padrão: {K_PADRAO})")
+    args = parser.parse_args()
+
+    df = pd.read_csv(DADOS_DIR / "UBS_Ruas_Coordenadas_Consolidado.csv")
+    registro = carregar_registro()
+
+    resultado, relatorio = ubs_proximas(df, registro, args.k)
+    resultado.to_csv(SAIDA_CSV, index=False, encoding='utf-8-sig')
+    caminho_json, caminho_html = salvar_relatorio(relatorio, 'ubs_proximas')
+
+    c = relatorio['contagens']
+    k = relatorio['parametros']['k']
+    print("=" * 70)
+    print("UBS MAIS PRÓXIMAS DE CADA ENDEREÇO")
+    print("=" * 70)
+    print(f"\nUBS no registro: {c['ubs']} ({c['ubs_com_coordenada']} com coordenada)")
+    sem = [u['ubs_referencia'] for u in relatorio['ubs'] if u['latitude'] is None]
+    if sem:
+        print(f"   ⚠️  Sem coordenada: {', '.join(sem)}")
+    print(f"\nEndereços: {c['enderecos']}")
+    print(f"   ✅ UBS atribuída entre as {k} mais próximas: {c['ok']}"
+          f" ({c['na_mais_proxima']} na mais próxima)")
+    print(f"   ❌ UBS atribuída fora das {k} mais próximas: {c['fora_k']}")
+    if c['ubs_sem_coordenada'] or c['sem_coordenada']:
+        print(f"   - UBS sem coordenada: {c['ubs_sem_coordenada']} | Sem coordenada: {c['sem_coordenada']}")
+
+    print(f"\n📁 Resultado por endereço: {SAIDA_CSV}")
+    print(f"📁 Relatório JSON: {caminho_json}")
+    print(f"📁 Relatório HTML: {caminho_html}")
+
+
+if __name__ == "__main__":
+    main()
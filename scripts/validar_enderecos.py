@@ -0,0 +1,159 @@
+"""
+Validação dos Endereços contra os Polígonos das Microáreas
+Verifica, para cada endereço geocodificado do CSV consolidado, se o ponto
+cai dentro do polígono da sua própria microárea e em quais outras
+microáreas (inclusive de outras UBS) ele também cai.
+
+Junção espacial em lote (sobreposicao.juncao_pontos): caixas dos polígonos
+em uma R-tree para pré-filtrar, depois ray casting vetorizado só nos pares
+candidatos.
+
+Saídas:
+- dados/validacao_enderecos.csv: o CSV consolidado com as colunas
+  dentro_propria, tambem_dentro, outra_ubs e status
+- dados/relatorios/validacao_enderecos.json/.html: resumo e ocorrências
+
+Uso:
+    python validar_enderecos.py
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from relatorio import Cronometro, agora_iso, registros, salvar_relatorio
+from saida_geojson import carregar_geojson
+from sobreposicao import juncao_pontos
+
+# Diretórios
+BASE_DIR = Path(__file__).parent.parent
+DADOS_DIR = BASE_DIR / "dados"
+
+SAIDA_CSV = DADOS_DIR / "validacao_enderecos.csv"
+
+COLUNAS_OCORRENCIA = ['ubs_referencia', 'micro_area', 'endereco_completo', 'latitude', 'longitude',
+                      'tambem_dentro', 'status']
+
+
+def validar(df, microareas):
+    """
+    Retorna (df com as colunas de validação, relatório). Status por endereço:
+    ok, tambem_em_outra, fora_da_propria, sem_poligono ou sem_coordenada.
+    """
+    cron = Cronometro()
+    features = microareas["features"]
+    chaves = pd.MultiIndex.from_tuples(
+        [(f["properties"]["ubs_referencia"], int(f["properties"]["micro_area"])) for f in features],
+        names=["ubs_referencia", "micro_area"],
+    )
+    nomes = np.array([f"{ubs} - Microárea {micro}" for ubs, micro in chaves] + [""], dtype=object)
+    ubs_poligono = chaves.get_level_values(0).to_numpy()
+
+    with cron.etapa("juncao"):
+        validos = df['latitude'].notna() & df['longitude'].notna()
+        pos_validos = np.flatnonzero(validos.to_numpy())
+        ponto, poligono = juncao_pontos(
+            df['longitude'].to_numpy()[pos_validos], df['latitude'].to_numpy()[pos_validos],
+            [f["geometry"] for f in features],
+        )
+        ponto = pos_validos[ponto]
+
+    with cron.etapa("classificacao"):
+        micro = pd.to_numeric(df['micro_area'], errors='coerce')
+        propria = chaves.get_indexer(pd.MultiIndex.from_arrays(
+            [df['ubs_referencia'], micro.fillna(-1).astype(int)]
+        ))
+
+        na_propria = poligono == propria[ponto]
+        dentro_propria = np.zeros(len(df), dtype=bool)
+        dentro_propria[ponto[na_propria]] = True
+
+        # Outras microáreas que contêm cada ponto (e se alguma é de outra UBS)
+        ordem = np.lexsort((poligono[~na_propria], ponto[~na_propria]))
+        o_ponto, o_poligono = ponto[~na_propria][ordem], poligono[~na_propria][ordem]
+        outras = pd.DataFrame({
+            "nome": nomes[o_poligono],
+            "outra_ubs": ubs_poligono[o_poligono] != df['ubs_referencia'].to_numpy()[o_ponto],
+        })
+        por_ponto = outras.groupby(o_ponto, sort=False)
+        tambem = por_ponto["nome"].agg("; ".join)
+        outra_ubs = por_ponto["outra_ubs"].any()
+
+        resultado = df.copy()
+        resultado['dentro_propria'] = dentro_propria
+        resultado['tambem_dentro'] = pd.Series(tambem.reindex(np.arange(len(df))).to_numpy(),
+                                               index=df.index).fillna("")
+        resultado['outra_ubs'] = outra_ubs.reindex(np.arange(len(df)), fill_value=False).to_numpy()
+
+        status = np.where(resultado['tambem_dentro'].to_numpy() != "", "tambem_em_outra", "ok")
+        status = np.where(dentro_propria, status, "fora_da_propria")
+        status = np.where(propria < 0, "sem_poligono", status)
+        status = np.where(validos.to_numpy(), status, "sem_coordenada")
+        resultado['status'] = status
+
+    contagem = resultado['status'].value_counts()
+    fora = resultado[resultado['status'] == "fora_da_propria"]
+    em_outra_ubs = resultado[resultado['outra_ubs']]
+    por_microarea = (
+        resultado.assign(fora_da_propria=resultado['status'] == "fora_da_propria",
+                         tambem_em_outra=resultado['status'] == "tambem_em_outra")
+        .groupby(['ubs_referencia', 'micro_area'], sort=False)
+        .agg(enderecos=('status', 'size'),
+             dentro_propria=('dentro_propria', 'sum'),
+             fora_da_propria=('fora_da_propria', 'sum'),
+             tambem_em_outra=('tambem_em_outra', 'sum'))
+        .reset_index()
+    )
+
+    relatorio = {
+        "relatorio": "validacao_enderecos",
+        "titulo": "Validação dos Endereços contra as Microáreas",
+        "gerado_em": agora_iso(),
+        "entrada": "dados/UBS_Ruas_Coordenadas_Consolidado.csv, dados/microareas_ubs.geojson",
+        "parametros": {},
+        "problemas": int(len(fora) + len(em_outra_ubs)),
+        "contagens": {
+            "enderecos": int(len(resultado)),
+            "poligonos": int(len(features)),
+            **{s: int(contagem.get(s, 0)) for s in
+               ("ok", "tambem_em_outra", "fora_da_propria", "sem_poligono", "sem_coordenada")},
+            "em_outra_ubs": int(len(em_outra_ubs)),
+        },
+        "por_microarea": registros(por_microarea),
+        "tempos_s": cron.tempos,
+        "ocorrencias": {
+            "fora_da_propria": registros(fora, COLUNAS_OCORRENCIA),
+            "em_outra_ubs": registros(em_outra_ubs, COLUNAS_OCORRENCIA),
+        },
+    }
+    return resultado, relatorio
+
+
+def main():
+    df = pd.read_csv(DADOS_DIR / "UBS_Ruas_Coordenadas_Consolidado.csv")
+    microareas = carregar_geojson(DADOS_DIR / "microareas_ubs.geojson")
+
+    resultado, relatorio = validar(df, microareas)
+    resultado.to_csv(SAIDA_CSV, index=False, encoding='utf-8-sig')
+    caminho_json, caminho_html = salvar_relatorio(relatorio, 'validacao_enderecos')
+
+    c = relatorio['contagens']
+    print("=" * 70)
+    print("VALIDAÇÃO DOS ENDEREÇOS CONTRA AS MICROÁREAS")
+    print("=" * 70)
+    print(f"\nEndereços: {c['enderecos']} | Polígonos: {c['poligonos']}")
+    print(f"   ✅ Dentro da própria microárea: {c['ok'] + c['tambem_em_outra']}"
+          f" ({c['tambem_em_outra']} também em outra)")
+    print(f"   ❌ Fora da própria microárea: {c['fora_da_propria']}")
+    print(f"   ⚠️  Dentro de microárea de outra UBS: {c['em_outra_ubs']}")
+    if c['sem_poligono'] or c['sem_coordenada']:
+        print(f"   - Sem polígono: {c['sem_poligono']} | Sem coordenada: {c['sem_coordenada']}")
+
+    print(f"\n📁 Resultado por endereço: {SAIDA_CSV}")
+    print(f"📁 Relatório JSON: {caminho_json}")
+    print(f"📁 Relatório HTML: {caminho_html}")
+
+
+if __name__ == "__main__":
+    main()
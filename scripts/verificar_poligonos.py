@@ -1,209 +1,253 @@
 """
 Verificação dos Polígonos GeoJSON
-Analisa se os polígonos gerados fazem sentido geográfico
+Analisa se os polígonos gerados fazem sentido geográfico e se as
+microáreas se sobrepõem (com os endereços que caem nas zonas disputadas)
+
+Gera um relatório estruturado em dados/relatorios/verificacao_poligonos.json
+(comparável entre execuções) e uma página HTML com os detalhes; o terminal
+mostra apenas o resumo.
+
+Uso:
+    python verificar_poligonos.py [--tolerancia-adjacencia-m 50]
 """
 
-import json
+import argparse
 from pathlib import Path
 import math
 
-def calcular_area_km2(coords):
+import pandas as pd
+
+from geometria import BBOX_NSS
+from metricas_poligonos import distancia_km, metricas, propriedades_metricas
+from relatorio import Cronometro, agora_iso, registros, salvar_relatorio
+from saida_geojson import carregar_geojson
+from sobreposicao import analisar_pares, juncao_pontos
+
+TOLERANCIA_ADJACENCIA_M = 50  # contornos a até essa distância = microáreas vizinhas
+
+COLUNAS_ENDERECO = ["ubs_referencia", "micro_area", "endereco_completo",
+                    "latitude", "longitude", "dentro_de"]
+
+
+def _pontos_ubs(features, ubs_pontos):
+    """Arrays (lon, lat) do ponto da UBS de cada feature (NaN se desconhecido)."""
+    pontos = {f["properties"]["ubs_referencia"]: f["geometry"]["coordinates"]
+              for f in (ubs_pontos or {}).get("features", [])}
+    coords = [pontos.get(f["properties"]["ubs_referencia"], (math.nan, math.nan)) for f in features]
+    return [c[0] for c in coords], [c[1] for c in coords]
+
+
+def verificar_sobreposicoes(microareas, enderecos, tolerancia_km):
+    """
+    Pares de microáreas sobrepostas ou vizinhas e endereços que caem em mais
+    de uma microárea. Retorna (sobreposicoes, adjacencias, em_disputa).
+    """
+    features = microareas["features"]
+    geometrias = [f["geometry"] for f in features]
+    nomes = [f"{f['properties']['ubs_referencia']} - Microárea {f['properties']['micro_area']}"
+             for f in features]
+    
+    # Endereços dentro de mais de uma microárea
+    em_disputa = pd.DataFrame()
+    contidos = {}
+    if enderecos is not None and len(enderecos):
+        idx_ponto, idx_geom = juncao_pontos(enderecos["longitude"], enderecos["latitude"], geometrias)
+        juncao = pd.DataFrame({"ponto": idx_ponto, "geom": idx_geom})
+        contidos = juncao.groupby("geom")["ponto"].apply(set).to_dict()
+        por_ponto = juncao.groupby("ponto")["geom"].apply(sorted)
+        por_ponto = por_ponto[por_ponto.str.len() > 1]
+        em_disputa = enderecos.iloc[por_ponto.index].assign(
+            dentro_de=["; ".join(nomes[g] for g in gs) for gs in por_ponto]
+        )
+    
+    sobreposicoes, adjacencias = [], []
+    for par in analisar_pares(geometrias, tolerancia_km):
+        a, b = nomes[par["i"]], nomes[par["j"]]
+        if par["area_km2"] > 0:
+            disputados = contidos.get(par["i"], set()) & contidos.get(par["j"], set())
+            sobreposicoes.append({
+                "microarea_a": a,
+                "microarea_b": b,
+                "area_km2": round(par["area_km2"], 4),
+                "enderecos_em_disputa": len(disputados),
+            })
+        else:
+            adjacencias.append({
+                "microarea_a": a,
+                "microarea_b": b,
+                "distancia_m": round(par["distancia_km"] * 1000, 1),
+            })
+    return sobreposicoes, adjacencias, em_disputa
+
+
+def verificar(microareas, ubs_areas, enderecos=None, tolerancia_km=TOLERANCIA_ADJACENCIA_M / 1000,
+              ubs_pontos=None):
     """
-    Calcula a área aproximada de um polígono em km² usando a fórmula de Shoelace.
-    Considera conversão aproximada de graus para km na latitude de NSS (~10.85°S).
+    Executa as verificações sobre os GeoJSON e retorna o relatório (dict).
+    `enderecos` (DataFrame com latitude/longitude) é usado para listar os
+    endereços nas zonas de sobreposição; `ubs_pontos` (GeoJSON dos pontos
+    das UBS), para a distância de cada polígono até a sua UBS.
     """
-    # Fator de conversão: 1 grau de latitude ≈ 111 km, longitude varia com latitude
-    lat_media = -10.85
-    km_por_grau_lat = 111.0
-    km_por_grau_lon = 111.0 * math.cos(math.radians(lat_media))
-    
-    # Converter coordenadas para km
-    coords_km = []
-    for lon, lat in coords:
-        x = lon * km_por_grau_lon
-        y = lat * km_por_grau_lat
-        coords_km.append((x, y))
-    
-    # Fórmula de Shoelace para área
-    n = len(coords_km)
-    area = 0.0
-    for i in range(n):
-        j = (i + 1) % n
-        area += coords_km[i][0] * coords_km[j][1]
-        area -= coords_km[j][0] * coords_km[i][1]
-    return abs(area) / 2.0
-
-def calcular_centroide(coords):
-    """Calcula o centróide de um polígono"""
-    n = len(coords)
-    sum_lon = sum(c[0] for c in coords)
-    sum_lat = sum(c[1] for c in coords)
-    return (sum_lon / n, sum_lat / n)
-
-def calcular_extensao(coords):
-    """Calcula a extensão (bounding box) do polígono"""
-    lons = [c[0] for c in coords]
-    lats = [c[1] for c in coords]
+    cron = Cronometro()
+    problemas = []
+    
+    # Microáreas
+    por_microarea = []
+    with cron.etapa("microareas"):
+        features = microareas["features"]
+        tabela = metricas([f["geometry"] for f in features], *_pontos_ubs(features, ubs_pontos))
+        for feature, m in zip(features, tabela.to_dict("records")):
+            props = feature["properties"]
+            ubs = props["ubs_referencia"]
+            micro = props["micro_area"]
+            
+            alertas = []
+            
+            # 1. Verificar se está dentro da bounding box de NSS
+            if (m["lat_min"] < BBOX_NSS["lat_min"] or 
+                m["lat_max"] > BBOX_NSS["lat_max"] or
+                m["lon_min"] < BBOX_NSS["lon_min"] or 
+                m["lon_max"] > BBOX_NSS["lon_max"]):
+                alertas.append("fora da bbox")
+            
+            # 2. Verificar área razoável (microárea típica: 0.1 a 10 km²)
+            if m["area_km2"] < 0.01:
+                alertas.append("área muito pequena")
+            elif m["area_km2"] > 50:
+                alertas.append("área muito grande")
+            
+            # 3. Verificar extensão razoável (não deve ultrapassar 15 km)
+            if m["largura_km"] > 15 or m["altura_km"] > 15:
+                alertas.append("extensão exagerada")
+            
+            problemas.extend(f"{ubs} - Microárea {micro}: {a}" for a in alertas)
+            por_microarea.append({
+                "ubs_referencia": ubs,
+                "micro_area": micro,
+                **propriedades_metricas(m),
+                "largura_km": round(m["largura_km"], 3),
+                "altura_km": round(m["altura_km"], 3),
+                "vertices": int(m["vertices"]),
+                "alertas": alertas,
+            })
+    
+    # Áreas agregadas por UBS
+    por_ubs = []
+    centroides_ubs = {}
+    with cron.etapa("ubs_areas"):
+        features = ubs_areas["features"]
+        tabela = metricas([f["geometry"] for f in features], *_pontos_ubs(features, ubs_pontos))
+        for feature, m in zip(features, tabela.to_dict("records")):
+            props = feature["properties"]
+            ubs = props["ubs_referencia"]
+            centroides_ubs[ubs] = (m["centroide_lon"], m["centroide_lat"])
+            por_ubs.append({
+                "ubs_referencia": ubs,
+                **propriedades_metricas(m),
+                "largura_km": round(m["largura_km"], 3),
+                "altura_km": round(m["altura_km"], 3),
+                "num_microareas": props.get("num_microareas"),
+            })
+    
+    # Sobreposição e adjacência entre microáreas
+    with cron.etapa("sobreposicoes"):
+        sobreposicoes, adjacencias, em_disputa = verificar_sobreposicoes(
+            microareas, enderecos, tolerancia_km
+        )
+    areas = {f"{m['ubs_referencia']} - Microárea {m['micro_area']}": m["area_km2"] for m in por_microarea}
+    for s in sobreposicoes:
+        for lado in ("a", "b"):
+            area = areas[s[f"microarea_{lado}"]]
+            s[f"percentual_{lado}"] = round(100 * s["area_km2"] / area, 1) if area else None
+        problemas.append(f"{s['microarea_a']} × {s['microarea_b']}: sobreposição de "
+                         f"{s['area_km2']:.4f} km² ({s['enderecos_em_disputa']} endereços em disputa)")
+    
+    # Distância entre as duas UBS
+    distancia_ubs = None
+    if len(centroides_ubs) == 2:
+        ubs_list = list(centroides_ubs.keys())
+        distancia_ubs = float(distancia_km(*centroides_ubs[ubs_list[0]], *centroides_ubs[ubs_list[1]]))
+        if distancia_ubs < 0.5:
+            problemas.append("UBS estão muito próximas")
+        elif distancia_ubs > 20:
+            problemas.append("UBS estão muito distantes")
+    
     return {
-        "lon_min": min(lons),
-        "lon_max": max(lons),
-        "lat_min": min(lats),
-        "lat_max": max(lats)
+        "relatorio": "verificacao_poligonos",
+        "titulo": "Verificação dos Polígonos Gerados",
+        "gerado_em": agora_iso(),
+        "entrada": "dados/microareas_ubs.geojson, dados/ubs_areas.geojson",
+        "parametros": {"bbox": BBOX_NSS, "tolerancia_adjacencia_m": round(tolerancia_km * 1000, 3)},
+        "problemas": len(problemas),
+        "contagens": {
+            "microareas": len(por_microarea),
+            "microareas_com_alerta": sum(1 for m in por_microarea if m["alertas"]),
+            "ubs": len(por_ubs),
+            "distancia_centroides_ubs_km": None if distancia_ubs is None else round(distancia_ubs, 3),
+            "sobreposicoes": len(sobreposicoes),
+            "adjacencias": len(adjacencias),
+            "enderecos_em_disputa": len(em_disputa),
+        },
+        "por_ubs": por_ubs,
+        "por_microarea": por_microarea,
+        "tempos_s": cron.tempos,
+        "ocorrencias": {
+            "problemas": [{"problema": p} for p in problemas],
+            "sobreposicoes": sobreposicoes,
+            "adjacencias": adjacencias,
+            "enderecos_em_disputa": registros(em_disputa, COLUNAS_ENDERECO) if len(em_disputa) else [],
+        },
     }
 
-def distancia_km(p1, p2):
-    """Calcula distância aproximada em km entre dois pontos"""
-    lat_media = -10.85
-    km_por_grau_lat = 111.0
-    km_por_grau_lon = 111.0 * math.cos(math.radians(lat_media))
-    
-    dlat = (p2[1] - p1[1]) * km_por_grau_lat
-    dlon = (p2[0] - p1[0]) * km_por_grau_lon
-    return math.sqrt(dlat**2 + dlon**2)
 
 def main():
+    parser = argparse.ArgumentParser(description="Verifica os polígonos gerados")
+    parser.add_argument("--tolerancia-adjacencia-m", type=float, default=TOLERANCIA_ADJACENCIA_M,
+                        help="distância máxima entre contornos de microáreas vizinhas (padrão: %(default)s)")
+    args = parser.parse_args()
+    
     base_dir = Path(__file__).parent.parent
     dados_dir = base_dir / "dados"
     
     # Carregar GeoJSON de microáreas
-    with open(dados_dir / "microareas_ubs.geojson", "r", encoding="utf-8") as f:
-        microareas = json.load(f)
+    microareas = carregar_geojson(dados_dir / "microareas_ubs.geojson")
     
     # Carregar GeoJSON de UBS
-    with open(dados_dir / "ubs_areas.geojson", "r", encoding="utf-8") as f:
-        ubs_areas = json.load(f)
-    
-    print("=" * 70)
-    print("VERIFICAÇÃO DOS POLÍGONOS GERADOS")
-    print("=" * 70)
-    
-    # Bounding box esperada de Nossa Senhora do Socorro
-    BBOX_NSS = {
-        "lat_min": -11.05, "lat_max": -10.75,
-        "lon_min": -37.25, "lon_max": -37.00
-    }
-    
-    print(f"\n📍 Bounding Box esperada de N. Sra. do Socorro:")
-    print(f"   Latitude:  {BBOX_NSS['lat_min']:.2f} a {BBOX_NSS['lat_max']:.2f}")
-    print(f"   Longitude: {BBOX_NSS['lon_min']:.2f} a {BBOX_NSS['lon_max']:.2f}")
-    
-    print("\n" + "-" * 70)
-    print("ANÁLISE DAS MICROÁREAS")
-    print("-" * 70)
-    
-    problemas = []
+    ubs_areas = carregar_geojson(dados_dir / "ubs_areas.geojson")
     
-    for feature in microareas["features"]:
-        props = feature["properties"]
-        coords = feature["geometry"]["coordinates"][0]
-        
-        ubs = props["ubs_referencia"]
-        micro = props["micro_area"]
-        
-        # Calcular métricas
-        area_km2 = calcular_area_km2(coords)
-        centroide = calcular_centroide(coords)
-        extensao = calcular_extensao(coords)
-        
-        # Largura e altura em km
-        lat_media = -10.85
-        km_por_grau_lon = 111.0 * math.cos(math.radians(lat_media))
-        largura_km = (extensao["lon_max"] - extensao["lon_min"]) * km_por_grau_lon
-        altura_km = (extensao["lat_max"] - extensao["lat_min"]) * 111.0
-        
-        print(f"\n🔷 {ubs} - Microárea {micro}")
-        print(f"   Área: {area_km2:.2f} km²")
-        print(f"   Dimensões: {largura_km:.2f} km x {altura_km:.2f} km")
-        print(f"   Centróide: ({centroide[0]:.5f}, {centroide[1]:.5f})")
-        print(f"   Vértices: {len(coords)}")
-        
-        # Verificações
-        alertas = []
-        
-        # 1. Verificar se está dentro da bounding box de NSS
-        if (extensao["lat_min"] < BBOX_NSS["lat_min"] or 
-            extensao["lat_max"] > BBOX_NSS["lat_max"] or
-            extensao["lon_min"] < BBOX_NSS["lon_min"] or 
-            extensao["lon_max"] > BBOX_NSS["lon_max"]):
-            alertas.append("⚠️  FORA da bounding box de N. Sra. do Socorro!")
-            problemas.append(f"{ubs} - Microárea {micro}: fora da bbox")
-        
-        # 2. Verificar área razoável (microárea típica: 0.1 a 10 km²)
-        if area_km2 < 0.01:
-            alertas.append("⚠️  Área muito pequena (< 0.01 km²)")
-            problemas.append(f"{ubs} - Microárea {micro}: área muito pequena")
-        elif area_km2 > 50:
-            alertas.append("⚠️  Área muito grande (> 50 km²)")
-            problemas.append(f"{ubs} - Microárea {micro}: área muito grande")
-        
-        # 3. Verificar extensão razoável (não deve ultrapassar 15 km)
-        if largura_km > 15 or altura_km > 15:
-            alertas.append(f"⚠️  Extensão muito grande: {max(largura_km, altura_km):.1f} km")
-            problemas.append(f"{ubs} - Microárea {micro}: extensão exagerada")
-        
-        if alertas:
-            for a in alertas:
-                print(f"   {a}")
-        else:
-            print(f"   ✅ Polígono dentro dos parâmetros esperados")
-    
-    print("\n" + "-" * 70)
-    print("ANÁLISE DAS ÁREAS AGREGADAS POR UBS")
-    print("-" * 70)
-    
-    centroides_ubs = {}
+    # Endereços geocodificados (para as zonas de sobreposição)
+    enderecos = pd.read_csv(dados_dir / "UBS_Ruas_Coordenadas_Consolidado.csv")
+    enderecos = enderecos[enderecos["latitude"].notna() & enderecos["longitude"].notna()]
     
-    for feature in ubs_areas["features"]:
-        props = feature["properties"]
-        coords = feature["geometry"]["coordinates"][0]
-        
-        ubs = props["ubs_referencia"]
-        
-        area_km2 = calcular_area_km2(coords)
-        centroide = calcular_centroide(coords)
-        centroides_ubs[ubs] = centroide
-        
-        extensao = calcular_extensao(coords)
-        lat_media = -10.85
-        km_por_grau_lon = 111.0 * math.cos(math.radians(lat_media))
-        largura_km = (extensao["lon_max"] - extensao["lon_min"]) * km_por_grau_lon
-        altura_km = (extensao["lat_max"] - extensao["lat_min"]) * 111.0
-        
-        print(f"\n🏥 {ubs}")
-        print(f"   Área total: {area_km2:.2f} km²")
-        print(f"   Dimensões: {largura_km:.2f} km x {altura_km:.2f} km")
-        print(f"   Centróide: ({centroide[0]:.5f}, {centroide[1]:.5f})")
-        print(f"   Microáreas: {props['num_microareas']}")
+    # Pontos das UBS (para a distância de cada polígono até a sua UBS)
+    ubs_pontos_path = dados_dir / "ubs_pontos.geojson"
+    ubs_pontos = carregar_geojson(ubs_pontos_path) if ubs_pontos_path.exists() else None
     
-    # Distância entre as duas UBS
-    if len(centroides_ubs) == 2:
-        ubs_list = list(centroides_ubs.keys())
-        dist = distancia_km(centroides_ubs[ubs_list[0]], centroides_ubs[ubs_list[1]])
-        print(f"\n📏 Distância entre centróides das UBS: {dist:.2f} km")
-        
-        if dist < 0.5:
-            print("   ⚠️  UBS muito próximas - podem estar sobrepostas!")
-            problemas.append("UBS estão muito próximas")
-        elif dist > 20:
-            print("   ⚠️  UBS muito distantes - verificar se estão no mesmo município")
-            problemas.append("UBS estão muito distantes")
-        else:
-            print("   ✅ Distância parece razoável para UBS em bairros diferentes")
+    relatorio = verificar(microareas, ubs_areas, enderecos, args.tolerancia_adjacencia_m / 1000, ubs_pontos)
+    caminho_json, caminho_html = salvar_relatorio(relatorio, "verificacao_poligonos")
     
-    print("\n" + "=" * 70)
-    print("RESUMO DA VERIFICAÇÃO")
+    c = relatorio["contagens"]
+    print("=" * 70)
+    print("VERIFICAÇÃO DOS POLÍGONOS GERADOS")
     print("=" * 70)
+    print(f"\nMicroáreas: {c['microareas']} ({c['microareas_com_alerta']} com alerta) | UBS: {c['ubs']}")
+    print(f"🔀 Sobreposições: {c['sobreposicoes']} | Vizinhas: {c['adjacencias']} | "
+          f"Endereços em disputa: {c['enderecos_em_disputa']}")
+    if c["distancia_centroides_ubs_km"] is not None:
+        print(f"📏 Distância entre centróides das UBS: {c['distancia_centroides_ubs_km']:.2f} km")
     
+    problemas = relatorio["ocorrencias"]["problemas"]
     if problemas:
-        print("\n❌ PROBLEMAS ENCONTRADOS:")
-        for p in problemas:
-            print(f"   • {p}")
-        print("\n⚠️  Recomenda-se revisar manualmente os dados geocodificados")
+        print(f"\n❌ {len(problemas)} PROBLEMAS ENCONTRADOS:")
+        for p in problemas[:10]:
+            print(f"   • {p['problema']}")
+        if len(problemas) > 10:
+            print(f"   ... e mais {len(problemas) - 10} (ver relatório)")
     else:
         print("\n✅ TODOS OS POLÍGONOS PASSARAM NA VERIFICAÇÃO!")
-        print("   Os polígonos parecem razoáveis para microáreas de saúde.")
     
-    print("\n" + "=" * 70)
+    print(f"\n📁 Relatório JSON: {caminho_json}")
+    print(f"📁 Relatório HTML: {caminho_html}")
 
 
 if __name__ == "__main__":
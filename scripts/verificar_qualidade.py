@@ -1,147 +1,198 @@
 """
 Verificação de Qualidade das Coordenadas
 Detecta coordenadas genéricas/suspeitas nos resultados do Google API
+
+Gera um relatório estruturado em dados/relatorios/verificacao_qualidade.json
+(comparável entre execuções) e uma página HTML com os detalhes; o terminal
+mostra apenas o resumo.
 """
 
+import argparse
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from collections import Counter
-import math
+
+from coordenadas_genericas import nomes_genericas
+from descobrir_genericas import descobrir_candidatas
+from geometria import BBOX_NSS
+from relatorio import Cronometro, agora_iso, registros, salvar_relatorio
 
 # Diretórios
 BASE_DIR = Path(__file__).parent.parent
 DADOS_DIR = BASE_DIR / "dados"
 
-# Coordenadas conhecidas como genéricas (centroides de bairros/cidades)
-COORDENADAS_GENERICAS = [
-    # Centróide de Nossa Senhora do Socorro
-    {"lat": -10.8531544, "lon": -37.1270097, "nome": "Centróide N.Sra.Socorro"},
-    {"lat": -10.8531643, "lon": -37.1269791, "nome": "Centróide N.Sra.Socorro (var)"},
-    # Centróide do bairro Guajará
-    {"lat": -10.89845, "lon": -37.15609, "nome": "Centróide Guajará"},
-    {"lat": -10.8989307, "lon": -37.1556814, "nome": "Centróide Guajará (var)"},
-    # Centróide do bairro São Braz
-    {"lat": -10.84992, "lon": -37.05153, "nome": "Centróide São Braz"},
-]
-
 TOLERANCIA = 0.001  # ~100m
 
+COLUNAS_ENDERECO = ['ubs_referencia', 'micro_area', 'endereco_completo', 'latitude', 'longitude', 'metodo', 'nota']
+
+# Coordenadas iguais após arredondamento em PRECISAO_DUPLICADAS casas decimais
+# (5 casas ≈ 1m) contam como o mesmo ponto
+PRECISAO_DUPLICADAS = 5
+MIN_DUPLICADAS = 3
+
+
+def agrupar_duplicadas(df, precisao=PRECISAO_DUPLICADAS, minimo=MIN_DUPLICADAS):
+    """
+    Agrupa os endereços pela coordenada quantizada (inteiros lat/lon × 10^precisao)
+    em um único groupby. Retorna um DataFrame com latitude, longitude,
+    ocorrencias e indices (rótulos das linhas de `df` no grupo), ordenado
+    pelo número de ocorrências.
+    """
+    validos = df[df['latitude'].notna() & df['longitude'].notna()]
+    escala = 10 ** precisao
+    chaves = pd.DataFrame({
+        'q_lat': np.round(validos['latitude'].to_numpy() * escala).astype(np.int64),
+        'q_lon': np.round(validos['longitude'].to_numpy() * escala).astype(np.int64),
+        'indice': validos.index,
+    })
+    grupos = chaves.groupby(['q_lat', 'q_lon'], sort=False)['indice'].agg(['size', list])
+    grupos = grupos[grupos['size'] >= minimo].reset_index()
+    grupos = grupos.sort_values('size', ascending=False, kind='stable')
+    return pd.DataFrame({
+        'latitude': grupos['q_lat'].to_numpy() / escala,
+        'longitude': grupos['q_lon'].to_numpy() / escala,
+        'ocorrencias': grupos['size'].to_numpy(),
+        'indices': grupos['list'].to_numpy(),
+    })
+
 
-def is_coord_generica(lat, lon):
-    """Verifica se uma coordenada é genérica."""
-    for gen in COORDENADAS_GENERICAS:
-        if (abs(lat - gen["lat"]) < TOLERANCIA and 
-            abs(lon - gen["lon"]) < TOLERANCIA):
-            return gen["nome"]
-    return None
+def verificar(df, precisao=PRECISAO_DUPLICADAS, min_duplicadas=MIN_DUPLICADAS):
+    """
+    Executa todas as verificações sobre o CSV consolidado (operações vetorizadas
+    sobre colunas inteiras) e retorna o relatório como dict.
+    """
+    cron = Cronometro()
+    lat = df['latitude'].to_numpy()
+    lon = df['longitude'].to_numpy()
+    nota = df['nota'].fillna("").astype(str) if 'nota' in df.columns else pd.Series("", index=df.index)
+    
+    # 1. Coordenadas genéricas
+    with cron.etapa('genericas'):
+        tipo_generico = nomes_genericas(lat, lon, TOLERANCIA)
+        eh_generica = pd.notna(tipo_generico)
+    
+    # 2. Coordenadas duplicadas (muitas ruas no mesmo ponto)
+    with cron.etapa('duplicadas'):
+        duplicadas = agrupar_duplicadas(df, precisao, min_duplicadas)
+        membros = duplicadas[['indices']].explode('indices')
+        eh_duplicada = df.index.isin(membros['indices'])
+        enderecos_membros = df.loc[membros['indices'], ['ubs_referencia', 'micro_area', 'endereco_completo']]
+        enderecos_membros.index = membros.index
+        lista_membros = [registros(grupo) for _, grupo in enderecos_membros.groupby(level=0, sort=False)]
+    
+    # 3. Tipos de localização
+    with cron.etapa('location_type'):
+        location_types = nota[nota != ""].value_counts()
+        eh_approximate = nota.str.contains('APPROXIMATE').to_numpy()
+    
+    # 4. Coordenadas fora do bounding box esperado
+    with cron.etapa('bounding_box'):
+        fora_bbox = (
+            (lat < BBOX_NSS['lat_min']) | (lat > BBOX_NSS['lat_max']) |
+            (lon < BBOX_NSS['lon_min']) | (lon > BBOX_NSS['lon_max'])
+        )
+    
+    # 5. Novos candidatos a coordenada genérica (densidade)
+    with cron.etapa('candidatas_genericas'):
+        candidatas = descobrir_candidatas(df)
+        novas_genericas = candidatas[~candidatas['ja_no_registro'].astype(bool)]
+    
+    # Métricas por UBS / microárea
+    flags = pd.DataFrame({
+        'ubs_referencia': df['ubs_referencia'].to_numpy(),
+        'micro_area': df['micro_area'].to_numpy(),
+        'enderecos': 1,
+        'sem_coordenada': np.isnan(lat) | np.isnan(lon),
+        'genericas': eh_generica,
+        'duplicadas': eh_duplicada,
+        'approximate': eh_approximate,
+        'fora_bbox': fora_bbox,
+    })
+    por_microarea = flags.groupby(['ubs_referencia', 'micro_area'], sort=True).sum().reset_index()
+    por_ubs = flags.drop(columns='micro_area').groupby('ubs_referencia', sort=True).sum().reset_index()
+    
+    contagens = {
+        'enderecos': len(df),
+        'sem_coordenada': int(flags['sem_coordenada'].sum()),
+        'genericas': int(eh_generica.sum()),
+        'coordenadas_duplicadas': len(duplicadas),
+        'enderecos_em_duplicadas': int(eh_duplicada.sum()),
+        'approximate': int(eh_approximate.sum()),
+        'fora_bbox': int(fora_bbox.sum()),
+        'candidatas_genericas': len(novas_genericas),
+    }
+    problemas = (contagens['genericas'] + contagens['coordenadas_duplicadas'] +
+                 contagens['fora_bbox'] + contagens['candidatas_genericas'])
+    
+    return {
+        'relatorio': 'verificacao_qualidade',
+        'titulo': 'Verificação de Qualidade das Coordenadas',
+        'gerado_em': agora_iso(),
+        'entrada': 'dados/UBS_Ruas_Coordenadas_Consolidado.csv',
+        'parametros': {
+            'tolerancia_generica': TOLERANCIA,
+            'precisao_duplicadas': precisao,
+            'min_duplicadas': min_duplicadas,
+            'bbox': BBOX_NSS,
+        },
+        'problemas': problemas,
+        'contagens': contagens,
+        'location_types': location_types.to_dict(),
+        'por_ubs': registros(por_ubs),
+        'por_microarea': registros(por_microarea),
+        'tempos_s': cron.tempos,
+        'ocorrencias': {
+            'genericas': registros(
+                df[eh_generica].assign(tipo_generico=tipo_generico[eh_generica]),
+                COLUNAS_ENDERECO + ['tipo_generico'],
+            ),
+            'duplicadas': [
+                {'latitude': g_lat, 'longitude': g_lon, 'ocorrencias': n, 'enderecos': m}
+                for g_lat, g_lon, n, m in zip(
+                    duplicadas['latitude'], duplicadas['longitude'], duplicadas['ocorrencias'], lista_membros
+                )
+            ],
+            'fora_bbox': registros(df[fora_bbox], COLUNAS_ENDERECO),
+            'candidatas_genericas': registros(novas_genericas),
+        },
+    }
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Verificação de qualidade das coordenadas")
+    parser.add_argument("--precisao", type=int, default=PRECISAO_DUPLICADAS,
+                        help="casas decimais usadas para agrupar coordenadas duplicadas (padrão: %(default)s)")
+    parser.add_argument("--min-duplicadas", type=int, default=MIN_DUPLICADAS,
+                        help="ocorrências mínimas para reportar uma coordenada (padrão: %(default)s)")
+    args = parser.parse_args()
+    
     # Carregar CSV consolidado
     csv_path = DADOS_DIR / "UBS_Ruas_Coordenadas_Consolidado.csv"
     df = pd.read_csv(csv_path)
     
+    relatorio = verificar(df, args.precisao, args.min_duplicadas)
+    caminho_json, caminho_html = salvar_relatorio(relatorio, 'verificacao_qualidade')
+    
+    c = relatorio['contagens']
     print("=" * 70)
     print("VERIFICAÇÃO DE QUALIDADE DAS COORDENADAS")
     print("=" * 70)
+    print(f"\nEndereços analisados: {c['enderecos']} ({c['sem_coordenada']} sem coordenada)")
     
-    # 1. Verificar coordenadas genéricas
-    print("\n🔍 1. VERIFICAÇÃO DE COORDENADAS GENÉRICAS")
-    print("-" * 50)
-    
-    genericas = []
-    for idx, row in df.iterrows():
-        gen = is_coord_generica(row['latitude'], row['longitude'])
-        if gen:
-            genericas.append({
-                'endereco': row['endereco_completo'],
-                'ubs': row['ubs_referencia'],
-                'micro_area': row['micro_area'],
-                'lat': row['latitude'],
-                'lon': row['longitude'],
-                'tipo_generico': gen
-            })
-    
-    if len(genericas) > 0:
-        print(f"\n⚠️  {len(genericas)} coordenadas genéricas encontradas:")
-        for g in genericas:
-            print(f"   - [{g['ubs']}, MA{g['micro_area']}] {g['endereco'][:50]}...")
-            print(f"     Coordenada: ({g['lat']}, {g['lon']}) → {g['tipo_generico']}")
-    else:
-        print("\n✅ Nenhuma coordenada genérica encontrada!")
-    
-    # 2. Verificar coordenadas duplicadas (muitas ruas no mesmo ponto)
-    print("\n🔍 2. VERIFICAÇÃO DE COORDENADAS DUPLICADAS")
-    print("-" * 50)
-    
-    coord_count = Counter()
-    for _, row in df.iterrows():
-        coord_key = (round(row['latitude'], 5), round(row['longitude'], 5))
-        coord_count[coord_key] += 1
-    
-    duplicadas = [(coord, count) for coord, count in coord_count.items() if count >= 3]
-    duplicadas.sort(key=lambda x: -x[1])
-    
-    if len(duplicadas) > 0:
-        print(f"\n⚠️  {len(duplicadas)} coordenadas aparecem 3+ vezes:")
-        for coord, count in duplicadas[:10]:  # Top 10
-            print(f"\n   Coordenada ({coord[0]}, {coord[1]}) - {count} ocorrências:")
-            ruas = df[(abs(df['latitude'] - coord[0]) < 0.00001) & 
-                     (abs(df['longitude'] - coord[1]) < 0.00001)]
-            for _, r in ruas.iterrows():
-                print(f"     - [{r['ubs_referencia']}, MA{r['micro_area']}] {r['endereco_completo'][:40]}...")
-    else:
-        print("\n✅ Nenhuma coordenada com 3+ duplicatas!")
-    
-    # 3. Verificar endereços possivelmente fora da microárea
-    print("\n🔍 3. VERIFICAÇÃO DE LOCATION_TYPE (se disponível)")
-    print("-" * 50)
-    
-    if 'nota' in df.columns:
-        location_types = df['nota'].value_counts()
-        print("\nDistribuição de tipos de localização:")
-        for lt, count in location_types.items():
-            if 'APPROXIMATE' in str(lt):
-                print(f"   ⚠️  {lt}: {count}")
-            elif 'ROOFTOP' in str(lt) or 'GEOMETRIC_CENTER' in str(lt):
-                print(f"   ✅ {lt}: {count}")
-            else:
-                print(f"   📍 {lt}: {count}")
-    
-    # 4. Verificar coordenadas fora do bounding box esperado
-    print("\n🔍 4. VERIFICAÇÃO DE BOUNDING BOX")
-    print("-" * 50)
-    
-    # Bounding box de Nossa Senhora do Socorro
-    lat_min, lat_max = -11.05, -10.75
-    lon_min, lon_max = -37.25, -37.00
-    
-    fora_bbox = df[
-        (df['latitude'] < lat_min) | (df['latitude'] > lat_max) |
-        (df['longitude'] < lon_min) | (df['longitude'] > lon_max)
-    ]
-    
-    if len(fora_bbox) > 0:
-        print(f"\n⚠️  {len(fora_bbox)} coordenadas FORA do bounding box esperado:")
-        for _, row in fora_bbox.iterrows():
-            print(f"   - [{row['ubs_referencia']}, MA{row['micro_area']}] {row['endereco_completo'][:40]}...")
-            print(f"     Coordenada: ({row['latitude']}, {row['longitude']})")
-    else:
-        print("\n✅ Todas as coordenadas estão dentro do bounding box!")
-    
-    # 5. Resumo
-    print("\n" + "=" * 70)
-    print("RESUMO DA VERIFICAÇÃO")
-    print("=" * 70)
-    
-    problemas = len(genericas) + len(duplicadas) + len(fora_bbox)
-    if problemas == 0:
+    if relatorio['problemas'] == 0:
         print("\n✅ NENHUM PROBLEMA DETECTADO!")
     else:
-        print(f"\n⚠️  {problemas} problemas potenciais detectados:")
-        print(f"   - Coordenadas genéricas: {len(genericas)}")
-        print(f"   - Coordenadas muito duplicadas: {len(duplicadas)}")
-        print(f"   - Coordenadas fora do bounding box: {len(fora_bbox)}")
+        print(f"\n⚠️  {relatorio['problemas']} problemas potenciais detectados:")
+        print(f"   - Coordenadas genéricas: {c['genericas']}")
+        print(f"   - Coordenadas com {args.min_duplicadas}+ duplicatas: {c['coordenadas_duplicadas']}"
+              f" ({c['enderecos_em_duplicadas']} endereços)")
+        print(f"   - Coordenadas fora do bounding box: {c['fora_bbox']}")
+        print(f"   - Candidatos a coordenadas genéricas: {c['candidatas_genericas']}")
+    if c['approximate']:
+        print(f"   - Endereços APPROXIMATE: {c['approximate']}")
+    
+    print(f"\n📁 Relatório JSON: {caminho_json}")
+    print(f"📁 Relatório HTML: {caminho_html}")
 
 
 if __name__ == "__main__":
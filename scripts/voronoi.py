@@ -0,0 +1,249 @@
+"""
+Partição de Voronoi das Microáreas
+Divide a caixa do município entre os rótulos (ex.: microáreas) dos pontos
+geocodificados: cada lugar fica com o rótulo do ponto mais próximo. As
+células de Voronoi são dissolvidas por rótulo e recortadas à caixa, gerando
+uma cobertura sem lacunas e sem sobreposições.
+
+Método (O(n log n)):
+1. Projeção local em km (distâncias isotrópicas)
+2. Pontos coincidentes viram um único sítio com o rótulo de maior peso
+3. Triangulação de Delaunay (triangulacao.py) com 4 sítios auxiliares muito
+   distantes, para que todas as células reais sejam limitadas
+4. Célula de cada sítio = circuncentros dos triângulos incidentes, em ordem
+   angular; recorte à caixa (Sutherland–Hodgman)
+5. Dissolução: arestas compartilhadas por células do mesmo rótulo se
+   cancelam; as restantes são encadeadas em anéis externos e buracos
+"""
+
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from geometria import BBOX_NSS, KM_POR_GRAU_LAT, km_por_grau_lon, pontos_em_anel
+from triangulacao import delaunay
+
+# Vértices são comparados após arredondar para 1e-6 km (1 mm)
+CASAS_QUANTIZACAO = 6
+
+
+def _sitios(x, y, rotulos, pesos):
+    """
+    Agrupa pontos coincidentes. Retorna (sx, sy, rótulo de cada sítio), com o
+    rótulo de maior peso total no ponto (empate: o menor código de rótulo).
+    """
+    pontos = pd.DataFrame({"x": x, "y": y, "rotulo": rotulos, "peso": pesos})
+    por_rotulo = pontos.groupby(["x", "y", "rotulo"], sort=True)["peso"].sum().reset_index()
+    sitios = (
+        por_rotulo.sort_values(["x", "y", "peso", "rotulo"], ascending=[True, True, False, True],
+                               kind="stable")
+        .drop_duplicates(["x", "y"])
+    )
+    return sitios["x"].to_numpy(), sitios["y"].to_numpy(), sitios["rotulo"].to_numpy()
+
+
+def _circuncentros(x, y, triangulos):
+    ax, ay = x[triangulos[:, 0]], y[triangulos[:, 0]]
+    bx, by = x[triangulos[:, 1]] - ax, y[triangulos[:, 1]] - ay
+    cx, cy = x[triangulos[:, 2]] - ax, y[triangulos[:, 2]] - ay
+    d = 2 * (bx * cy - by * cx)
+    b2, c2 = bx * bx + by * by, cx * cx + cy * cy
+    return ax + (cy * b2 - by * c2) / d, ay + (bx * c2 - cx * b2) / d
+
+
+def _recortar(poligono, x_min, y_min, x_max, y_max):
+    """Recorte Sutherland–Hodgman de um polígono convexo (lista de (x, y)) à caixa."""
+    def recortar_lado(pontos, eixo, limite, manter_maior):
+        def dentro(p):
+            return p[eixo] >= limite if manter_maior else p[eixo] <= limite
+
+        def corte(p, q):
+            # Calculado sempre a partir do menor extremo, para que células
+            # vizinhas obtenham exatamente o mesmo ponto na aresta comum
+            p, q = min(p, q), max(p, q)
+            t = (limite - p[eixo]) / (q[eixo] - p[eixo])
+            outro = 1 - eixo
+            ponto = [0.0, 0.0]
+            ponto[eixo] = limite
+            ponto[outro] = p[outro] + t * (q[outro] - p[outro])
+            return tuple(ponto)
+
+        saida = []
+        for i, q in enumerate(pontos):
+            p = pontos[i - 1]
+            if dentro(q):
+                if not dentro(p):
+                    saida.append(corte(p, q))
+                saida.append(q)
+            elif dentro(p):
+                saida.append(corte(p, q))
+        return saida
+
+    for eixo, limite, manter_maior in ((0, x_min, True), (0, x_max, False),
+                                       (1, y_min, True), (1, y_max, False)):
+        if not poligono:
+            break
+        poligono = recortar_lado(poligono, eixo, limite, manter_maior)
+    return poligono
+
+
+def _area(anel):
+    x = np.array([p[0] for p in anel])
+    y = np.array([p[1] for p in anel])
+    return 0.5 * float(np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y))
+
+
+def _sem_colineares(anel):
+    """Remove vértices colineares com os vizinhos (ex.: junções de células)."""
+    x = np.array([p[0] for p in anel])
+    y = np.array([p[1] for p in anel])
+    cruz = ((x - np.roll(x, 1)) * (np.roll(y, -1) - np.roll(y, 1)) -
+            (y - np.roll(y, 1)) * (np.roll(x, -1) - np.roll(x, 1)))
+    manter = np.abs(cruz) > 1e-12
+    return [p for p, m in zip(anel, manter) if m]
+
+
+def _encadear(arestas):
+    """
+    Encadeia arestas dirigidas (interior à esquerda) em anéis. Onde um
+    vértice tem mais de uma saída (regiões que se tocam num ponto), segue a
+    primeira aresta no sentido horário a partir da aresta de chegada, o que
+    mantém cada região num anel separado.
+    """
+    saidas = defaultdict(list)
+    for a, b in arestas:
+        saidas[a].append(b)
+
+    def angulo(de, para):
+        return np.arctan2(para[1] - de[1], para[0] - de[0])
+
+    aneis = []
+    for inicio in sorted(saidas):
+        while saidas[inicio]:
+            anel = [inicio]
+            anterior, atual = inicio, saidas[inicio].pop()
+            while atual != inicio:
+                anel.append(atual)
+                candidatos = saidas[atual]
+                if len(candidatos) == 1:
+                    proximo = candidatos.pop()
+                else:
+                    volta = angulo(atual, anterior)
+                    giro = [(volta - angulo(atual, c)) % (2 * np.pi) for c in candidatos]
+                    proximo = candidatos.pop(int(np.argmin(giro)))
+                anterior, atual = atual, proximo
+            aneis.append(anel)
+    return aneis
+
+
+def _dissolver(celulas):
+    """
+    Une células (anéis anti-horários com vértices quantizados) de um mesmo
+    rótulo. Retorna uma lista de polígonos [externo, buracos...], do maior
+    para o menor.
+    """
+    arestas = set()
+    for celula in celulas:
+        for i, b in enumerate(celula):
+            a = celula[i - 1]
+            if a == b:
+                continue
+            if (b, a) in arestas:
+                arestas.discard((b, a))
+            else:
+                arestas.add((a, b))
+
+    externos, buracos = [], []
+    for anel in _encadear(arestas):
+        anel = _sem_colineares(anel)
+        if len(anel) < 3:
+            continue
+        area = _area(anel)
+        (externos if area > 0 else buracos).append((abs(area), anel))
+    externos.sort(key=lambda e: -e[0])
+
+    poligonos = [[anel] for _, anel in externos]
+    for _, buraco in buracos:
+        # O buraco pertence ao menor anel externo que o contém
+        for k in range(len(externos) - 1, -1, -1):
+            anel = externos[k][1]
+            if pontos_em_anel([buraco[0][0]], [buraco[0][1]],
+                              [p[0] for p in anel], [p[1] for p in anel])[0]:
+                poligonos[k].append(buraco)
+                break
+    return poligonos
+
+
+def particao_voronoi(lon, lat, rotulos, pesos=None, caixa=BBOX_NSS):
+    """
+    Partição de Voronoi da `caixa` entre os rótulos dos pontos (lon, lat).
+
+    `rotulos` são códigos inteiros 0..n_rotulos-1; `pesos` (padrão 1) decide o
+    rótulo de pontos coincidentes. Retorna um dict rótulo → geometria GeoJSON
+    (Polygon ou MultiPolygon, anéis fechados, externos anti-horários).
+    """
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    rotulos = np.asarray(rotulos)
+    pesos = np.ones(len(lon)) if pesos is None else np.asarray(pesos, dtype=float)
+    if len(lon) == 0:
+        return {}
+
+    # 1. Projeção local em km
+    lon0, lat0 = lon.mean(), lat.mean()
+    kx = km_por_grau_lon(lat0)
+    x, y = (lon - lon0) * kx, (lat - lat0) * KM_POR_GRAU_LAT
+    x_min, x_max = (caixa["lon_min"] - lon0) * kx, (caixa["lon_max"] - lon0) * kx
+    y_min, y_max = ((caixa["lat_min"] - lat0) * KM_POR_GRAU_LAT,
+                    (caixa["lat_max"] - lat0) * KM_POR_GRAU_LAT)
+
+    # 2. Sítios distintos
+    sx, sy, srotulo = _sitios(x, y, rotulos, pesos)
+    n = len(sx)
+
+    # 3. Delaunay com sítios auxiliares distantes (fora de qualquer célula na caixa)
+    raio = 10 * (np.hypot(x_max - x_min, y_max - y_min)
+                 + np.abs(np.concatenate([sx, sy, [x_min, x_max, y_min, y_max]])).max())
+    tx = np.concatenate([sx, [-raio, raio, raio, -raio]])
+    ty = np.concatenate([sy, [-raio, -raio, raio, raio]])
+    triangulos, _ = delaunay(tx, ty)
+    ccx, ccy = _circuncentros(tx, ty, triangulos)
+
+    # 4. Células: circuncentros em ordem angular em torno de cada sítio
+    sitio = triangulos.ravel()
+    tri = np.repeat(np.arange(len(triangulos)), 3)
+    real = sitio < n
+    sitio, tri = sitio[real], tri[real]
+    angulo = np.arctan2(ccy[tri] - sy[sitio], ccx[tri] - sx[sitio])
+    ordem = np.lexsort((angulo, sitio))
+    sitio, tri = sitio[ordem], tri[ordem]
+    limites = np.searchsorted(sitio, np.arange(n + 1))
+    vx, vy = ccx[tri].tolist(), ccy[tri].tolist()
+
+    celulas = defaultdict(list)
+    for s in range(n):
+        celula = list(zip(vx[limites[s]:limites[s + 1]], vy[limites[s]:limites[s + 1]]))
+        celula = _recortar(celula, x_min, y_min, x_max, y_max)
+        if len(celula) >= 3:
+            celulas[srotulo[s]].append(
+                [(round(px, CASAS_QUANTIZACAO), round(py, CASAS_QUANTIZACAO)) for px, py in celula]
+            )
+
+    # 5. Dissolução por rótulo e volta para lon/lat
+    def para_lonlat(anel):
+        # Limita à caixa para que o arredondamento da volta não a ultrapasse
+        anel = np.array(anel + anel[:1])
+        lons = np.clip(anel[:, 0] / kx + lon0, caixa["lon_min"], caixa["lon_max"])
+        lats = np.clip(anel[:, 1] / KM_POR_GRAU_LAT + lat0, caixa["lat_min"], caixa["lat_max"])
+        return np.column_stack([lons, lats]).tolist()
+
+    geometrias = {}
+    for rotulo in sorted(celulas):
+        poligonos = [[para_lonlat(anel) for anel in poligono]
+                     for poligono in _dissolver(celulas[rotulo])]
+        if len(poligonos) == 1:
+            geometrias[rotulo] = {"type": "Polygon", "coordinates": poligonos[0]}
+        else:
+            geometrias[rotulo] = {"type": "MultiPolygon", "coordinates": poligonos}
+    return geometrias